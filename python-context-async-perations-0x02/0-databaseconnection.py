@@ -2,34 +2,69 @@ from dotenv import load_dotenv
 import os
 import mysql.connector
 
+from pool import get_pool, pool_metrics
+
 # 1. Load env vars
 load_dotenv()
 
 class DatabaseConnection:
-	def __init__(self):
+	"""
+	Context manager yielding a MySQL connection; commits on success and
+	rolls back on error.
+	With pooled=True (the default) the connection is borrowed from the
+	process-wide pool named `pool_name` and returned to it, session reset,
+	instead of being closed, so a `with DatabaseConnection()` per request
+	costs no connect/disconnect. pool_size and pool_timeout size that pool
+	when it is first created; asking for a different size, timeout or
+	database later raises ValueError. See pool.py for its metrics().
+	"""
+
+	def __init__(self, pooled=True, pool_name="default", pool_size=None, pool_timeout=None):
 		self.host     = os.getenv("DB_HOST")
 		self.user     = os.getenv("DB_USER")
 		self.password = os.getenv("DB_PASSWORD")
 		self.database = os.getenv("DB_NAME")
 		self.port     = int(os.getenv("DB_PORT", 3306))
+		self.pooled   = pooled
+		self.pool     = None
 		self.conn     = None
+		if pooled:
+			self.pool = get_pool(
+				pool_name, size=pool_size, timeout=pool_timeout, **self._config()
+			)
 
-	def __enter__(self):
-		self.conn = mysql.connector.connect(
+	def _config(self):
+		return dict(
 			host     = self.host,
 			user     = self.user,
 			password = self.password,
 			database = self.database,
 			port     = self.port
 		)
+
+	def __enter__(self):
+		if self.pooled:
+			self.conn = self.pool.checkout()
+		else:
+			self.conn = mysql.connector.connect(**self._config())
 		return self.conn
 
 	def __exit__(self, exc_type, exc_val, exc_tb):
-		if exc_type:
-			self.conn.rollback()
-		else:
-			self.conn.commit()
-		self.conn.close()
+		try:
+			if exc_type:
+				self.conn.rollback()
+			else:
+				self.conn.commit()
+		finally:
+			if self.pooled:
+				self.pool.checkin(self.conn)
+			else:
+				self.conn.close()
+			self.conn = None
+
+	def metrics(self):
+		"""Metrics of the pool this connection borrows from (None if unpooled)."""
+		return self.pool.metrics() if self.pooled else None
 
 # 3. Demo: query and print all users
 if __name__ == "__main__":
@@ -38,3 +73,4 @@ if __name__ == "__main__":
 		cursor.execute("SELECT * FROM users")
 		for row in cursor:
 			print(row)
+	print(pool_metrics())
@@ -1,24 +1,82 @@
 from dotenv import load_dotenv
+from functools import lru_cache
 import os
 import mysql.connector
 
 # Load environment variables from .env file
 load_dotenv()
 
+@lru_cache(maxsize=1024)
+def translate_placeholders(query):
+	"""
+	Convert '?' placeholders to the '%s' style MySQL connector expects.
+	Only bare '?' tokens are replaced: string literals, quoted identifiers
+	and comments are copied untouched. Cached per query text.
+	"""
+	parts = []
+	start = i = 0
+	n = len(query)
+	while i < n:
+		ch = query[i]
+		if ch in "'\"`":
+			i = _skip_quoted(query, i, ch)
+		elif ch == '#' or (query.startswith('--', i) and (i + 2 == n or query[i + 2].isspace())):
+			end = query.find('\n', i)
+			i = n if end == -1 else end + 1
+		elif query.startswith('/*', i):
+			end = query.find('*/', i + 2)
+			i = n if end == -1 else end + 2
+		elif ch == '?':
+			parts.append(query[start:i])
+			parts.append('%s')
+			i += 1
+			start = i
+		else:
+			i += 1
+	parts.append(query[start:])
+	return ''.join(parts)
+
+def _skip_quoted(query, i, quote):
+	"""Index just past the quoted token starting at query[i]."""
+	j = i + 1
+	while j < len(query):
+		ch = query[j]
+		if ch == '\\' and quote != '`':
+			j += 2
+		elif ch == quote:
+			if query[j + 1:j + 2] == quote:  # doubled quote is an escape
+				j += 2
+			else:
+				return j + 1
+		else:
+			j += 1
+	return len(query)
+
 class ExecuteQuery:
-	def __init__(self, query, params=()):
+	def __init__(self, query, params=(), many=False, arraysize=500, batch_size=1000):
 		"""
 		Initialize with a raw SQL query and parameters.
 		:param query: SQL string, using '?' placeholders for parameters
-		:param params: tuple of values to substitute into the query
+		:param params: tuple of values to substitute into the query, or with
+		  many=True a sequence of such tuples (executemany batch mode)
+		:param arraysize: rows fetched per round trip while streaming
+		:param batch_size: parameter sets sent per executemany call
 		"""
 		self.raw_query = query
 		self.params = params
+		self.many = many
+		self.arraysize = arraysize
+		self.batch_size = batch_size
 		self.conn = None
 		self.cursor = None
-		self.results = None
+		self.exhausted = True
 
 	def __enter__(self):
+		"""
+		Run the query. Returns a lazy iterator over the result rows, which
+		are streamed from an unbuffered cursor `arraysize` at a time, or in
+		batch mode (many=True) the total number of affected rows.
+		"""
 		# Establish the database connection
 		self.conn = mysql.connector.connect(
 			host=os.getenv("DB_HOST"),
@@ -27,29 +85,63 @@ class ExecuteQuery:
 			database=os.getenv("DB_NAME"),
 			port=int(os.getenv("DB_PORT", 3306))
 		)
-		# Create a cursor for executing queries
-		self.cursor = self.conn.cursor()
+		try:
+			# Unbuffered: rows stay on the server until they are fetched
+			self.cursor = self.conn.cursor(buffered=False)
+
+			# MySQL connector uses '%s' for placeholders, so convert '?' to '%s'
+			formatted_query = translate_placeholders(self.raw_query)
+			if self.many:
+				return self._execute_many(formatted_query)
+			self.cursor.execute(formatted_query, self.params)
+			self.exhausted = not self.cursor.with_rows
+			return self._rows()
+		except BaseException:
+			# __exit__ will not run: undo any executemany chunks already
+			# sent and release the connection before re-raising
+			try:
+				self.conn.rollback()
+				self.conn.close()
+			except mysql.connector.Error:
+				self.conn.shutdown()
+			self.conn = None
+			raise
+
+	def _execute_many(self, formatted_query):
+		params = list(self.params)
+		affected = 0
+		for start in range(0, len(params), self.batch_size):
+			self.cursor.executemany(formatted_query, params[start:start + self.batch_size])
+			affected += max(self.cursor.rowcount, 0)
+		return affected
 
-		# MySQL connector uses '%s' for placeholders, so convert '?' to '%s'
-		formatted_query = self.raw_query.replace('?', '%s')
-		# Execute the query with the provided parameters
-		self.cursor.execute(formatted_query, self.params)
-		# Fetch all results
-		self.results = self.cursor.fetchall()
-		return self.results
+	def _rows(self):
+		while True:
+			rows = self.cursor.fetchmany(self.arraysize)
+			if not rows:
+				self.exhausted = True
+				return
+			yield from rows
 
 	def __exit__(self, exc_type, exc_val, exc_tb):
+		if self.conn is None:
+			return
+		if not self.exhausted:
+			# Unread rows would have to be drained before the cursor or
+			# connection can be closed; drop the socket instead (the
+			# server rolls back anything uncommitted)
+			self.conn.shutdown()
+			return
 		# Close the cursor
 		if self.cursor:
 			self.cursor.close()
 		# Commit or rollback based on whether an exception occurred
-		if self.conn:
-			if exc_type:
-				self.conn.rollback()
-			else:
-				self.conn.commit()
-			# Close the connection
-			self.conn.close()
+		if exc_type:
+			self.conn.rollback()
+		else:
+			self.conn.commit()
+		# Close the connection
+		self.conn.close()
 
 
 if __name__ == "__main__":
@@ -61,4 +153,12 @@ if __name__ == "__main__":
 	# Example usage: get all users older than 25
 	with ExecuteQuery("SELECT * FROM users WHERE age > ?", (25,)) as users:
 		for user in users:
-			print(user)
\ No newline at end of file
+			print(user)
+
+	# Example usage: batch update of several users' ages
+	with ExecuteQuery(
+		"UPDATE users SET age = ? WHERE email = ?",
+		[(26, "alice@example.com"), (31, "bob@example.com")],
+		many=True,
+	) as updated:
+		print("Updated rows:", updated)
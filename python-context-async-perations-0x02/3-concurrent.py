@@ -1,14 +1,61 @@
+import os
 import asyncio
+import pathlib
 import aiosqlite
+from contextlib import asynccontextmanager
 
-DB_PATH = "users.db"  # Path to your SQLite database file
+DB_PATH = os.getenv("USERS_DB_PATH", "users.db")  # Path to your SQLite database file
+DB_PROFILE = os.getenv("USERS_DB_PROFILE", "performance")
 
-async def async_fetch_users():
+# PRAGMAs by profile name, the same profiles as python-decorators-0x01/db.py.
+# journal_mode is persistent and can only be set by a writer, so readers
+# skip it and connect_writer() applies it: under WAL, readers never wait
+# on a writer (and the writer never waits on them).
+PROFILES = {
+	# SQLite defaults: rollback journal, readers and the writer block each other
+	"default": {},
+	"performance": {
+		"journal_mode": "wal",
+		"synchronous": "normal",  # fsync at checkpoints only; safe with WAL
+		"cache_size": -64000,  # KiB
+		"mmap_size": 256 * 1024 * 1024,
+		"temp_store": "memory",
+	},
+}
+
+async def _apply_profile(db, profile, readonly):
+	settings = PROFILES[profile or DB_PROFILE] if not isinstance(profile, dict) else profile
+	for name, value in settings.items():
+		if not (readonly and name == "journal_mode"):
+			await db.execute(f"PRAGMA {name} = {value}")
+
+@asynccontextmanager
+async def connect_writer(profile=None):
 	"""
-	Fetch all users from the users table.
+	Open DB_PATH for writing with the profile's PRAGMAs applied, which
+	switches the file to WAL under the "performance" profile.
 	"""
 	async with aiosqlite.connect(DB_PATH) as db:
+		await _apply_profile(db, profile, readonly=False)
+		yield db
+
+@asynccontextmanager
+async def connect_readonly(profile=None):
+	"""
+	Open DB_PATH read-only (mode=ro URI) with the profile's PRAGMAs
+	(USERS_DB_PROFILE by default) applied.
+	"""
+	uri = pathlib.Path(DB_PATH).resolve().as_uri() + "?mode=ro"
+	async with aiosqlite.connect(uri, uri=True) as db:
+		await _apply_profile(db, profile, readonly=True)
 		db.row_factory = aiosqlite.Row
+		yield db
+
+async def async_fetch_users():
+	"""
+	Fetch all users from the users table.
+	"""
+	async with connect_readonly() as db:
 		async with db.execute("SELECT * FROM users") as cursor:
 			return await cursor.fetchall()
 
@@ -16,8 +63,7 @@ async def async_fetch_older_users():
 	"""
 	Fetch users older than 40.
 	"""
-	async with aiosqlite.connect(DB_PATH) as db:
-		db.row_factory = aiosqlite.Row
+	async with connect_readonly() as db:
 		async with db.execute("SELECT * FROM users WHERE age > ?", (40,)) as cursor:
 			return await cursor.fetchall()
 
@@ -25,6 +71,9 @@ async def fetch_concurrently():
 	"""
 	Run both fetch queries concurrently and print results.
 	"""
+	# Put the file in the profile's journal mode (WAL) once, up front
+	async with connect_writer():
+		pass
 	users, older_users = await asyncio.gather(
 		async_fetch_users(),
 		async_fetch_older_users()
@@ -40,4 +89,4 @@ async def fetch_concurrently():
 
 if __name__ == "__main__":
 	asyncio.run(fetch_concurrently())
-# This script demonstrates how to fetch data from a SQLite database concurrently using asyncio and aiosqlite.
\ No newline at end of file
+# This script demonstrates how to fetch data from a SQLite database concurrently using asyncio and aiosqlite.
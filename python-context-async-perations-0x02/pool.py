@@ -0,0 +1,88 @@
+import os
+import threading
+import importlib.util
+
+
+def _load_seed():
+	"""
+	python-generators-0x00/seed.py, which holds the repo's one pool
+	implementation; loaded by path so that directory's modules do not
+	shadow this one's.
+	"""
+	path = os.path.join(
+		os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+		"python-generators-0x00", "seed.py",
+	)
+	spec = importlib.util.spec_from_file_location("prodev_seed", path)
+	module = importlib.util.module_from_spec(spec)
+	spec.loader.exec_module(module)
+	return module
+
+
+_seed = _load_seed()
+PoolTimeout = _seed.PoolTimeout
+
+
+class ConnectionPool(_seed.ConnectionPool):
+	"""
+	seed.ConnectionPool (named, fixed-size, health-checked, with metrics())
+	handing out plain connections: checkout() borrows one, checkin() gives
+	it back. Bug fixes belong in seed.py.
+	"""
+
+	def __init__(self, name="default", size=5, timeout=30.0, **config):
+		super().__init__(size=size, timeout=timeout, name=name, **config)
+
+	def checkout(self):
+		"""Borrow a healthy connection; give it back with checkin()."""
+		return self.acquire()
+
+	def checkin(self, connection):
+		"""Take a connection back, rolling back and resetting its session."""
+		self.release(connection)
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(name="default", size=None, timeout=None, **config):
+	"""
+	Return the process-wide pool called `name`, creating it on first use
+	from `config` (mysql.connector.connect arguments), `size` (default
+	DB_POOL_SIZE or 5) and `timeout` (default DB_POOL_TIMEOUT or 30s).
+	Later calls return the existing pool; a forked child gets new pools.
+	Raises ValueError if the pool already exists with a config, size or
+	timeout other than one explicitly asked for.
+	"""
+	with _pools_lock:
+		pool = _pools.get(name)
+		if pool is None or pool.pid != os.getpid():
+			pool = _pools[name] = ConnectionPool(
+				name,
+				size=size or int(os.getenv("DB_POOL_SIZE", 5)),
+				timeout=timeout or float(os.getenv("DB_POOL_TIMEOUT", 30)),
+				**config,
+			)
+			return pool
+	mismatched = [
+		field for field, wanted, actual in (
+			("config", config, pool.config),
+			("size", size, pool.size),
+			("timeout", timeout, pool.timeout),
+		)
+		if wanted and wanted != actual
+	]
+	if mismatched:
+		raise ValueError(
+			f"Pool {name!r} already exists with a different "
+			f"{', '.join(mismatched)}; use another pool name"
+		)
+	return pool
+
+
+def pool_metrics():
+	"""metrics() of every pool in this process, by name."""
+	with _pools_lock:
+		pools = [pool for pool in _pools.values() if pool.pid == os.getpid()]
+	return {pool.name: pool.metrics() for pool in pools}
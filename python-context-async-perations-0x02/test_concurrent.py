@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+test_concurrent.py
+
+Unit tests for 3-concurrent.py:
+- connect_writer / connect_readonly profiles
+"""
+
+import asyncio
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest.mock import patch
+
+concurrent = __import__('3-concurrent')
+
+
+class TestProfiles(unittest.TestCase):
+    """Test suite for the connection profiles."""
+
+    def setUp(self):
+        """Create a throwaway users.db in rollback-journal mode."""
+        self.workdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.workdir.name, "users.db")
+        conn = sqlite3.connect(self.path)
+        conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, age INTEGER)")
+        conn.execute("INSERT INTO users VALUES (1, 50)")
+        conn.commit()
+        conn.close()
+        patcher = patch.object(concurrent, "DB_PATH", self.path)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        """Remove the database."""
+        self.workdir.cleanup()
+
+    def journal_mode(self):
+        """The file's journal mode as seen by a fresh connection."""
+        conn = sqlite3.connect(self.path)
+        try:
+            return conn.execute("PRAGMA journal_mode").fetchone()[0]
+        finally:
+            conn.close()
+
+    def test_writer_enables_wal(self):
+        """Test that the performance profile's writer switches to WAL."""
+        async def run():
+            async with concurrent.connect_writer("performance"):
+                pass
+
+        asyncio.run(run())
+        self.assertEqual(self.journal_mode(), "wal")
+
+    def test_default_profile_leaves_journal_mode(self):
+        """Test that the default profile changes nothing."""
+        async def run():
+            async with concurrent.connect_writer("default"):
+                pass
+
+        asyncio.run(run())
+        self.assertEqual(self.journal_mode(), "delete")
+
+    def test_reader_runs_alongside_writer(self):
+        """Test that under WAL a reader is not blocked by an exclusive writer."""
+        async def run():
+            async with concurrent.connect_writer("performance") as writer:
+                await writer.execute("BEGIN EXCLUSIVE")
+                await writer.execute("UPDATE users SET age = 51")
+                async with concurrent.connect_readonly("performance") as reader:
+                    async with reader.execute("SELECT age FROM users") as cursor:
+                        row = await cursor.fetchone()
+                await writer.commit()
+            return row["age"]
+
+        self.assertEqual(asyncio.run(run()), 50)
+
+
+if __name__ == "__main__":
+    unittest.main()
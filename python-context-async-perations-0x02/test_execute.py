@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+test_execute.py
+
+Unit tests for 1-execute.py:
+- translate_placeholders
+"""
+
+import unittest
+from parameterized import parameterized
+
+translate_placeholders = __import__('1-execute').translate_placeholders
+
+
+class TestTranslatePlaceholders(unittest.TestCase):
+    """Test suite for translate_placeholders."""
+
+    @parameterized.expand([
+        ("bare", "SELECT * FROM users WHERE age > ?",
+         "SELECT * FROM users WHERE age > %s"),
+        ("several", "UPDATE users SET age = ? WHERE email = ?",
+         "UPDATE users SET age = %s WHERE email = %s"),
+        ("none", "SELECT 1", "SELECT 1"),
+    ])
+    def test_replaces_bare_placeholders(self, _, query, expected):
+        """Test that bare '?' tokens become '%s'."""
+        self.assertEqual(translate_placeholders(query), expected)
+
+    @parameterized.expand([
+        ("single_quotes", "SELECT '?' FROM t WHERE a = ?",
+         "SELECT '?' FROM t WHERE a = %s"),
+        ("double_quotes", 'SELECT "?" FROM t WHERE a = ?',
+         'SELECT "?" FROM t WHERE a = %s'),
+        ("backticks", "SELECT `a?` FROM t WHERE a = ?",
+         "SELECT `a?` FROM t WHERE a = %s"),
+        ("doubled_quote", "SELECT 'it''s ?' FROM t WHERE a = ?",
+         "SELECT 'it''s ?' FROM t WHERE a = %s"),
+        ("backslash_escape", r"SELECT 'it\'s ?' FROM t WHERE a = ?",
+         r"SELECT 'it\'s ?' FROM t WHERE a = %s"),
+        ("escaped_backslash", r"SELECT 'a\\' FROM t WHERE a = ?",
+         r"SELECT 'a\\' FROM t WHERE a = %s"),
+        ("unterminated", "SELECT 'never closed ?",
+         "SELECT 'never closed ?"),
+    ])
+    def test_skips_quoted_text(self, _, query, expected):
+        """Test that '?' inside literals and identifiers is untouched."""
+        self.assertEqual(translate_placeholders(query), expected)
+
+    @parameterized.expand([
+        ("hash", "SELECT ? # why?\nFROM t",
+         "SELECT %s # why?\nFROM t"),
+        ("double_dash", "SELECT ? -- why?\nFROM t WHERE a = ?",
+         "SELECT %s -- why?\nFROM t WHERE a = %s"),
+        ("double_dash_at_end", "SELECT ? --",
+         "SELECT %s --"),
+        ("block", "SELECT /* why? */ ? FROM t",
+         "SELECT /* why? */ %s FROM t"),
+        ("unterminated_block", "SELECT ? /* why?",
+         "SELECT %s /* why?"),
+    ])
+    def test_skips_comments(self, _, query, expected):
+        """Test that '?' inside the three comment styles is untouched."""
+        self.assertEqual(translate_placeholders(query), expected)
+
+    def test_double_dash_needs_whitespace(self):
+        """Test that '--' not followed by whitespace is not a comment."""
+        self.assertEqual(
+            translate_placeholders("SELECT 1 --?"),
+            "SELECT 1 --%s",
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+test_pool.py
+
+Unit tests for pool.py:
+- get_pool
+- ConnectionPool checkout / checkin / metrics
+"""
+
+import unittest
+from unittest import mock
+
+import pool
+
+CONFIG = dict(host="db", user="app", password="", database="ALX_prodev", port=3306)
+
+
+class TestGetPool(unittest.TestCase):
+    """Test suite for get_pool."""
+
+    def setUp(self):
+        pool._pools.clear()
+        self.addCleanup(pool._pools.clear)
+
+    def test_returns_the_existing_pool(self):
+        """Test that the same name and config share one pool."""
+        first = pool.get_pool("users", size=3, timeout=1.0, **CONFIG)
+        self.assertIs(pool.get_pool("users", size=3, timeout=1.0, **CONFIG), first)
+        self.assertIs(pool.get_pool("users", **CONFIG), first)
+        self.assertIs(pool.get_pool("users"), first)
+
+    def test_raises_on_config_mismatch(self):
+        """Test that another database, size or timeout is refused."""
+        pool.get_pool("users", size=3, timeout=1.0, **CONFIG)
+        for kwargs in (
+            dict(CONFIG, database="other"),
+            dict(CONFIG, size=4),
+            dict(CONFIG, timeout=2.0),
+        ):
+            with self.assertRaises(ValueError):
+                pool.get_pool("users", **kwargs)
+
+    def test_other_names_get_other_pools(self):
+        """Test that a different pool name can use a different config."""
+        users = pool.get_pool("users", size=3, **CONFIG)
+        reports = pool.get_pool("reports", size=1, **dict(CONFIG, database="other"))
+        self.assertIsNot(users, reports)
+        self.assertEqual(set(pool.pool_metrics()), {"users", "reports"})
+
+
+class TestConnectionPool(unittest.TestCase):
+    """Test suite for ConnectionPool checkout / checkin."""
+
+    def setUp(self):
+        patcher = mock.patch(
+            "mysql.connector.connect",
+            side_effect=lambda **_: mock.MagicMock(in_transaction=False),
+        )
+        self.connect = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_is_the_seed_pool(self):
+        """Test that there is one pool implementation to fix."""
+        self.assertTrue(issubclass(pool.ConnectionPool, pool._seed.ConnectionPool))
+
+    def test_reuses_returned_connections(self):
+        """Test that a checked-in connection is handed out again."""
+        connections = pool.ConnectionPool("t", size=2, timeout=0.1, **CONFIG)
+        conn = connections.checkout()
+        connections.checkin(conn)
+        self.assertIs(connections.checkout(), conn)
+        self.assertEqual(self.connect.call_count, 1)
+        conn.reset_session.assert_called_once_with()
+
+    def test_rolls_back_open_transactions(self):
+        """Test that checkin rolls back what the borrower left open."""
+        connections = pool.ConnectionPool("t", size=1, timeout=0.1, **CONFIG)
+        conn = connections.checkout()
+        conn.in_transaction = True
+        connections.checkin(conn)
+        conn.rollback.assert_called_once_with()
+
+    def test_times_out_and_counts(self):
+        """Test that an exhausted pool raises PoolTimeout and records it."""
+        connections = pool.ConnectionPool("t", size=1, timeout=0.01, **CONFIG)
+        conn = connections.checkout()
+        with self.assertRaises(pool.PoolTimeout):
+            connections.checkout()
+        metrics = connections.metrics()
+        self.assertEqual((metrics["in_use"], metrics["checkouts"], metrics["timeouts"]), (1, 1, 1))
+        connections.checkin(conn)
+        self.assertEqual((connections.metrics()["in_use"], connections.metrics()["idle"]), (0, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
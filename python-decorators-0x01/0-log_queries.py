@@ -1,29 +1,104 @@
+import time
+import inspect
+import logging
 import functools
 import sqlite3
 from datetime import datetime
 
-def log_queries(func):
+from db import aiosqlite, iter_rows
+from profiler import profiler as default_profiler, logger
+
+_CONNECTION_TYPES = (sqlite3.Connection,) if aiosqlite is None \
+	else (sqlite3.Connection, aiosqlite.Connection)
+
+
+def _connection_and_sql(args, kwargs):
+	"""The connection passed first (if any) and the SQL of a call."""
+	conn = args[0] if args and isinstance(args[0], _CONNECTION_TYPES) else None
+	positional = args[1:] if conn is not None else args
+	if 'query' in kwargs:
+		return conn, kwargs['query']
+	return conn, positional[0] if positional else None
+
+def log_queries(func=None, *, profiler=None):
 	"""
-	Decorator that logs the SQL query before executing the wrapped function.
+	Decorator that profiles the SQL query executed by the wrapped function.
+	Instead of printing every statement, each sampled call's latency goes
+	into a per-fingerprint histogram (see profiler.py), with slow queries
+	logged; read it with profiler.snapshot(). The SQL itself is logged at
+	DEBUG level on the 'query_profiler' logger.
 	Assumes the SQL is passed in as either:
 	- a keyword argument named 'query', or
-	- the first positional argument.
+	- the first positional argument (after the connection, if any).
+	Coroutine functions are timed until they finish, not until they return
+	a coroutine. Generator functions (streaming fetchers) are timed only
+	while producing rows, not while the caller works on them, and are
+	recorded once the generator is exhausted or closed.
+	Use as @log_queries or @log_queries(profiler=QueryProfiler(...)).
 	"""
-	@functools.wraps(func)
-	def wrapper(*args, **kwargs):
-		# 1. Extract the SQL string
-		if 'query' in kwargs:
-			sql = kwargs['query']
-		elif args:
-			sql = args[0]
-		else:
-			sql = None
+	if func is None:
+		return lambda f: log_queries(f, profiler=profiler)
+	registry = profiler or default_profiler
+
+	def start(args, kwargs):
+		# 1. Extract the SQL string (and the connection, if one is passed)
+		conn, sql = _connection_and_sql(args, kwargs)
+		if logger.isEnabledFor(logging.DEBUG):
+			logger.debug("Executing SQL Query: %s", sql)
+		# EXPLAIN for slow queries needs a blocking sqlite3 connection
+		if not isinstance(conn, sqlite3.Connection):
+			conn = None
+		return conn, sql, time.perf_counter()
+
+	def finish(conn, sql, seconds):
+		if sql is not None:
+			registry.record(sql, seconds, conn)
 
-		# 2. Log it
-		print(f"[LOG] Executing SQL Query: {sql}")
+	if inspect.iscoroutinefunction(func):
+		@functools.wraps(func)
+		async def async_wrapper(*args, **kwargs):
+			if not registry.sampled():
+				return await func(*args, **kwargs)
+			conn, sql, started = start(args, kwargs)
+			try:
+				return await func(*args, **kwargs)
+			finally:
+				finish(conn, sql, time.perf_counter() - started)
+		return async_wrapper
 
-		# 3. Call the original function
-		return func(*args, **kwargs)
+	if inspect.isgeneratorfunction(func):
+		@functools.wraps(func)
+		def gen_wrapper(*args, **kwargs):
+			if not registry.sampled():
+				return (yield from func(*args, **kwargs))
+			conn, sql, started = start(args, kwargs)
+			rows = func(*args, **kwargs)
+			elapsed = 0.0
+			try:
+				while True:
+					try:
+						row = next(rows)
+					except StopIteration as stop:
+						return stop.value
+					finally:
+						elapsed += time.perf_counter() - started
+					yield row
+					started = time.perf_counter()
+			finally:
+				rows.close()
+				finish(conn, sql, elapsed)
+		return gen_wrapper
+
+	@functools.wraps(func)
+	def wrapper(*args, **kwargs):
+		if not registry.sampled():
+			return func(*args, **kwargs)
+		conn, sql, started = start(args, kwargs)
+		# 2. Call the original function, timing it
+		try:
+			return func(*args, **kwargs)
+		finally:
+			finish(conn, sql, time.perf_counter() - started)
 
 	return wrapper
 
@@ -36,5 +111,19 @@ def fetch_all_users(query):
     conn.close()
     return results
 
+@log_queries
+def stream_all_users(query, arraysize=500):
+	"""
+	Streaming fetch_all_users: yields rows, fetched `arraysize` at a time,
+	keeping the connection open until iteration ends.
+	"""
+	conn = sqlite3.connect('users.db')
+	try:
+		cursor = conn.cursor()
+		cursor.execute(query)
+		yield from iter_rows(cursor, arraysize)
+	finally:
+		conn.close()
+
 # …later in your code…
 users = fetch_all_users(query="SELECT * FROM users")
\ No newline at end of file
@@ -1,27 +1,26 @@
-import sqlite3
-import functools
+from db import with_db_connection
+from loader import batched_loader, in_clause
 
-def with_db_connection(func):
-	"""
-	Opens a SQLite connection (users.db), passes it as the first argument
-	to `func`, then closes it when done (even on error).
-	"""
-	@functools.wraps(func)
-	def wrapper(*args, **kwargs):
-		conn = sqlite3.connect('users.db')
-		try:
-			# Call the wrapped function, inserting conn at the front
-			return func(conn, *args, **kwargs)
-		finally:
-			conn.close()
-	return wrapper
-
-@with_db_connection 
+@with_db_connection(readonly=True)
 def get_user_by_id(conn, user_id):
 	cursor = conn.cursor()
 	cursor.execute("SELECT * FROM users WHERE id = ?", (user_id,))
 	return cursor.fetchone()
 
+
+@batched_loader
+@with_db_connection(readonly=True)
+def load_user_by_id(conn, user_ids):
+	"""
+	Batched get_user_by_id: ids looked up together cost one connection
+	and one IN query, e.g.
+	  with loader_scope():
+	    users = load_user_by_id.load_many(ids)
+	"""
+	cursor = conn.cursor()
+	cursor.execute(f"SELECT * FROM users WHERE id IN {in_clause(user_ids)}", user_ids)
+	return {row[0]: row for row in cursor.fetchall()}
+
 #### Fetch user by ID with automatic connection handling 
 user = get_user_by_id(user_id=1)
 print(user)
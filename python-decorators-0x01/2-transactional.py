@@ -1,39 +1,302 @@
-import sqlite3
+import time
+import queue
+import atexit
+import inspect
 import functools
+import threading
+from concurrent.futures import Future
 
-def with_db_connection(func):
+from db import with_db_connection, get_pool, connect
+from query_cache import track_tables, track_tables_async, invalidate_tables, WRITE_ACTIONS
+
+# Savepoint depth of connections currently inside @transactional
+_depths = {}
+_depths_lock = threading.Lock()
+
+
+def _enter(conn):
+	with _depths_lock:
+		depth = _depths.get(id(conn), 0)
+		_depths[id(conn)] = depth + 1
+		return depth
+
+
+def _leave(conn, depth):
+	with _depths_lock:
+		if depth:
+			_depths[id(conn)] = depth
+		else:
+			_depths.pop(id(conn), None)
+
+
+def transactional(func=None, *, batch=False, max_batch=500, max_delay=0.01, verbose=True):
 	"""
-	Opens 'users.db', passes the connection as the first arg to func,
-	then closes it when done (even on error).
+	Wraps a DB operation in a transaction:
+	• commit() if func succeeds
+	• rollback() if func raises an exception
+	After a commit, cached query results for the tables written to are
+	invalidated (see query_cache.py).
+
+	Nested @transactional calls on the same connection run inside a
+	SAVEPOINT instead: their failure rolls back only their own work, and
+	only the outermost call commits.
+
+	With batch=True the decorated function is called *without* a
+	connection: calls are queued to a GroupCommitter that runs up to
+	`max_batch` of them (or whatever arrives within `max_delay` seconds) in
+	one transaction, each in its own savepoint. The call returns its own
+	result, or raises its own error, once the batch has committed;
+	`.submit(...)` returns a Future instead of blocking.
+
+	Coroutine functions (on an aiosqlite connection) get the same commit,
+	rollback and savepoint handling; batch=True is for synchronous
+	functions only.
 	"""
+	if func is None:
+		return lambda f: transactional(
+			f, batch=batch, max_batch=max_batch, max_delay=max_delay, verbose=verbose
+		)
+	if inspect.iscoroutinefunction(func):
+		if batch:
+			raise TypeError("transactional(batch=True) needs a synchronous function")
+		return _async_transactional(func, verbose)
+	if batch:
+		return _batched(func, max_batch, max_delay)
+
 	@functools.wraps(func)
-	def wrapper(*args, **kwargs):
-		conn = sqlite3.connect('users.db')
+	def wrapper(conn, *args, **kwargs):
+		depth = _enter(conn)
 		try:
-			return func(conn, *args, **kwargs)
+			if depth:
+				return _in_savepoint(conn, depth, func, args, kwargs)
+			try:
+				if not conn.in_transaction:
+					# Explicit BEGIN, so releasing a nested savepoint can
+					# never commit the outer work on its own
+					conn.execute("BEGIN")
+				with track_tables(conn, WRITE_ACTIONS) as written:
+					result = func(conn, *args, **kwargs)
+				conn.commit()
+				if verbose:
+					print("[LOG] Transaction committed")
+				invalidate_tables(written)
+				return result
+			except Exception as e:
+				conn.rollback()
+				if verbose:
+					print(f"[LOG] Transaction rolled back due to: {e}")
+				raise
 		finally:
-			conn.close()
+			_leave(conn, depth)
 	return wrapper
 
-def transactional(func):
+
+def _in_savepoint(conn, depth, func, args, kwargs):
+	"""Run func inside SAVEPOINT sp_<depth>, undoing only its work on error."""
+	name = f"sp_{depth}"
+	conn.execute(f"SAVEPOINT {name}")
+	try:
+		result = func(conn, *args, **kwargs)
+	except BaseException:
+		conn.execute(f"ROLLBACK TO SAVEPOINT {name}")
+		conn.execute(f"RELEASE SAVEPOINT {name}")
+		raise
+	conn.execute(f"RELEASE SAVEPOINT {name}")
+	return result
+
+
+def _async_transactional(func, verbose):
+	@functools.wraps(func)
+	async def wrapper(conn, *args, **kwargs):
+		depth = _enter(conn)
+		try:
+			if depth:
+				return await _in_savepoint_async(conn, depth, func, args, kwargs)
+			try:
+				if not conn.in_transaction:
+					await conn.execute("BEGIN")
+				async with track_tables_async(conn, WRITE_ACTIONS) as written:
+					result = await func(conn, *args, **kwargs)
+				await conn.commit()
+				if verbose:
+					print("[LOG] Transaction committed")
+				invalidate_tables(written)
+				return result
+			except Exception as e:
+				await conn.rollback()
+				if verbose:
+					print(f"[LOG] Transaction rolled back due to: {e}")
+				raise
+		finally:
+			_leave(conn, depth)
+	return wrapper
+
+
+async def _in_savepoint_async(conn, depth, func, args, kwargs):
+	name = f"sp_{depth}"
+	await conn.execute(f"SAVEPOINT {name}")
+	try:
+		result = await func(conn, *args, **kwargs)
+	except BaseException:
+		await conn.execute(f"ROLLBACK TO SAVEPOINT {name}")
+		await conn.execute(f"RELEASE SAVEPOINT {name}")
+		raise
+	await conn.execute(f"RELEASE SAVEPOINT {name}")
+	return result
+
+
+class GroupCommitter:
 	"""
-	Wraps a DB operation in a transaction:
-	• commit() if func succeeds
-	• rollback() if func raises an exception
+	Coalesces many small write calls into few transactions on one
+	dedicated connection. A background thread takes queued calls, runs up
+	to `max_batch` of them (waiting at most `max_delay` seconds for the
+	batch to fill) in a single transaction with one savepoint per call,
+	commits once, then resolves every call's Future with its own result or
+	exception. If the commit itself fails, every call in the batch gets
+	that error; if the connection cannot be opened, every call submitted
+	to the committer does.
 	"""
-	@functools.wraps(func)
-	def wrapper(conn, *args, **kwargs):
+
+	def __init__(self, path=None, max_batch=500, max_delay=0.01):
+		self.path = path  # None: the pool's users.db, resolved on first use
+		self.max_batch = max_batch
+		self.max_delay = max_delay
+		self._queue = queue.Queue()
+		self._thread = None
+		self._lock = threading.Lock()
+		self._closed = False
+		self._error = None
+
+	def submit(self, func, *args, **kwargs):
+		"""Queue func(conn, *args, **kwargs); returns a Future."""
+		future = Future()
+		with self._lock:
+			if self._closed:
+				raise RuntimeError("GroupCommitter is closed")
+			if self._error is not None:
+				future.set_exception(self._error)
+				return future
+			if self._thread is None:
+				self._thread = threading.Thread(
+					target=self._run, name="group-commit", daemon=True
+				)
+				self._thread.start()
+				atexit.register(self.close)
+			self._queue.put((future, func, args, kwargs))
+		return future
+
+	def close(self):
+		"""Commit everything queued so far and stop the thread."""
+		with self._lock:
+			if self._closed:
+				return
+			self._closed = True
+			thread = self._thread
+		if thread is not None:
+			self._queue.put(None)
+			thread.join()
+
+	def _next_batch(self):
+		first = self._queue.get()
+		if first is None:
+			return None, True
+		batch = [first]
+		deadline = time.monotonic() + self.max_delay
+		while len(batch) < self.max_batch:
+			remaining = deadline - time.monotonic()
+			try:
+				if remaining > 0:
+					item = self._queue.get(timeout=remaining)
+				else:
+					item = self._queue.get_nowait()
+			except queue.Empty:
+				break
+			if item is None:
+				return batch, True
+			batch.append(item)
+		return batch, False
+
+	def _run(self):
+		try:
+			pool = get_pool()
+			conn = connect(self.path or pool.path, pool.profile, check_same_thread=False)
+		except Exception as e:
+			self._fail_all(e)
+			return
+		try:
+			stop = False
+			while not stop:
+				batch, stop = self._next_batch()
+				if batch:
+					self._commit(conn, batch)
+		finally:
+			conn.close()
+
+	def _fail_all(self, error):
+		"""Fail everything queued, and every later submit(), with `error`."""
+		with self._lock:
+			self._error = error
+		while True:
+			try:
+				item = self._queue.get_nowait()
+			except queue.Empty:
+				return
+			if item is not None:
+				_fail([item], error)
+
+	def _commit(self, conn, batch):
+		outcomes = []
+		# Nested @transactional calls inside func must use savepoints too
+		depth = _enter(conn)
 		try:
-			result = func(conn, *args, **kwargs)
+			conn.execute("BEGIN")
+			with track_tables(conn, WRITE_ACTIONS) as written:
+				for future, func, args, kwargs in batch:
+					if not future.set_running_or_notify_cancel():
+						outcomes.append(None)
+						continue
+					try:
+						outcomes.append((True, _in_savepoint(conn, 0, func, args, kwargs)))
+					except Exception as e:
+						outcomes.append((False, e))
 			conn.commit()
-			print("[LOG] Transaction committed")
-			return result
 		except Exception as e:
-			conn.rollback()
-			print(f"[LOG] Transaction rolled back due to: {e}")
-			raise
+			if conn.in_transaction:
+				conn.rollback()
+			_fail(batch, e)
+			return
+		finally:
+			_leave(conn, depth)
+		invalidate_tables(written)
+		for (future, *_), outcome in zip(batch, outcomes):
+			if outcome is None:
+				continue
+			ok, value = outcome
+			if ok:
+				future.set_result(value)
+			else:
+				future.set_exception(value)
+
+
+def _fail(batch, error):
+	"""Set `error` on every call in `batch` not yet resolved or cancelled."""
+	for future, *_ in batch:
+		if future.running() or future.set_running_or_notify_cancel():
+			future.set_exception(error)
+
+
+def _batched(func, max_batch, max_delay):
+	committer = GroupCommitter(max_batch=max_batch, max_delay=max_delay)
+
+	@functools.wraps(func)
+	def wrapper(*args, **kwargs):
+		return committer.submit(func, *args, **kwargs).result()
+
+	wrapper.submit = functools.partial(committer.submit, func)
+	wrapper.committer = committer
 	return wrapper
 
+
 @with_db_connection
 @transactional
 def update_user_email(conn, user_id, new_email):
@@ -44,6 +307,17 @@ def update_user_email(conn, user_id, new_email):
 	)
 	# no commit here — handled by @transactional
 
+
+@transactional(batch=True)
+def update_user_email_batched(conn, user_id, new_email):
+	"""
+	Same update, group-committed: for bulk changes submit many calls and
+	wait on the futures, e.g.
+	  futures = [update_user_email_batched.submit(i, e) for i, e in changes]
+	  for f in futures: f.result()
+	"""
+	conn.execute("UPDATE users SET email = ? WHERE id = ?", (new_email, user_id))
+
 if __name__ == '__main__':
 	# Example run: update user #1’s email
 	update_user_email(user_id=1, new_email='Crawford_Cartwright@hotmail.com')
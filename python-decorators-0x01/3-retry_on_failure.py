@@ -1,49 +1,247 @@
 import time
+import random
+import asyncio
+import inspect
 import sqlite3
 import functools
+import threading
 
-def with_db_connection(func):
+from db import with_db_connection, database_path, database_path_async
+
+# Errors that go away once the lock holder finishes: worth retrying
+RETRYABLE_MESSAGES = ("database is locked", "database table is locked", "busy")
+# Errors that mean the database cannot be reached at all: trip the breaker
+UNAVAILABLE_MESSAGES = ("unable to open database", "disk i/o error")
+
+
+class CircuitOpenError(sqlite3.OperationalError):
+	"""Raised instead of calling the database while the breaker is open."""
+
+
+def is_retryable(exc):
+	"""True for transient SQLite lock/busy errors."""
+	return isinstance(exc, sqlite3.OperationalError) \
+		and any(m in str(exc).lower() for m in RETRYABLE_MESSAGES)
+
+
+def is_unavailable(exc):
+	"""True for errors that mean the database cannot be used right now."""
+	return isinstance(exc, sqlite3.OperationalError) \
+		and any(m in str(exc).lower() for m in UNAVAILABLE_MESSAGES)
+
+
+class RetryBudget:
+	"""
+	Caps retries to a fraction of calls, so a struggling database is not
+	hit with a retry storm. Every call deposits `ratio` tokens, `min_per_sec`
+	tokens trickle in over time, the balance is capped at `capacity`, and
+	each retry spends one token.
+	"""
+
+	def __init__(self, ratio=0.2, min_per_sec=10.0, capacity=100.0):
+		self.ratio = ratio
+		self.min_per_sec = min_per_sec
+		self.capacity = capacity
+		self._tokens = capacity
+		self._updated = time.monotonic()
+		self._lock = threading.Lock()
+
+	def _refill(self, deposit=0.0):
+		now = time.monotonic()
+		self._tokens = min(
+			self.capacity,
+			self._tokens + deposit + (now - self._updated) * self.min_per_sec,
+		)
+		self._updated = now
+
+	def record_call(self):
+		with self._lock:
+			self._refill(self.ratio)
+
+	def try_spend(self):
+		"""Take a token for one retry; False if the budget is exhausted."""
+		with self._lock:
+			self._refill()
+			if self._tokens >= 1:
+				self._tokens -= 1
+				return True
+			return False
+
+
+class CircuitBreaker:
 	"""
-	Opens 'users.db', passes the conn as first arg to func,
-	then always closes it afterward.
+	Fails fast once the database looks persistently unavailable.
+	After `failure_threshold` consecutive failed calls the circuit opens and
+	calls raise CircuitOpenError for `reset_timeout` seconds; then one trial
+	call is let through (half-open), and its outcome closes or reopens it.
 	"""
-	@functools.wraps(func)
-	def wrapper(*args, **kwargs):
-		conn = sqlite3.connect('users.db')
-		try:
-			return func(conn, *args, **kwargs)
-		finally:
-			conn.close()
-	return wrapper
 
+	def __init__(self, failure_threshold=5, reset_timeout=5.0):
+		self.failure_threshold = failure_threshold
+		self.reset_timeout = reset_timeout
+		self._failures = 0
+		self._opened_at = None
+		self._trial = False
+		self._lock = threading.Lock()
 
-def retry_on_failure(retries=3, delay=2):
+	def before_call(self):
+		with self._lock:
+			if self._opened_at is None:
+				return
+			if self._trial or time.monotonic() - self._opened_at < self.reset_timeout:
+				raise CircuitOpenError("Circuit open: database unavailable, failing fast")
+			self._trial = True
+
+	def record_success(self):
+		with self._lock:
+			self._failures = 0
+			self._opened_at = None
+			self._trial = False
+
+	def record_ignored(self):
+		"""The call failed for a reason unrelated to availability."""
+		with self._lock:
+			if self._trial:
+				self._trial = False
+				self._opened_at = time.monotonic() - self.reset_timeout
+
+	def record_failure(self):
+		with self._lock:
+			self._failures += 1
+			if self._trial or self._failures >= self.failure_threshold:
+				self._opened_at = time.monotonic()
+			self._trial = False
+
+
+# Per-database defaults for every @retry_on_failure not given its own
+# budget or breaker: {database file: (RetryBudget, CircuitBreaker)}
+_guards = {}
+_guards_lock = threading.Lock()
+
+
+def guards_for(path):
 	"""
-	If the wrapped function raises, catch and retry up to `retries` times,
-	waiting `delay` seconds between attempts. Finally re-raises the last error.
+	The (RetryBudget, CircuitBreaker) shared by calls on the database at
+	`path`, so one failing database does not trip the breaker for others.
 	"""
+	with _guards_lock:
+		guards = _guards.get(path)
+		if guards is None:
+			guards = _guards[path] = (RetryBudget(), CircuitBreaker())
+		return guards
+
+
+def retry_on_failure(retries=3, delay=2, max_delay=30.0, retry_if=is_retryable,
+		budget=None, breaker=None, verbose=True):
+	"""
+	If the wrapped function raises a retryable error (see retry_if; by
+	default SQLite 'database is locked' / 'busy'), retry it up to `retries`
+	attempts in total (at least one) with exponential backoff and full
+	jitter: before attempt n it sleeps a random time in
+	[0, min(max_delay, delay * 2**(n-2))].
+	• other errors are re-raised immediately
+	• retries spend from a RetryBudget; once it is empty the error is
+	  re-raised without retrying
+	• a CircuitBreaker fails fast with CircuitOpenError after repeated
+	  failed calls (retryable or 'unavailable' errors)
+	• unless `budget` / `breaker` are given, both are shared per database
+	  file (guards_for) by every decorated function using it
+	• an open transaction is rolled back before each retry
+	Finally re-raises the last error. Coroutine functions are retried the
+	same way, backing off with asyncio.sleep.
+	The breaker only sees errors raised once the call has its connection:
+	@with_db_connection opens it outside this decorator, so a database
+	that cannot be opened at all fails there and is not counted.
+	"""
+	attempts = max(1, retries)
+	explicit = budget is not None and breaker is not None
+
+	def guards(path):
+		shared_budget, shared_breaker = guards_for(path)
+		return (
+			budget if budget is not None else shared_budget,
+			breaker if breaker is not None else shared_breaker,
+		)
+
+	def backoff(attempt, error, budget, breaker):
+		"""
+		Handle a failed attempt: re-raise if it should not be retried,
+		otherwise return how long to sleep before the next one.
+		"""
+		if not retry_if(error):
+			if is_unavailable(error):
+				breaker.record_failure()
+			else:
+				breaker.record_ignored()
+			raise error
+		if verbose:
+			print(f"[LOG] Attempt {attempt} failed: {error}")
+		if attempt == attempts or not budget.try_spend():
+			if verbose:
+				print(f"[LOG] Giving up after {attempt} attempts. Raising error.")
+			breaker.record_failure()
+			raise error
+		pause = random.uniform(0, min(max_delay, delay * 2 ** (attempt - 1)))
+		if verbose:
+			print(f"[LOG] Retrying in {pause:.3f}s…")
+		return pause
+
 	def decorator(func):
+		if inspect.iscoroutinefunction(func):
+			@functools.wraps(func)
+			async def async_wrapper(conn, *args, **kwargs):
+				call_budget, call_breaker = (budget, breaker) if explicit \
+					else guards(await database_path_async(conn))
+				call_breaker.before_call()
+				try:
+					call_budget.record_call()
+					for attempt in range(1, attempts + 1):
+						try:
+							result = await func(conn, *args, **kwargs)
+						except Exception as e:
+							pause = backoff(attempt, e, call_budget, call_breaker)
+							if getattr(conn, "in_transaction", False):
+								await conn.rollback()
+							await asyncio.sleep(pause)
+						else:
+							call_breaker.record_success()
+							return result
+				except Exception:
+					raise  # already recorded by backoff()
+				except BaseException:
+					call_breaker.record_ignored()  # cancelled: free a half-open trial
+					raise
+			return async_wrapper
+
 		@functools.wraps(func)
 		def wrapper(conn, *args, **kwargs):
-			last_exc = None
-			for attempt in range(1, retries + 1):
-				try:
-					return func(conn, *args, **kwargs)
-				except Exception as e:
-					last_exc = e
-					print(f"[LOG] Attempt {attempt} failed: {e}")
-					if attempt < retries:
-						print(f"[LOG] Retrying in {delay}s…")
-						time.sleep(delay)
-			# All attempts exhausted
-			print(f"[LOG] All {retries} retries failed. Raising error.")
-			raise last_exc
+			call_budget, call_breaker = (budget, breaker) if explicit \
+				else guards(database_path(conn))
+			call_breaker.before_call()
+			try:
+				call_budget.record_call()
+				for attempt in range(1, attempts + 1):
+					try:
+						result = func(conn, *args, **kwargs)
+					except Exception as e:
+						pause = backoff(attempt, e, call_budget, call_breaker)
+						if getattr(conn, "in_transaction", False):
+							conn.rollback()
+						time.sleep(pause)
+					else:
+						call_breaker.record_success()
+						return result
+			except Exception:
+				raise  # already recorded by backoff()
+			except BaseException:
+				call_breaker.record_ignored()  # interrupted: free a half-open trial
+				raise
 		return wrapper
 	return decorator
 
 
-@with_db_connection
-@retry_on_failure(retries=3, delay=1)
+@with_db_connection(readonly=True)
+@retry_on_failure(retries=3, delay=0.05)
 def fetch_users_with_retry(conn):
 	cursor = conn.cursor()
 	cursor.execute("SELECT * FROM users")
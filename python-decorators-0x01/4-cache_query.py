@@ -1,72 +1,279 @@
+import os
 import time
+import asyncio
+import inspect
 import sqlite3
 import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from db import (
+	with_db_connection, iter_rows, database_path, database_path_async,
+	readonly_connection, readonly_connection_async,
+)
+
+from query_cache import (
+	QueryCache, SingleFlight, track_tables, track_tables_async, estimate_size,
+	READ_ACTIONS, QUERY_CACHE_PATH,
+)
+from disk_cache import TwoTierCache
 
 # —————————————————————————————
 # Global cache store
 # —————————————————————————————
-query_cache = {}
+# LRU-bounded by entries and bytes; see query_cache.py. Writes made
+# through @transactional evict entries for the tables they touch.
+# Setting QUERY_CACHE_PATH backs it with an on-disk tier (disk_cache.py)
+# shared by every process on the host and kept across restarts.
+if QUERY_CACHE_PATH:
+	query_cache = TwoTierCache(QUERY_CACHE_PATH, max_entries=1024, max_bytes=64 * 1024 * 1024)
+else:
+	query_cache = QueryCache(max_entries=1024, max_bytes=64 * 1024 * 1024)
+# Largest streamed result that is buffered for the cache by default
+STREAM_CACHE_BYTES = 1024 * 1024
 
-# —————————————————————————————
-# 1) Connection decorator
-# —————————————————————————————
-def with_db_connection(func):
-	"""
-	Opens 'users.db', passes the conn as first arg to func,
-	then always closes it afterward.
-	"""
-	@functools.wraps(func)
-	def wrapper(*args, **kwargs):
-		conn = sqlite3.connect('users.db')
-		try:
-			return func(conn, *args, **kwargs)
-		finally:
-			conn.close()
-	return wrapper
+# Background stale-while-revalidate refreshes
+_refresh_executor = None
+_refresh_lock = threading.Lock()
+_refresh_tasks = set()  # keeps async refresh tasks alive until done
+
+def _refresher():
+	global _refresh_executor
+	with _refresh_lock:
+		if _refresh_executor is None:
+			_refresh_executor = ThreadPoolExecutor(
+				max_workers=2, thread_name_prefix="cache-refresh"
+			)
+		return _refresh_executor
+
+def _freeze(value):
+	"""Turn query parameters into something hashable for the cache key."""
+	if isinstance(value, (list, tuple)):
+		return tuple(_freeze(item) for item in value)
+	if isinstance(value, dict):
+		return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+	if isinstance(value, set):
+		return frozenset(_freeze(item) for item in value)
+	return value
 
 # —————————————————————————————
-# 2) Caching decorator
+# 1) Caching decorator
 # —————————————————————————————
-def cache_query(func):
+def cache_query(func=None, *, ttl=None, cache=None, max_result_bytes=None,
+		stale_while_revalidate=None):
 	"""
-	Caches the result of a query (keyed by the SQL string) so that
-	repeated calls with the same query return the cached result instantly.
+	Caches the result of a query, keyed by the function (source file and
+	qualified name), the database file, the SQL string and the remaining
+	arguments (the query parameters), so repeated calls
+	with the same query and parameters return the cached result instantly.
+	Use as @cache_query or @cache_query(ttl=seconds, cache=QueryCache(...)).
+	• concurrent misses for the same key are coalesced: one caller runs
+	  the query, the others wait for it and share its result or exception
+	• with stale_while_revalidate=seconds, an entry past its ttl is still
+	  returned for that long while one background refresh, on a read-only
+	  connection to the same database file, replaces it
+	• results larger than `max_result_bytes` are not cached
+	Generator functions (streaming fetchers) pass rows through as they
+	arrive, buffering a copy only while it stays under max_result_bytes
+	(default STREAM_CACHE_BYTES); a fully consumed stream under the cap is
+	cached and replayed on later calls; a stale one is replayed while a
+	background refresh streams the query again.
+	Coroutine functions share the same store: QueryCache never awaits and
+	holds its lock only for dictionary updates, so the event loop is not
+	blocked by it; a store whose lookups do I/O (TwoTierCache) is used
+	from a worker thread instead.
 	"""
-	@functools.wraps(func)
-	def wrapper(conn, *args, **kwargs):
-		# 1) Extract the SQL query string
+	if func is None:
+		return lambda f: cache_query(
+			f, ttl=ttl, cache=cache, max_result_bytes=max_result_bytes,
+			stale_while_revalidate=stale_while_revalidate,
+		)
+	store = cache if cache is not None else query_cache
+	# Not __module__, which is "__main__" when the file runs as a script
+	source = inspect.getsourcefile(func) or func.__code__.co_filename
+	name = f"{os.path.realpath(source)}:{func.__qualname__}"
+	flights = SingleFlight()
+	refreshing = set()
+	refreshing_lock = threading.Lock()
+
+	def cache_key(path, args, kwargs):
+		# 1) Extract the SQL query string and its parameters
 		if 'query' in kwargs:
 			sql = kwargs['query']
+			params = (args, {k: v for k, v in kwargs.items() if k != 'query'})
 		elif args:
 			sql = args[0]
+			params = (args[1:], kwargs)
 		else:
 			raise ValueError("cache_query: no SQL query provided")
+		return sql, (name, path, sql, _freeze(params))
 
+	def cached(sql, key):
 		# 2) Return cached if present
-		if sql in query_cache:
-			print(f"[CACHE] Returning cached result for query: {sql}")
-			return query_cache[sql]
-
-		# 3) Otherwise, execute and cache
-		result = func(conn, *args, **kwargs)
-		query_cache[sql] = result
-		print(f"[CACHE] Caching result for query: {sql}")
+		if stale_while_revalidate:
+			hit, result, stale = store.lookup_stale(key)
+		else:
+			(hit, result), stale = store.lookup(key), False
+		if hit:
+			state = "stale " if stale else ""
+			print(f"[CACHE] Returning {state}cached result for query: {sql}")
+		return hit, result, stale
+
+	def remember(sql, key, result, tables, version, max_size=max_result_bytes):
+		if store.store(key, result, tables, ttl=ttl, version=version,
+				max_size=max_size, stale=stale_while_revalidate):
+			print(f"[CACHE] Caching result for query: {sql}")
+
+	def start_refresh(key):
+		"""True if the caller should refresh `key` (nobody else is)."""
+		if not key[1]:
+			return False  # in-memory database: no other connection sees it
+		with refreshing_lock:
+			if key in refreshing:
+				return False
+			refreshing.add(key)
+			return True
+
+	def end_refresh(key):
+		with refreshing_lock:
+			refreshing.discard(key)
+
+	if inspect.isgeneratorfunction(func):
+		limit = STREAM_CACHE_BYTES if max_result_bytes is None else max_result_bytes
+
+		def stream(conn, sql, key, args, kwargs):
+			version = store.version()
+			buffered, size = [], estimate_size([])
+			with track_tables(conn, READ_ACTIONS) as tables:
+				for row in func(conn, *args, **kwargs):
+					if buffered is not None:
+						size += estimate_size(row) + 8  # + the list slot
+						if size > limit:
+							buffered = None  # too big: stream only
+						else:
+							buffered.append(row)
+					yield row
+			if buffered is not None:
+				remember(sql, key, buffered, tables, version, limit)
+
+		def refresh_stream(sql, key, args, kwargs):
+			try:
+				with readonly_connection(key[1]) as conn:
+					for _ in stream(conn, sql, key, args, kwargs):
+						pass
+			except Exception as e:
+				print(f"[CACHE] Background refresh failed for query: {sql}: {e}")
+			finally:
+				end_refresh(key)
+
+		@functools.wraps(func)
+		def gen_wrapper(conn, *args, **kwargs):
+			sql, key = cache_key(database_path(conn), args, kwargs)
+			hit, result, stale = cached(sql, key)
+			if hit:
+				if stale and start_refresh(key):
+					_refresher().submit(refresh_stream, sql, key, args, kwargs)
+				yield from result
+				return
+			yield from stream(conn, sql, key, args, kwargs)
+		gen_wrapper.cache = store
+		return gen_wrapper
+
+	if inspect.iscoroutinefunction(func):
+		async def off_loop(fn, *args):
+			if store.blocking:
+				return await asyncio.to_thread(fn, *args)
+			return fn(*args)
+
+		async def load_async(conn, sql, key, args, kwargs):
+			version = await off_loop(store.version)
+			async with track_tables_async(conn, READ_ACTIONS) as tables:
+				result = await func(conn, *args, **kwargs)
+			await off_loop(remember, sql, key, result, tables, version)
+			return result
+
+		async def refresh_async(sql, key, args, kwargs):
+			try:
+				async with readonly_connection_async(key[1]) as conn:
+					await flights.do_async(
+						key, lambda: load_async(conn, sql, key, args, kwargs)
+					)
+			except Exception as e:
+				print(f"[CACHE] Background refresh failed for query: {sql}: {e}")
+			finally:
+				end_refresh(key)
+
+		@functools.wraps(func)
+		async def async_wrapper(conn, *args, **kwargs):
+			sql, key = cache_key(await database_path_async(conn), args, kwargs)
+			hit, result, stale = await off_loop(cached, sql, key)
+			if hit:
+				if stale and start_refresh(key):
+					task = asyncio.get_running_loop().create_task(
+						refresh_async(sql, key, args, kwargs)
+					)
+					_refresh_tasks.add(task)
+					task.add_done_callback(_refresh_tasks.discard)
+				return result
+			return await flights.do_async(
+				key, lambda: load_async(conn, sql, key, args, kwargs)
+			)
+		async_wrapper.cache = store
+		return async_wrapper
+
+	def load(conn, sql, key, args, kwargs):
+		# 3) Otherwise, execute and cache, remembering the tables read
+		version = store.version()
+		with track_tables(conn, READ_ACTIONS) as tables:
+			result = func(conn, *args, **kwargs)
+		remember(sql, key, result, tables, version)
 		return result
 
+	def refresh(sql, key, args, kwargs):
+		try:
+			with readonly_connection(key[1]) as conn:
+				flights.do(key, lambda: load(conn, sql, key, args, kwargs))
+		except Exception as e:
+			print(f"[CACHE] Background refresh failed for query: {sql}: {e}")
+		finally:
+			end_refresh(key)
+
+	@functools.wraps(func)
+	def wrapper(conn, *args, **kwargs):
+		sql, key = cache_key(database_path(conn), args, kwargs)
+		hit, result, stale = cached(sql, key)
+		if hit:
+			if stale and start_refresh(key):
+				_refresher().submit(refresh, sql, key, args, kwargs)
+			return result
+		return flights.do(key, lambda: load(conn, sql, key, args, kwargs))
+
+	wrapper.cache = store
 	return wrapper
 
 # —————————————————————————————
-# 3) Decorated function
+# 2) Decorated function
 # —————————————————————————————
-@with_db_connection
+@with_db_connection(readonly=True)
 @cache_query
 def fetch_users_with_cache(conn, query):
 	cursor = conn.cursor()
 	cursor.execute(query)
 	return cursor.fetchall()
 
+@with_db_connection(readonly=True)
+@cache_query
+def stream_users_with_cache(conn, query, arraysize=500):
+	"""
+	Streaming fetch_users_with_cache: yields rows `arraysize` at a time
+	while holding the connection; small results are cached.
+	"""
+	cursor = conn.cursor()
+	cursor.execute(query)
+	yield from iter_rows(cursor, arraysize)
+
 # —————————————————————————————
-# 4) Demo
+# 3) Demo
 # —————————————————————————————
 if __name__ == '__main__':
 	# First call: not in cache yet
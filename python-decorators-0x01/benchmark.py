@@ -0,0 +1,442 @@
+"""
+Benchmarks for the python-decorators-0x01 decorators. Each benchmark
+builds its own throwaway users.db, so it can run anywhere.
+
+Usage:
+  python3 benchmark.py connections [--calls N] [--rows N]
+  python3 benchmark.py contention [--threads N] [--ops N] [--delay S] [--rounds N]
+  python3 benchmark.py group-commit [--updates N] [--batch N]
+  python3 benchmark.py loader [--ids N] [--repeat N]
+  python3 benchmark.py profile [--readers N] [--seconds S]
+  python3 benchmark.py warm-start [--queries N]
+"""
+import io
+import os
+import sys
+import time
+import random
+import sqlite3
+import argparse
+import contextlib
+import tempfile
+import functools
+import importlib
+import threading
+import statistics
+
+import db
+
+
+def create_users_db(path, rows=1000):
+	"""
+	Create a users table with `rows` synthetic users at `path`.
+	"""
+	conn = sqlite3.connect(path)
+	conn.execute("DROP TABLE IF EXISTS users")
+	conn.execute(
+		"CREATE TABLE users ("
+		"id INTEGER PRIMARY KEY, name TEXT NOT NULL, "
+		"email TEXT NOT NULL, age INTEGER NOT NULL)"
+	)
+	rng = random.Random(42)
+	conn.executemany(
+		"INSERT INTO users (id, name, email, age) VALUES (?, ?, ?, ?)",
+		[(i, f"User {i}", f"user{i}@example.com", rng.randint(18, 90))
+			for i in range(1, rows + 1)]
+	)
+	conn.commit()
+	conn.close()
+
+
+def latency_summary(samples):
+	"""
+	Mean, p50 and p99 of a list of durations in seconds, in microseconds.
+	"""
+	ordered = sorted(samples)
+	return {
+		"calls": len(ordered),
+		"mean_us": statistics.fmean(ordered) * 1e6,
+		"p50_us": ordered[len(ordered) // 2] * 1e6,
+		"p99_us": ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1e6,
+	}
+
+
+def _time_calls(func, calls, rows):
+	rng = random.Random(7)
+	samples = []
+	for _ in range(calls):
+		user_id = rng.randint(1, rows)
+		start = time.perf_counter()
+		func(user_id)
+		samples.append(time.perf_counter() - start)
+	return latency_summary(samples)
+
+
+def _report(name, summary):
+	print(
+		f"{name:<24} mean {summary['mean_us']:8.1f}us  "
+		f"p50 {summary['p50_us']:8.1f}us  p99 {summary['p99_us']:8.1f}us"
+	)
+
+
+def benchmark_connections(path, calls=5000, rows=1000):
+	"""
+	Per-call latency of a get_user_by_id lookup: connect-per-call (the old
+	with_db_connection) against the pooled decorator in both pool modes.
+	"""
+	def connect_per_call(user_id):
+		conn = sqlite3.connect(path)
+		try:
+			cursor = conn.cursor()
+			cursor.execute("SELECT * FROM users WHERE id = ?", (user_id,))
+			return cursor.fetchone()
+		finally:
+			conn.close()
+
+	@db.with_db_connection
+	def pooled(conn, user_id):
+		cursor = conn.cursor()
+		cursor.execute("SELECT * FROM users WHERE id = ?", (user_id,))
+		return cursor.fetchone()
+
+	results = {}
+	results["connect per call"] = _time_calls(connect_per_call, calls, rows)
+	for mode in ("shared", "thread"):
+		db.configure_pool(path=path, mode=mode)
+		results[f"pool ({mode})"] = _time_calls(pooled, calls, rows)
+	db.get_pool().close()
+	for name, summary in results.items():
+		_report(name, summary)
+	return results
+
+
+def fixed_delay_retry(retries, delay):
+	"""The original retry_on_failure: retry anything after a fixed sleep."""
+	def decorator(func):
+		@functools.wraps(func)
+		def wrapper(conn, *args, **kwargs):
+			for attempt in range(1, retries + 1):
+				try:
+					return func(conn, *args, **kwargs)
+				except Exception:
+					if attempt == retries:
+						raise
+					time.sleep(delay)
+		return wrapper
+	return decorator
+
+
+def _locked_update(conn, user_id, hold):
+	conn.execute("BEGIN IMMEDIATE")
+	conn.execute("UPDATE users SET age = age + 1 WHERE id = ?", (user_id,))
+	time.sleep(hold)
+	conn.execute("COMMIT")
+
+
+def _run_writers(path, write, threads, ops, rows):
+	"""
+	Run `threads` writers doing `ops` updates each, every writer on its own
+	connection with busy timeout 0 so lock conflicts surface as errors.
+	Returns (durations of every op, durations of the failed ones); a failed
+	op's duration is its time to failure, retries included.
+	"""
+	samples, failed = [], []
+	lock = threading.Lock()
+
+	def writer(seed):
+		rng = random.Random(seed)
+		conn = sqlite3.connect(path, timeout=0, isolation_level=None, check_same_thread=False)
+		local, local_failed = [], []
+		for _ in range(ops):
+			start = time.perf_counter()
+			try:
+				write(conn, rng.randint(1, rows))
+			except sqlite3.Error:
+				local_failed.append(time.perf_counter() - start)
+				if conn.in_transaction:
+					conn.rollback()
+				local.append(local_failed[-1])
+			else:
+				local.append(time.perf_counter() - start)
+		conn.close()
+		with lock:
+			samples.extend(local)
+			failed.extend(local_failed)
+
+	workers = [threading.Thread(target=writer, args=(i,)) for i in range(threads)]
+	for worker in workers:
+		worker.start()
+	for worker in workers:
+		worker.join()
+	return samples, failed
+
+
+def benchmark_contention(path, threads=8, ops=500, delay=0.02, hold=0.0005,
+		retries=10, rows=1000, rounds=3):
+	"""
+	Write contention on one SQLite file: the original fixed-delay retry
+	against retry_on_failure's jittered exponential backoff. Each strategy
+	runs `rounds` times, in alternating order, and the samples are pooled.
+	Latencies cover every operation, failed ones at their time to failure,
+	so giving up early does not flatter a strategy's tail.
+	"""
+	retry = importlib.import_module("3-retry_on_failure")
+	strategies = {
+		"fixed delay": fixed_delay_retry(retries, delay),
+		"backoff + jitter": retry.retry_on_failure(
+			retries=retries, delay=delay, max_delay=1.0, verbose=False,
+			budget=retry.RetryBudget(ratio=1.0, capacity=1000),
+			breaker=retry.CircuitBreaker(failure_threshold=10 ** 6),
+		),
+	}
+	names = list(strategies)
+	samples = {name: [] for name in names}
+	failed = {name: [] for name in names}
+	for round_ in range(rounds):
+		for name in names if round_ % 2 == 0 else reversed(names):
+			write = strategies[name](functools.partial(_locked_update, hold=hold))
+			done, errors = _run_writers(path, write, threads, ops, rows)
+			samples[name].extend(done)
+			failed[name].extend(errors)
+	results = {}
+	for name in names:
+		summary = latency_summary(samples[name])
+		results[name] = dict(summary, failed=len(failed[name]))
+		_report(name, summary)
+		line = f"{'':<24} failed {len(failed[name])} of {len(samples[name])}"
+		if failed[name]:
+			line += f", after {statistics.fmean(failed[name]) * 1e3:.1f}ms on average"
+		print(line)
+	return results
+
+
+def benchmark_group_commit(path, updates=2000, max_batch=500, rows=1000):
+	"""
+	Bulk email updates: one @transactional commit per update against
+	@transactional(batch=True) group commit.
+	"""
+	tx = importlib.import_module("2-transactional")
+	db.configure_pool(path=path)
+
+	def update(conn, user_id, new_email):
+		conn.execute("UPDATE users SET email = ? WHERE id = ?", (new_email, user_id))
+
+	per_call = db.with_db_connection(tx.transactional(update, verbose=False))
+	batched = tx.transactional(update, batch=True, max_batch=max_batch)
+	results = {}
+
+	start = time.perf_counter()
+	for i in range(updates):
+		per_call(i % rows + 1, f"single{i}@example.com")
+	results["commit per update"] = updates / (time.perf_counter() - start)
+
+	start = time.perf_counter()
+	futures = [
+		batched.submit(i % rows + 1, f"batched{i}@example.com") for i in range(updates)
+	]
+	for future in futures:
+		future.result()
+	results[f"group commit ({max_batch})"] = updates / (time.perf_counter() - start)
+	batched.committer.close()
+	db.get_pool().close()
+
+	for name, rate in results.items():
+		print(f"{name:<24} {rate:10.0f} updates/sec")
+	return results
+
+
+def benchmark_loader(path, ids=200, repeat=50, rows=1000):
+	"""
+	Resolving a list of user ids: get_user_by_id in a loop (one query per
+	id) against load_user_by_id.load_many (one IN query per batch).
+	"""
+	from loader import batched_loader, in_clause
+
+	db.configure_pool(path=path)
+
+	@db.with_db_connection
+	def get_user_by_id(conn, user_id):
+		cursor = conn.execute("SELECT * FROM users WHERE id = ?", (user_id,))
+		return cursor.fetchone()
+
+	@batched_loader
+	@db.with_db_connection
+	def load_user_by_id(conn, user_ids):
+		cursor = conn.execute(f"SELECT * FROM users WHERE id IN {in_clause(user_ids)}", user_ids)
+		return {row[0]: row for row in cursor.fetchall()}
+
+	rng = random.Random(7)
+	lists = [[rng.randint(1, rows) for _ in range(ids)] for _ in range(repeat)]
+	strategies = {
+		"loop get_user_by_id": lambda user_ids: [get_user_by_id(i) for i in user_ids],
+		"load_many": load_user_by_id.load_many,
+	}
+	results = {}
+	for name, resolve in strategies.items():
+		samples = []
+		for user_ids in lists:
+			start = time.perf_counter()
+			resolve(user_ids)
+			samples.append(time.perf_counter() - start)
+		results[name] = latency_summary(samples)
+	db.get_pool().close()
+	for name, summary in results.items():
+		_report(name, summary)
+	return results
+
+
+def benchmark_profiles(workdir, readers=4, seconds=3.0, rows=1000):
+	"""
+	Reader/writer throughput on users.db under each connection profile:
+	`readers` threads run aggregate queries on read-only connections while
+	one writer commits single-row updates, all for `seconds`.
+	"""
+	results = {}
+	for profile in db.PROFILES:
+		# journal_mode is stored in the file, so every profile gets its own
+		path = os.path.join(workdir, f"users-{profile}.db")
+		create_users_db(path, rows)
+		counts = {"reads": 0, "writes": 0, "errors": 0}
+		lock = threading.Lock()
+		deadline = time.monotonic() + seconds
+
+		def run(readonly, work):
+			conn = db.connect(path, profile, readonly, check_same_thread=False)
+			done = errors = 0
+			rng = random.Random()
+			while time.monotonic() < deadline:
+				try:
+					work(conn, rng)
+					done += 1
+				except sqlite3.OperationalError:
+					errors += 1
+					if conn.in_transaction:
+						conn.rollback()
+			conn.close()
+			with lock:
+				counts["reads" if readonly else "writes"] += done
+				counts["errors"] += errors
+
+		def read(conn, rng):
+			conn.execute(
+				"SELECT count(*), avg(age) FROM users WHERE age > ?", (rng.randint(18, 90),)
+			).fetchone()
+
+		def write(conn, rng):
+			conn.execute(
+				"UPDATE users SET age = ? WHERE id = ?",
+				(rng.randint(18, 90), rng.randint(1, rows)),
+			)
+			conn.commit()
+
+		threads = [threading.Thread(target=run, args=(True, read)) for _ in range(readers)]
+		threads.append(threading.Thread(target=run, args=(False, write)))
+		for thread in threads:
+			thread.start()
+		for thread in threads:
+			thread.join()
+		results[profile] = {name: count / seconds for name, count in counts.items()}
+		print(
+			f"{profile:<24} reads {results[profile]['reads']:9.0f}/s  "
+			f"writes {results[profile]['writes']:7.0f}/s  "
+			f"errors {results[profile]['errors']:5.0f}/s"
+		)
+	return results
+
+
+def benchmark_warm_start(workdir, queries=200, rows=1000):
+	"""
+	cache_query latency right after a restart: a cold in-memory cache and
+	a fresh TwoTierCache over the disk tier a previous "process" filled,
+	against steady-state memory hits.
+	"""
+	from query_cache import QueryCache
+	from disk_cache import TwoTierCache
+
+	cached = importlib.import_module("4-cache_query")
+	path = os.path.join(workdir, "users.db")
+	cache_path = os.path.join(workdir, "query_cache.db")
+	db.configure_pool(path=path)
+	sql = "SELECT * FROM users WHERE age = ? AND id > ?"
+	params = [(18 + i % 73, i) for i in range(queries)]
+
+	def fetcher(store):
+		@db.with_db_connection(readonly=True)
+		@cached.cache_query(cache=store)
+		def fetch(conn, query, age, after):
+			return conn.execute(query, (age, after)).fetchall()
+		return fetch
+
+	def timed(fetch):
+		samples = []
+		for age, after in params:
+			start = time.perf_counter()
+			fetch(sql, age, after)
+			samples.append(time.perf_counter() - start)
+		return latency_summary(samples)
+
+	results = {}
+	with contextlib.redirect_stdout(io.StringIO()):
+		timed(fetcher(TwoTierCache(cache_path)))  # the previous process
+		results["cold (memory only)"] = timed(fetcher(QueryCache()))
+		restarted = fetcher(TwoTierCache(cache_path))
+		results["warm start (disk tier)"] = timed(restarted)
+		results["steady state"] = timed(restarted)
+	db.get_pool(readonly=True).close()
+	for name, summary in results.items():
+		_report(name, summary)
+	return results
+
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description="Benchmark the users.db decorators.")
+	commands = parser.add_subparsers(dest="command", required=True)
+	connections = commands.add_parser("connections", help="with_db_connection latency")
+	connections.add_argument("--calls", type=int, default=5000)
+	connections.add_argument("--rows", type=int, default=1000)
+	contention = commands.add_parser("contention", help="retry_on_failure under write contention")
+	contention.add_argument("--threads", type=int, default=8)
+	contention.add_argument("--ops", type=int, default=500)
+	contention.add_argument("--delay", type=float, default=0.02)
+	contention.add_argument("--rows", type=int, default=1000)
+	contention.add_argument("--rounds", type=int, default=3)
+	group = commands.add_parser("group-commit", help="transactional batching")
+	group.add_argument("--updates", type=int, default=2000)
+	group.add_argument("--batch", type=int, default=500)
+	group.add_argument("--rows", type=int, default=1000)
+	batched = commands.add_parser("loader", help="batched get_user_by_id lookups")
+	batched.add_argument("--ids", type=int, default=200)
+	batched.add_argument("--repeat", type=int, default=50)
+	batched.add_argument("--rows", type=int, default=1000)
+	profile = commands.add_parser("profile", help="reader/writer throughput per connection profile")
+	profile.add_argument("--readers", type=int, default=4)
+	profile.add_argument("--seconds", type=float, default=3.0)
+	profile.add_argument("--rows", type=int, default=1000)
+	warm = commands.add_parser("warm-start", help="cache_query latency after a restart")
+	warm.add_argument("--queries", type=int, default=200)
+	warm.add_argument("--rows", type=int, default=1000)
+	args = parser.parse_args(argv)
+
+	with tempfile.TemporaryDirectory() as workdir:
+		if args.command == "profile":
+			benchmark_profiles(workdir, args.readers, args.seconds, args.rows)
+			return
+		path = os.path.join(workdir, "users.db")
+		create_users_db(path, args.rows)
+		if args.command == "connections":
+			benchmark_connections(path, args.calls, args.rows)
+		elif args.command == "contention":
+			benchmark_contention(
+				path, args.threads, args.ops, args.delay, rows=args.rows,
+				rounds=args.rounds,
+			)
+		elif args.command == "group-commit":
+			benchmark_group_commit(path, args.updates, args.batch, args.rows)
+		elif args.command == "warm-start":
+			benchmark_warm_start(workdir, args.queries, args.rows)
+		elif args.command == "loader":
+			benchmark_loader(path, args.ids, args.repeat, args.rows)
+
+
+if __name__ == "__main__":
+	sys.exit(main())
@@ -0,0 +1,479 @@
+import os
+import queue
+import pathlib
+import asyncio
+import inspect
+import sqlite3
+import weakref
+import functools
+import threading
+from contextlib import contextmanager, asynccontextmanager
+
+try:
+	import aiosqlite
+except ImportError:  # only needed by coroutine functions
+	aiosqlite = None
+
+DB_PATH = os.getenv("USERS_DB_PATH", "users.db")
+POOL_SIZE = int(os.getenv("USERS_DB_POOL_SIZE", 5))
+DB_PROFILE = os.getenv("USERS_DB_PROFILE", "performance")
+
+# PRAGMAs run on every new connection, by profile name
+PROFILES = {
+	# SQLite defaults: rollback journal, readers and the writer block each other
+	"default": {},
+	"performance": {
+		"journal_mode": "wal",       # readers never block the writer (and vice versa)
+		"synchronous": "normal",     # fsync at checkpoints only; safe with WAL
+		"cache_size": -64000,        # page cache in KiB (~64MB)
+		"mmap_size": 256 * 1024 * 1024,
+		"temp_store": "memory",
+	},
+}
+
+
+def profile_pragmas(profile=None, readonly=False):
+	"""
+	PRAGMA statements for `profile` (a PROFILES name or a dict; None means
+	USERS_DB_PROFILE). journal_mode is left out for read-only connections,
+	which cannot change it.
+	"""
+	settings = PROFILES[profile or DB_PROFILE] if not isinstance(profile, dict) else profile
+	return [
+		f"PRAGMA {name} = {value}" for name, value in settings.items()
+		if not (readonly and name == "journal_mode")
+	]
+
+
+def readonly_uri(path):
+	"""file: URI that opens `path` read-only."""
+	return pathlib.Path(path).resolve().as_uri() + "?mode=ro"
+
+
+class Connection(sqlite3.Connection):
+	"""sqlite3 connection that can carry attributes (database_path)."""
+
+
+def _main_file(rows):
+	# PRAGMA database_list rows are (seq, name, file); "" for :memory:
+	return next((file for _, name, file in rows if name == "main"), "")
+
+
+def database_path(conn):
+	"""
+	Resolved path of the file `conn` has open as its main database.
+	Read from the connection once by connect() and AsyncConnectionPool;
+	other connections are asked with PRAGMA database_list.
+	"""
+	path = getattr(conn, "database_path", None)
+	if path is None:
+		path = _main_file(conn.execute("PRAGMA database_list").fetchall())
+	return path
+
+
+async def database_path_async(conn):
+	"""database_path() for an aiosqlite connection."""
+	path = getattr(conn, "database_path", None)
+	if path is None:
+		async with conn.execute("PRAGMA database_list") as cursor:
+			path = _main_file(await cursor.fetchall())
+	return path
+
+
+def connect(path=None, profile=None, readonly=False, **kwargs):
+	"""
+	Open a users.db connection with the profile's PRAGMAs applied;
+	readonly=True opens it through a mode=ro URI.
+	"""
+	path = path or DB_PATH
+	kwargs.setdefault("factory", Connection)
+	if readonly:
+		conn = sqlite3.connect(readonly_uri(path), uri=True, **kwargs)
+	else:
+		conn = sqlite3.connect(path, **kwargs)
+	try:
+		for pragma in profile_pragmas(profile, readonly):
+			conn.execute(pragma)
+		if isinstance(conn, Connection):
+			conn.database_path = database_path(conn)
+	except BaseException:
+		conn.close()
+		raise
+	return conn
+
+
+class ConnectionPool:
+	"""
+	Reusable SQLite connections for users.db.
+	• mode='shared': up to `size` connections (check_same_thread=False),
+	  each lent to one thread at a time; acquire() waits up to `timeout`
+	  seconds for a free one
+	• mode='thread': one connection per thread, reused by that thread
+	Connections are rolled back on release, so uncommitted work never
+	leaks into the next borrower. They are opened with connect(), using
+	`profile`, and read-only if `readonly`.
+	"""
+
+	def __init__(self, path=DB_PATH, size=POOL_SIZE, mode="shared", timeout=30.0,
+			profile=None, readonly=False):
+		if mode not in ("shared", "thread"):
+			raise ValueError(f"Unknown pool mode: {mode!r}")
+		if size < 1:
+			raise ValueError("Pool size must be at least 1")
+		self.path = path
+		self.size = size
+		self.mode = mode
+		self.timeout = timeout
+		self.profile = profile
+		self.readonly = readonly
+		self.pid = os.getpid()
+		self._idle = queue.LifoQueue()
+		self._slots = threading.BoundedSemaphore(size)
+		self._local = threading.local()
+		self._all = []
+		self._lock = threading.Lock()
+
+	def _connect(self):
+		conn = connect(
+			self.path, self.profile, self.readonly,
+			check_same_thread=self.mode == "thread",
+		)
+		with self._lock:
+			self._all.append(conn)
+		return conn
+
+	def acquire(self):
+		"""Borrow a connection; give it back with release()."""
+		if self.mode == "thread":
+			conn = getattr(self._local, "conn", None)
+			if conn is None:
+				conn = self._local.conn = self._connect()
+			return conn
+		if not self._slots.acquire(timeout=self.timeout):
+			raise TimeoutError(
+				f"No connection to {self.path} available within {self.timeout}s"
+			)
+		try:
+			return self._idle.get_nowait()
+		except queue.Empty:
+			try:
+				return self._connect()
+			except BaseException:
+				self._slots.release()
+				raise
+
+	def release(self, conn):
+		"""Roll back anything left open and return the connection."""
+		try:
+			if conn.in_transaction:
+				conn.rollback()
+		except sqlite3.Error:
+			self._discard(conn)
+			conn = None
+		if self.mode == "thread":
+			if conn is None:
+				self._local.conn = None
+			return
+		if conn is not None:
+			self._idle.put(conn)
+		self._slots.release()
+
+	def _discard(self, conn):
+		with self._lock:
+			if conn in self._all:
+				self._all.remove(conn)
+		try:
+			conn.close()
+		except sqlite3.Error:
+			pass
+
+	@contextmanager
+	def connection(self):
+		"""with pool.connection() as conn: ..."""
+		conn = self.acquire()
+		try:
+			yield conn
+		finally:
+			self.release(conn)
+
+	def close(self):
+		"""Close every connection the pool has opened."""
+		with self._lock:
+			conns, self._all = self._all, []
+		for conn in conns:
+			try:
+				conn.close()
+			except sqlite3.Error:
+				pass
+
+
+# Process-wide pools: read-write (False) and read-only (True)
+_pools = {}
+_pool_settings = {}
+_pool_lock = threading.Lock()
+
+
+def configure_pool(path=None, size=None, mode=None, timeout=None, profile=None):
+	"""
+	Replace the process-wide pools. Unset arguments keep the defaults
+	(USERS_DB_PATH / USERS_DB_POOL_SIZE / USERS_DB_PROFILE environment
+	variables, 'shared'). Returns the read-write pool.
+	"""
+	global _pool_settings
+	with _pool_lock:
+		for pool in _pools.values():
+			if pool.pid == os.getpid():
+				pool.close()
+		_pools.clear()
+		_pool_settings = dict(
+			path=path or DB_PATH,
+			size=size or POOL_SIZE,
+			mode=mode or "shared",
+			timeout=timeout or 30.0,
+			profile=profile,
+		)
+	return get_pool()
+
+
+def get_pool(readonly=False):
+	"""
+	Return the process-wide read-write pool, or the read-only one used by
+	@with_db_connection(readonly=True). A forked child gets fresh pools.
+	"""
+	pool = _pools.get(readonly)
+	if pool is None or pool.pid != os.getpid():
+		with _pool_lock:
+			pool = _pools.get(readonly)
+			if pool is None or pool.pid != os.getpid():
+				pool = _pools[readonly] = ConnectionPool(readonly=readonly, **_pool_settings)
+	return pool
+
+
+class AsyncConnectionPool:
+	"""
+	aiosqlite counterpart of ConnectionPool (shared mode) for coroutine
+	functions: up to `size` connections, acquire() awaits up to `timeout`
+	seconds for a free one, and connections are rolled back on release.
+	Bound to the event loop it is first used on; see get_async_pool().
+	Close it with `await pool.aclose()` or `async with pool:` before the
+	loop ends: aiosqlite's worker threads are not daemons, so connections
+	left open keep the interpreter from exiting.
+	"""
+
+	def __init__(self, path=DB_PATH, size=POOL_SIZE, timeout=30.0, profile=None,
+			readonly=False):
+		if aiosqlite is None:
+			raise RuntimeError("aiosqlite is required for async database access")
+		if size < 1:
+			raise ValueError("Pool size must be at least 1")
+		self.path = path
+		self.size = size
+		self.timeout = timeout
+		self.profile = profile
+		self.readonly = readonly
+		self._idle = []
+		self._slots = asyncio.Semaphore(size)
+		self._all = []
+		self._closed = False
+
+	async def __aenter__(self):
+		return self
+
+	async def __aexit__(self, exc_type, exc_val, exc_tb):
+		await self.aclose()
+
+	async def acquire(self):
+		"""Borrow a connection; give it back with release()."""
+		if self._closed:
+			raise RuntimeError("AsyncConnectionPool is closed")
+		try:
+			await asyncio.wait_for(self._slots.acquire(), self.timeout)
+		except asyncio.TimeoutError:
+			raise TimeoutError(
+				f"No connection to {self.path} available within {self.timeout}s"
+			) from None
+		if self._idle:
+			return self._idle.pop()
+		try:
+			conn = await self._connect()
+		except BaseException:
+			self._slots.release()
+			raise
+		self._all.append(conn)
+		return conn
+
+	async def _connect(self):
+		if self.readonly:
+			conn = await aiosqlite.connect(readonly_uri(self.path), uri=True)
+		else:
+			conn = await aiosqlite.connect(self.path)
+		try:
+			for pragma in profile_pragmas(self.profile, self.readonly):
+				await conn.execute(pragma)
+			conn.database_path = await database_path_async(conn)
+		except BaseException:
+			await conn.close()
+			raise
+		return conn
+
+	async def release(self, conn):
+		"""Roll back anything left open and return the connection."""
+		try:
+			if conn.in_transaction:
+				await conn.rollback()
+		except (sqlite3.Error, ValueError):
+			if conn in self._all:
+				self._all.remove(conn)
+			try:
+				await conn.close()
+			except (sqlite3.Error, ValueError):
+				pass
+		else:
+			self._idle.append(conn)
+		self._slots.release()
+
+	@asynccontextmanager
+	async def connection(self):
+		"""async with pool.connection() as conn: ..."""
+		conn = await self.acquire()
+		try:
+			yield conn
+		finally:
+			await self.release(conn)
+
+	async def aclose(self):
+		"""
+		Close every connection the pool has opened; later acquire() calls
+		raise RuntimeError. Borrowed connections are closed too.
+		"""
+		self._closed = True
+		conns, self._all, self._idle = self._all, [], []
+		for conn in conns:
+			try:
+				await conn.close()
+			except (sqlite3.Error, ValueError):
+				pass
+
+
+# Per event loop: {readonly: AsyncConnectionPool}
+_async_pools = weakref.WeakKeyDictionary()
+
+
+def get_async_pool(readonly=False):
+	"""
+	Return the running event loop's async pool, created on first use with
+	the settings of the process-wide pool. Close the loop's pools with
+	`await close_async_pools()` (or `async with async_pools():`) before
+	the loop ends.
+	"""
+	pools = _async_pools.setdefault(asyncio.get_running_loop(), {})
+	pool = pools.get(readonly)
+	if pool is None:
+		sync_pool = get_pool()
+		pool = pools[readonly] = AsyncConnectionPool(
+			path=sync_pool.path, size=sync_pool.size, timeout=sync_pool.timeout,
+			profile=sync_pool.profile, readonly=readonly,
+		)
+	return pool
+
+
+async def close_async_pools():
+	"""Close and forget every async pool of the running event loop."""
+	pools = _async_pools.pop(asyncio.get_running_loop(), {})
+	for pool in pools.values():
+		await pool.aclose()
+
+
+@asynccontextmanager
+async def async_pools():
+	"""
+	async with async_pools(): ... closes the running loop's async pools
+	on exit; wrap the body of the coroutine passed to asyncio.run().
+	"""
+	try:
+		yield
+	finally:
+		await close_async_pools()
+
+
+def _same_file(left, right):
+	return os.path.realpath(left) == os.path.realpath(right)
+
+
+@contextmanager
+def readonly_connection(path):
+	"""
+	Borrow a read-only connection to the database file at `path`: from the
+	read-only pool if it serves that file, otherwise a new connection
+	(with the pool's profile) that is closed afterwards.
+	"""
+	pool = get_pool(readonly=True)
+	if _same_file(pool.path, path):
+		with pool.connection() as conn:
+			yield conn
+		return
+	conn = connect(path, pool.profile, readonly=True)
+	try:
+		yield conn
+	finally:
+		conn.close()
+
+
+@asynccontextmanager
+async def readonly_connection_async(path):
+	"""readonly_connection() for coroutines, over aiosqlite."""
+	pool = get_async_pool(readonly=True)
+	if _same_file(pool.path, path):
+		async with pool.connection() as conn:
+			yield conn
+		return
+	async with AsyncConnectionPool(path, size=1, profile=pool.profile, readonly=True) as own:
+		async with own.connection() as conn:
+			yield conn
+
+
+def iter_rows(cursor, arraysize=None):
+	"""
+	Yield the rows of an executed cursor, fetching `arraysize` (default
+	cursor.arraysize) at a time instead of all at once.
+	"""
+	if arraysize is not None:
+		cursor.arraysize = arraysize
+	while True:
+		rows = cursor.fetchmany()
+		if not rows:
+			return
+		yield from rows
+
+
+def with_db_connection(func=None, *, readonly=False):
+	"""
+	Borrows a users.db connection from the pool, passes it as the first
+	argument to `func`, then returns it to the pool (even on error).
+	Coroutine functions get an aiosqlite connection from the event loop's
+	AsyncConnectionPool instead (close it with close_async_pools() before
+	the loop ends). Generator functions keep the connection
+	until the caller finishes (or closes) the generator. Pure readers
+	should use @with_db_connection(readonly=True), which borrows from a
+	pool of read-only connections.
+	"""
+	if func is None:
+		return lambda f: with_db_connection(f, readonly=readonly)
+	if inspect.isgeneratorfunction(func):
+		@functools.wraps(func)
+		def gen_wrapper(*args, **kwargs):
+			with get_pool(readonly).connection() as conn:
+				return (yield from func(conn, *args, **kwargs))
+		return gen_wrapper
+	if inspect.iscoroutinefunction(func):
+		@functools.wraps(func)
+		async def async_wrapper(*args, **kwargs):
+			async with get_async_pool(readonly).connection() as conn:
+				return await func(conn, *args, **kwargs)
+		return async_wrapper
+
+	@functools.wraps(func)
+	def wrapper(*args, **kwargs):
+		with get_pool(readonly).connection() as conn:
+			return func(conn, *args, **kwargs)
+	return wrapper
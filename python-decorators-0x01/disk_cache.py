@@ -0,0 +1,457 @@
+import os
+import json
+import stat
+import time
+import marshal
+import sqlite3
+import hashlib
+import threading
+
+from query_cache import QueryCache, estimate_size
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+	key BLOB PRIMARY KEY,
+	value BLOB NOT NULL,
+	tables TEXT NOT NULL,
+	expires REAL,
+	stale_until REAL,
+	size INTEGER NOT NULL,
+	memory_size INTEGER NOT NULL,
+	accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed);
+CREATE TABLE IF NOT EXISTS entry_tables (
+	table_name TEXT NOT NULL,
+	key BLOB NOT NULL,
+	PRIMARY KEY (table_name, key)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS invalidations (
+	seq INTEGER PRIMARY KEY AUTOINCREMENT,
+	table_name TEXT NOT NULL,
+	at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS invalidations_table ON invalidations (table_name, at);
+"""
+
+# How long invalidation records are kept for other processes to pick up
+INVALIDATION_RETENTION = 3600.0
+# Read times are only rewritten when older than this, so most disk hits
+# stay read-only; eviction order is correspondingly coarse
+ACCESS_RESOLUTION = 60.0
+
+
+PLAIN_TYPES = (type(None), bool, int, float, complex, str, bytes)
+
+
+class UnsafeCacheFile(sqlite3.DatabaseError):
+	"""The cache file could be written by someone other than its owner."""
+
+
+def is_plain(value):
+	"""True for built-in scalars and containers of them, nothing else."""
+	if isinstance(value, PLAIN_TYPES):
+		return type(value) in PLAIN_TYPES
+	if type(value) in (list, tuple, set, frozenset):
+		return all(is_plain(item) for item in value)
+	if type(value) is dict:
+		return all(is_plain(k) and is_plain(v) for k, v in value.items())
+	return False
+
+
+def dumps(value):
+	"""
+	Serialize a query result with marshal. Only plain rows of built-in
+	types are accepted (ValueError otherwise): unlike pickle, reading them
+	back cannot run code, whoever wrote the file.
+	"""
+	if not is_plain(value):
+		raise ValueError("only built-in scalars and containers are cached on disk")
+	return b"m" + marshal.dumps(value)
+
+
+def loads(data):
+	if data[:1] != b"m":
+		raise ValueError("unsupported cache entry format")
+	return marshal.loads(data[1:])
+
+
+def _canonical(value):
+	# Type-tagged, order-independent form of a key; sets are sorted by
+	# their encoding so the result does not depend on hash randomization
+	if value is None or isinstance(value, (bool, int, float, str)):
+		return [type(value).__name__, value]
+	if isinstance(value, bytes):
+		return ["bytes", value.hex()]
+	if isinstance(value, (list, tuple)):
+		return [type(value).__name__, [_canonical(item) for item in value]]
+	if isinstance(value, (set, frozenset)):
+		items = [_canonical(item) for item in value]
+		return ["set", sorted(items, key=json.dumps)]
+	if isinstance(value, dict):
+		items = [[_canonical(k), _canonical(v)] for k, v in value.items()]
+		return ["dict", sorted(items, key=json.dumps)]
+	return [f"{type(value).__module__}.{type(value).__qualname__}", repr(value)]
+
+
+def hash_key(key):
+	"""
+	Fixed-size digest of a cache key, the same in every process (pickling
+	a set is not: its order follows the per-process hash seed).
+	"""
+	encoded = json.dumps(_canonical(key), separators=(",", ":"))
+	return hashlib.blake2b(encoded.encode(), digest_size=16).digest()
+
+
+def check_private(path):
+	"""
+	Create `path` (mode 0600) if missing, and raise UnsafeCacheFile unless
+	it is owned by this user and not writable by group or others.
+	"""
+	os.close(os.open(path, os.O_RDWR | os.O_CREAT, 0o600))
+	info = os.stat(path)
+	if info.st_uid != os.getuid() or info.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+		raise UnsafeCacheFile(
+			f"Refusing to use cache file {path}: it must be owned by this user "
+			"and not writable by group or others"
+		)
+
+
+class DiskCache:
+	"""
+	Query results in a local SQLite file (WAL), shared by every process
+	of the same user that opens the same path and kept across restarts.
+	The file is created private (0600) and refused if anyone else could
+	write it; entries are marshal data, never pickles.
+	• bounded by total serialized size, least recently read evicted
+	• expiry uses wall-clock time, so it holds across processes
+	• invalidate() deletes entries that read the given tables and logs
+	  the invalidation, so other processes can drop their in-memory
+	  copies (changes_since) and late stores of older reads are refused
+	"""
+
+	def __init__(self, path, max_bytes=256 * 1024 * 1024):
+		self.path = os.path.abspath(path)
+		self.max_bytes = max_bytes
+		self._conn = None
+		self._pid = None
+		self._lock = threading.RLock()
+		self._stores = 0
+
+	def _connection(self):
+		if self._conn is None or self._pid != os.getpid():
+			check_private(self.path)
+			conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False)
+			conn.execute("PRAGMA journal_mode = wal")
+			conn.execute("PRAGMA synchronous = normal")
+			conn.executescript(SCHEMA)
+			self._conn, self._pid = conn, os.getpid()
+		return self._conn
+
+	def data_version(self):
+		"""Changes whenever another connection has written to the file."""
+		with self._lock:
+			return self._connection().execute("PRAGMA data_version").fetchone()[0]
+
+	def get(self, key):
+		"""
+		Return (value, tables, expires, stale_until, memory_size), or None;
+		memory_size is the in-memory estimate given to store().
+		"""
+		digest = hash_key(key)
+		with self._lock:
+			conn = self._connection()
+			row = conn.execute(
+				"SELECT value, tables, expires, stale_until, memory_size, accessed "
+				"FROM entries WHERE key = ?",
+				(digest,),
+			).fetchone()
+			if row is None:
+				return None
+			value, tables, expires, stale_until, memory_size, accessed = row
+			now = time.time()
+			if stale_until is not None and stale_until <= now:
+				self._delete(conn, [digest])
+				conn.commit()
+				return None
+			if now - accessed > ACCESS_RESOLUTION:
+				conn.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, digest))
+				conn.commit()
+		tables = frozenset(tables.split(",")) if tables else frozenset()
+		return loads(value), tables, expires, stale_until, memory_size
+
+	def store(self, key, value, tables=(), ttl=None, stale=None, read_at=None,
+			max_size=None, memory_size=0):
+		"""
+		Persist `value`. Refused (False) if it is not plain data (dumps), is
+		over `max_size`, or one of `tables` was invalidated at or after
+		`read_at` (the time.time() at which the query started).
+		"""
+		try:
+			data = dumps(value)
+		except ValueError:
+			return False
+		if len(data) > self.max_bytes or (max_size is not None and len(data) > max_size):
+			return False
+		digest = hash_key(key)
+		tables = sorted(frozenset(table.lower() for table in tables))
+		now = time.time()
+		expires = now + ttl if ttl is not None else None
+		stale_until = expires + stale if expires is not None and stale else expires
+		with self._lock:
+			conn = self._connection()
+			with conn:
+				if read_at is not None and tables:
+					newest = conn.execute(
+						"SELECT max(at) FROM invalidations WHERE table_name IN "
+						f"({', '.join('?' * len(tables))})",
+						tables,
+					).fetchone()[0]
+					if newest is not None and newest >= read_at:
+						return False
+				self._delete(conn, [digest])
+				conn.execute(
+					"INSERT INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+					(digest, data, ",".join(tables), expires, stale_until, len(data),
+						memory_size, now),
+				)
+				conn.executemany(
+					"INSERT INTO entry_tables VALUES (?, ?)",
+					[(table, digest) for table in tables],
+				)
+			self._stores += 1
+			if self._stores % 64 == 0:
+				self.evict()
+		return True
+
+	def _delete(self, conn, digests):
+		for digest in digests:
+			conn.execute("DELETE FROM entries WHERE key = ?", (digest,))
+			conn.execute("DELETE FROM entry_tables WHERE key = ?", (digest,))
+
+	def invalidate(self, tables):
+		"""Drop entries that read any of `tables` and log the invalidation."""
+		tables = sorted({table.lower() for table in tables})
+		if not tables:
+			return
+		now = time.time()
+		marks = ", ".join("?" * len(tables))
+		with self._lock:
+			conn = self._connection()
+			with conn:
+				stale = [row[0] for row in conn.execute(
+					f"SELECT DISTINCT key FROM entry_tables WHERE table_name IN ({marks})",
+					tables,
+				)]
+				self._delete(conn, stale)
+				conn.executemany(
+					"INSERT INTO invalidations (table_name, at) VALUES (?, ?)",
+					[(table, now) for table in tables],
+				)
+
+	def last_invalidation(self):
+		"""Sequence number of the newest invalidation record."""
+		with self._lock:
+			row = self._connection().execute(
+				"SELECT max(seq) FROM invalidations"
+			).fetchone()
+		return row[0] or 0
+
+	def changes_since(self, seq):
+		"""Return (newest seq, tables invalidated after `seq`)."""
+		with self._lock:
+			rows = self._connection().execute(
+				"SELECT seq, table_name FROM invalidations WHERE seq > ?", (seq,)
+			).fetchall()
+		if not rows:
+			return seq, set()
+		return rows[-1][0], {table for _, table in rows}
+
+	def evict(self):
+		"""
+		Remove expired entries and old invalidation records, then the
+		least recently read entries while over max_bytes.
+		"""
+		now = time.time()
+		with self._lock:
+			conn = self._connection()
+			with conn:
+				expired = [row[0] for row in conn.execute(
+					"SELECT key FROM entries WHERE stale_until <= ?", (now,)
+				)]
+				self._delete(conn, expired)
+				conn.execute(
+					"DELETE FROM invalidations WHERE at < ?",
+					(now - INVALIDATION_RETENTION,),
+				)
+				total = conn.execute("SELECT total(size) FROM entries").fetchone()[0]
+				if total > self.max_bytes:
+					victims = []
+					for digest, size in conn.execute(
+						"SELECT key, size FROM entries ORDER BY accessed"
+					):
+						if total <= self.max_bytes:
+							break
+						victims.append(digest)
+						total -= size
+					self._delete(conn, victims)
+
+	def clear(self):
+		with self._lock:
+			conn = self._connection()
+			with conn:
+				conn.execute("DELETE FROM entries")
+				conn.execute("DELETE FROM entry_tables")
+
+	def stats(self):
+		with self._lock:
+			entries, size = self._connection().execute(
+				"SELECT count(*), total(size) FROM entries"
+			).fetchone()
+		return {"entries": entries, "bytes": int(size)}
+
+	def close(self):
+		with self._lock:
+			if self._conn is not None and self._pid == os.getpid():
+				self._conn.close()
+			self._conn = None
+
+
+_shared = {}
+_shared_lock = threading.Lock()
+
+
+def shared(path):
+	"""One DiskCache per file for this process's invalidation log writes."""
+	path = os.path.abspath(path)
+	with _shared_lock:
+		disk = _shared.get(path)
+		if disk is None:
+			disk = _shared[path] = DiskCache(path)
+		return disk
+
+
+class TwoTierCache(QueryCache):
+	"""
+	QueryCache (the memory tier) backed by a DiskCache at `path`.
+	Misses in memory are looked up on disk and, on a hit, promoted into
+	memory with their remaining TTL; stores go to both tiers. Before
+	each lookup the disk's data_version is checked, and invalidations
+	made by other processes are applied to the memory tier.
+	"""
+
+	blocking = True
+
+	def __init__(self, path, max_entries=1024, max_bytes=64 * 1024 * 1024, ttl=None,
+			disk_max_bytes=256 * 1024 * 1024):
+		super().__init__(max_entries=max_entries, max_bytes=max_bytes, ttl=ttl)
+		self.disk = DiskCache(path, max_bytes=disk_max_bytes)
+		self._stats["disk_hits"] = 0
+		self._seen_version = None
+		self._seen_seq = None
+
+	def _sync(self):
+		"""
+		Apply invalidations other processes logged since the last sync.
+		Runs before every lookup, version() and store(), so the first sync
+		always happens while the memory tier is still empty.
+		"""
+		try:
+			version = self.disk.data_version()
+		except sqlite3.Error:
+			return
+		if version == self._seen_version:
+			return
+		with self._lock:
+			try:
+				if self._seen_seq is None:
+					self._seen_seq = self.disk.last_invalidation()
+				else:
+					self._seen_seq, tables = self.disk.changes_since(self._seen_seq)
+					if tables:
+						QueryCache.invalidate_tables(self, tables)
+			except sqlite3.Error:
+				return
+			self._seen_version = version
+
+	def _lookup(self, key, count, stale_ok):
+		self._sync()
+		hit, value, stale = super()._lookup(key, False, stale_ok)
+		if not hit:
+			hit, value, stale = self._from_disk(key, stale_ok)
+		if count:
+			with self._lock:
+				if not hit:
+					self._stats["misses"] += 1
+				elif stale:
+					self._stats["stale_hits"] += 1
+				else:
+					self._stats["hits"] += 1
+		return hit, value, stale
+
+	def _from_disk(self, key, stale_ok):
+		try:
+			found = self.disk.get(key)
+		except (sqlite3.Error, ValueError, EOFError, TypeError):
+			return False, None, False
+		if found is None:
+			return False, None, False
+		value, tables, expires, stale_until, memory_size = found
+		now = time.time()
+		stale = expires is not None and expires <= now
+		if stale and not stale_ok:
+			return False, None, False
+		ttl = expires - now if expires is not None else None
+		window = stale_until - expires if expires is not None else None
+		if not stale:
+			super().store(
+				key, value, tables, ttl=ttl, stale=window, size=memory_size or None
+			)
+		with self._lock:
+			self._stats["disk_hits"] += 1
+		return True, value, stale
+
+	def version(self):
+		"""(memory version, wall-clock time) taken before a query runs."""
+		self._sync()
+		return super().version(), time.time()
+
+	def store(self, key, value, tables=(), ttl=None, version=None, max_size=None,
+			stale=None, size=None):
+		self._sync()
+		memory_version, read_at = version if version is not None else (None, None)
+		size = estimate_size(value) if size is None else size
+		stored = super().store(
+			key, value, tables, ttl=ttl, version=memory_version,
+			max_size=max_size, stale=stale, size=size,
+		)
+		if stored:
+			try:
+				self.disk.store(
+					key, value, tables, ttl=self.ttl if ttl is None else ttl,
+					stale=stale, read_at=read_at, max_size=max_size,
+					memory_size=size,
+				)
+			except sqlite3.Error:
+				pass  # the memory tier still has it
+		return stored
+
+	def invalidate_tables(self, tables):
+		super().invalidate_tables(tables)
+		try:
+			self.disk.invalidate(tables)
+		except sqlite3.Error:
+			pass
+
+	def clear(self):
+		super().clear()
+		self.disk.clear()
+
+	def stats(self):
+		stats = super().stats()
+		try:
+			disk = self.disk.stats()
+		except sqlite3.Error:
+			disk = {}
+		stats.update({f"disk_{name}": value for name, value in disk.items()})
+		return stats
@@ -0,0 +1,196 @@
+import functools
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# Loaders of the innermost open loader_scope(), keyed by BatchedLoader
+_scope = contextvars.ContextVar("loader_scope", default=None)
+
+
+def in_clause(keys):
+	"""'(?, ?, ?)' placeholder list for a WHERE ... IN query."""
+	return "(" + ", ".join("?" * len(keys)) + ")"
+
+
+class Pending:
+	"""
+	Result of DataLoader.load(). result() dispatches the loader's queued
+	keys (one batch query for all of them) if this key is not loaded yet,
+	and waits if another thread is already dispatching it.
+	"""
+
+	__slots__ = ("_loader", "_done", "_value", "_error", "_ready")
+
+	def __init__(self, loader):
+		self._loader = loader
+		self._done = False
+		self._value = None
+		self._error = None
+		self._ready = threading.Event()
+
+	def done(self):
+		return self._done
+
+	def _resolve(self, value=None, error=None):
+		self._value, self._error, self._done = value, error, True
+		self._ready.set()
+
+	def result(self):
+		if not self._done:
+			self._loader.dispatch()
+			self._ready.wait()  # in another thread's dispatch
+		if self._error is not None:
+			raise self._error
+		return self._value
+
+
+class DataLoader:
+	"""
+	Collects key lookups and resolves them together.
+	`batch_fn(keys)` takes a list of distinct keys and returns a mapping
+	key -> value; keys missing from it load as None. load() only queues a
+	key; the queue is sent to batch_fn (in chunks of `max_batch`) on
+	dispatch(), which the first Pending.result() triggers.
+	There is no event-loop tick to batch on here (the batch functions are
+	synchronous), so a batch is whatever was queued before that first
+	result(): use load_many() or a loader_scope() to group lookups.
+	• repeated keys are deduplicated
+	• with cache=True loaded values are kept for the loader's lifetime,
+	  so a key is fetched at most once per loader; errors are not cached
+	"""
+
+	def __init__(self, batch_fn, max_batch=500, cache=True):
+		self.batch_fn = batch_fn
+		self.max_batch = max_batch
+		self.cache = cache
+		self._pending = {}
+		self._queue = []
+		self._lock = threading.Lock()
+
+	def load(self, key):
+		"""Queue `key`; returns a Pending."""
+		with self._lock:
+			pending = self._pending.get(key)
+			if pending is None:
+				pending = self._pending[key] = Pending(self)
+				self._queue.append(key)
+			return pending
+
+	def load_many(self, keys):
+		"""Values for `keys`, in order, fetched in as few batches as possible."""
+		pendings = [self.load(key) for key in keys]
+		return [pending.result() for pending in pendings]
+
+	def prime(self, key, value):
+		"""Seed the cache with an already-known value."""
+		with self._lock:
+			if key not in self._pending:
+				pending = self._pending[key] = Pending(self)
+				pending._resolve(value)
+
+	def clear(self, key=None):
+		"""Forget one cached key, or all of them."""
+		with self._lock:
+			if key is None:
+				self._pending = {k: p for k, p in self._pending.items() if not p.done()}
+			elif key in self._pending and self._pending[key].done():
+				del self._pending[key]
+
+	def dispatch(self):
+		"""Resolve every queued key."""
+		with self._lock:
+			keys, self._queue = self._queue, []
+			batch = {key: self._pending[key] for key in keys}
+			if not self.cache:
+				for key in keys:
+					del self._pending[key]
+		for start in range(0, len(keys), self.max_batch):
+			chunk = keys[start:start + self.max_batch]
+			try:
+				values = self.batch_fn(chunk)
+			except Exception as e:
+				self._fail(batch, chunk, e)
+				continue
+			except BaseException as e:
+				# Interrupted: nothing left would ever resolve the waiters
+				self._fail(batch, keys[start:], e)
+				raise
+			for key in chunk:
+				batch[key]._resolve(values.get(key))
+
+	def _fail(self, batch, keys, error):
+		"""Resolve `keys` with `error`; errors are not cached."""
+		with self._lock:
+			for key in keys:
+				if self._pending.get(key) is batch[key]:
+					del self._pending[key]
+		for key in keys:
+			batch[key]._resolve(error=error)
+
+
+@contextmanager
+def loader_scope():
+	"""
+	A request scope: inside it every BatchedLoader uses one DataLoader
+	whose cache lives until the scope exits. Anything still queued is
+	dispatched on exit.
+	"""
+	loaders = {}
+	token = _scope.set(loaders)
+	try:
+		yield
+	finally:
+		_scope.reset(token)
+		for loader in loaders.values():
+			loader.dispatch()
+
+
+class BatchedLoader:
+	"""
+	Per-key front end for a batch reader, made with @batched_loader.
+	Inside loader_scope() lookups share the scope's cached DataLoader;
+	outside, each thread batches whatever is queued until the next
+	result() and caches nothing.
+	"""
+
+	def __init__(self, batch_fn, max_batch=500):
+		self.batch_fn = batch_fn
+		self.max_batch = max_batch
+		self._local = threading.local()
+		functools.update_wrapper(self, batch_fn)
+
+	def loader(self):
+		"""The DataLoader for the current scope (or thread)."""
+		loaders = _scope.get()
+		if loaders is not None:
+			loader = loaders.get(self)
+			if loader is None:
+				loader = loaders[self] = DataLoader(self.batch_fn, self.max_batch)
+			return loader
+		loader = getattr(self._local, "loader", None)
+		if loader is None:
+			loader = self._local.loader = DataLoader(
+				self.batch_fn, self.max_batch, cache=False
+			)
+		return loader
+
+	def load(self, key):
+		return self.loader().load(key)
+
+	def load_many(self, keys):
+		return self.loader().load_many(keys)
+
+	def __call__(self, key):
+		return self.load(key).result()
+
+
+def batched_loader(func=None, *, max_batch=500):
+	"""
+	Turns a batch reader `func(keys) -> {key: value}` (typically a
+	@with_db_connection function running one WHERE ... IN query) into a
+	BatchedLoader: loader(key), loader.load(key).result() and
+	loader.load_many(keys) all go through batched, deduplicated queries.
+	"""
+	if func is None:
+		return lambda f: BatchedLoader(f, max_batch)
+	return BatchedLoader(func, max_batch)
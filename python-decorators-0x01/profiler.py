@@ -0,0 +1,182 @@
+import re
+import json
+import math
+import time
+import random
+import logging
+import sqlite3
+import threading
+from functools import lru_cache
+
+logger = logging.getLogger("query_profiler")
+slow_logger = logging.getLogger("query_profiler.slow")
+
+_COMMENT = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=4096)
+def fingerprint(sql):
+	"""
+	Normalize a statement so that calls differing only in literal values
+	share one entry: comments dropped, strings and numbers replaced by ?,
+	IN lists collapsed, whitespace squeezed, lower-cased.
+	"""
+	sql = _COMMENT.sub(" ", sql)
+	sql = _STRING.sub("?", sql)
+	sql = _NUMBER.sub("?", sql)
+	sql = _IN_LIST.sub("(?+)", sql)
+	return _SPACE.sub(" ", sql).strip().rstrip(";").lower()
+
+
+class LatencyHistogram:
+	"""
+	Log2-bucketed latency histogram from 1µs to ~1 minute: constant
+	memory, O(1) record, percentiles accurate to within a factor of two.
+	"""
+
+	BUCKETS = 27
+
+	__slots__ = ("counts", "count", "total", "max")
+
+	def __init__(self):
+		self.counts = [0] * self.BUCKETS
+		self.count = 0
+		self.total = 0.0
+		self.max = 0.0
+
+	def record(self, seconds):
+		micros = seconds * 1e6
+		index = math.frexp(micros)[1] if micros >= 1 else 0
+		self.counts[min(index, self.BUCKETS - 1)] += 1
+		self.count += 1
+		self.total += seconds
+		if seconds > self.max:
+			self.max = seconds
+
+	def percentile(self, p):
+		"""Upper bound (seconds) of the bucket holding the p-th percentile."""
+		if not self.count:
+			return None
+		target = p / 100.0 * self.count
+		seen = 0
+		for index, n in enumerate(self.counts):
+			seen += n
+			if seen >= target and n:
+				return min(2 ** index / 1e6, self.max)
+		return self.max
+
+
+class QueryProfiler:
+	"""
+	Registry of per-fingerprint latency histograms.
+	• sample_rate: fraction of calls that are timed (others cost one
+	  random() call); snapshot counts are of sampled calls
+	• slow_threshold: sampled calls at least this slow (seconds) go to the
+	  'query_profiler.slow' logger and, if set, to slow_log_path as JSON lines
+	• explain: capture EXPLAIN QUERY PLAN for slow statements
+	• report_interval: log a summary at most every N seconds
+	"""
+
+	def __init__(self, sample_rate=1.0, slow_threshold=0.1, slow_log_path=None,
+			explain=False, report_interval=None):
+		self.sample_rate = sample_rate
+		self.slow_threshold = slow_threshold
+		self.slow_log_path = slow_log_path
+		self.explain = explain
+		self.report_interval = report_interval
+		self._histograms = {}
+		self._examples = {}
+		self._lock = threading.Lock()
+		self._last_report = time.monotonic()
+
+	def sampled(self):
+		"""Decide whether to time this call."""
+		return self.sample_rate >= 1.0 or random.random() < self.sample_rate
+
+	def record(self, sql, seconds, conn=None, params=None):
+		"""Add one timed execution of `sql`."""
+		key = fingerprint(sql)
+		with self._lock:
+			histogram = self._histograms.get(key)
+			if histogram is None:
+				histogram = self._histograms[key] = LatencyHistogram()
+				self._examples[key] = sql
+			histogram.record(seconds)
+		if self.slow_threshold is not None and seconds >= self.slow_threshold:
+			self._log_slow(sql, key, seconds, conn, params)
+		if self.report_interval is not None:
+			now = time.monotonic()
+			if now - self._last_report >= self.report_interval:
+				self._last_report = now
+				self.log_summary()
+
+	def _log_slow(self, sql, key, seconds, conn, params):
+		entry = {"fingerprint": key, "sql": sql, "ms": round(seconds * 1e3, 3)}
+		if self.explain:
+			entry["plan"] = self.explain_plan(sql, conn, params)
+		slow_logger.warning("slow query %.1fms: %s", seconds * 1e3, sql)
+		if self.slow_log_path:
+			with self._lock, open(self.slow_log_path, "a", encoding="utf-8") as log:
+				log.write(json.dumps(entry) + "\n")
+
+	@staticmethod
+	def explain_plan(sql, conn=None, params=None):
+		"""
+		Return EXPLAIN QUERY PLAN rows for `sql`, using `conn` if it is a
+		sqlite3 connection or a pooled read-only users.db connection otherwise.
+		Returns None if the plan cannot be produced (e.g. missing params).
+		"""
+		def plan(connection):
+			cursor = connection.execute(f"EXPLAIN QUERY PLAN {sql}", params or ())
+			return [row[-1] for row in cursor.fetchall()]
+
+		try:
+			if isinstance(conn, sqlite3.Connection):
+				return plan(conn)
+			from db import get_pool
+			with get_pool(readonly=True).connection() as pooled:
+				return plan(pooled)
+		except sqlite3.Error:
+			return None
+
+	def snapshot(self):
+		"""Per-fingerprint stats, slowest total time first."""
+		with self._lock:
+			items = [(k, h, self._examples[k]) for k, h in self._histograms.items()]
+		rows = []
+		for key, histogram, example in items:
+			rows.append({
+				"fingerprint": key,
+				"example": example,
+				"count": histogram.count,
+				"total_ms": histogram.total * 1e3,
+				"mean_ms": histogram.total / histogram.count * 1e3,
+				"p50_ms": histogram.percentile(50) * 1e3,
+				"p95_ms": histogram.percentile(95) * 1e3,
+				"p99_ms": histogram.percentile(99) * 1e3,
+				"max_ms": histogram.max * 1e3,
+			})
+		rows.sort(key=lambda row: row["total_ms"], reverse=True)
+		return rows
+
+	def log_summary(self, limit=10):
+		"""Log the `limit` most expensive fingerprints."""
+		for row in self.snapshot()[:limit]:
+			logger.info(
+				"%6d calls  total %9.1fms  p50 %7.2fms  p99 %7.2fms  %s",
+				row["count"], row["total_ms"], row["p50_ms"], row["p99_ms"],
+				row["fingerprint"],
+			)
+
+	def reset(self):
+		with self._lock:
+			self._histograms.clear()
+			self._examples.clear()
+
+
+# Process-wide default registry used by log_queries
+profiler = QueryProfiler()
@@ -0,0 +1,338 @@
+import os
+import sys
+import time
+import asyncio
+import sqlite3
+import weakref
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from contextlib import contextmanager, asynccontextmanager
+
+READ_ACTIONS = frozenset({sqlite3.SQLITE_READ})
+WRITE_ACTIONS = frozenset({
+	sqlite3.SQLITE_INSERT,
+	sqlite3.SQLITE_UPDATE,
+	sqlite3.SQLITE_DELETE,
+	sqlite3.SQLITE_DROP_TABLE,
+})
+
+# Every live QueryCache, so writes can invalidate all of them
+_caches = weakref.WeakSet()
+
+# Optional disk tier shared by every process on the host (disk_cache.py);
+# off unless set. Writes are logged there even by processes that cache
+# nothing themselves, so readers elsewhere drop what they changed.
+QUERY_CACHE_PATH = os.getenv("QUERY_CACHE_PATH", "")
+
+
+# Active track_tables() trackers, [(actions, tables), ...] by id(conn);
+# an entry only exists while a tracker is open on that connection
+_trackers = {}
+_trackers_lock = threading.Lock()
+
+
+def _table_authorizer(trackers):
+	def authorizer(action, arg1, arg2, db_name, trigger):
+		if arg1 and not arg1.startswith("sqlite_"):
+			for actions, tables in trackers:
+				if action in actions:
+					tables.add(arg1.lower())
+		return sqlite3.SQLITE_OK
+	return authorizer
+
+
+def _push_tracker(conn, tracker):
+	"""Open `tracker` on `conn`; returns the authorizer to install."""
+	with _trackers_lock:
+		trackers = _trackers.get(id(conn))
+		if trackers is None:
+			trackers = _trackers[id(conn)] = []
+		trackers.append(tracker)
+		return _table_authorizer(trackers)
+
+
+def _pop_tracker(conn, tracker):
+	"""Close `tracker`; True if it was the last one open on `conn`."""
+	with _trackers_lock:
+		trackers = _trackers[id(conn)]
+		del trackers[next(i for i, t in enumerate(trackers) if t is tracker)]
+		if trackers:
+			return False
+		del _trackers[id(conn)]
+		return True
+
+
+@contextmanager
+def track_tables(conn, actions):
+	"""
+	Collect the names of the tables that statements run on `conn` touch
+	with the given SQLite authorizer actions (READ_ACTIONS/WRITE_ACTIONS).
+	Yields the set, which is filled in as statements are prepared.
+	Nested trackers on one connection (a cached read inside a
+	transaction) each see every statement run while they are open.
+	"""
+	tables = set()
+	tracker = (actions, tables)
+
+	# Setting an authorizer expires cached statements, so they are
+	# re-prepared (and reported) even if they were run before
+	conn.set_authorizer(_push_tracker(conn, tracker))
+	try:
+		yield tables
+	finally:
+		if _pop_tracker(conn, tracker):
+			conn.set_authorizer(None)
+
+
+async def _set_authorizer_async(conn, authorizer):
+	if hasattr(conn, "set_authorizer"):
+		await conn.set_authorizer(authorizer)
+	else:  # aiosqlite before set_authorizer was added
+		await conn._execute(conn._conn.set_authorizer, authorizer)
+
+
+@asynccontextmanager
+async def track_tables_async(conn, actions):
+	"""track_tables for an aiosqlite connection."""
+	tables = set()
+	tracker = (actions, tables)
+	await _set_authorizer_async(conn, _push_tracker(conn, tracker))
+	try:
+		yield tables
+	finally:
+		if _pop_tracker(conn, tracker):
+			await _set_authorizer_async(conn, None)
+
+
+def invalidate_tables(tables):
+	"""
+	Drop entries that read any of `tables` from every QueryCache, and log
+	the invalidation in the QUERY_CACHE_PATH disk cache if no cache here
+	already did.
+	"""
+	logged = set()
+	for cache in list(_caches):
+		cache.invalidate_tables(tables)
+		disk = getattr(cache, "disk", None)
+		if disk is not None:
+			logged.add(disk.path)
+	if QUERY_CACHE_PATH and os.path.abspath(QUERY_CACHE_PATH) not in logged:
+		import disk_cache  # imports this module
+		try:
+			disk_cache.shared(QUERY_CACHE_PATH).invalidate(tables)
+		except sqlite3.Error:
+			pass
+
+
+def estimate_size(value):
+	"""Approximate deep size in bytes of a query result."""
+	size = sys.getsizeof(value)
+	if isinstance(value, (list, tuple, set, frozenset)):
+		size += sum(estimate_size(item) for item in value)
+	elif isinstance(value, dict):
+		size += sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+	return size
+
+
+class SingleFlight:
+	"""
+	Coalesces concurrent calls for the same key: the first caller runs
+	the function, callers arriving while it runs wait for it and share its
+	result or exception instead of running it again.
+	"""
+
+	def __init__(self):
+		self._calls = {}
+		self._lock = threading.Lock()
+
+	def do(self, key, func):
+		"""Return func(), or the result of the identical call in flight."""
+		with self._lock:
+			call = self._calls.get(key)
+			leader = call is None
+			if leader:
+				call = self._calls[key] = Future()
+		if not leader:
+			return call.result()
+		try:
+			result = func()
+		except BaseException as e:
+			call.set_exception(e)
+			raise
+		else:
+			call.set_result(result)
+			return result
+		finally:
+			with self._lock:
+				del self._calls[key]
+
+	async def do_async(self, key, func):
+		"""do() for a coroutine function; waiters share the event loop's call."""
+		loop = asyncio.get_running_loop()
+		key = (id(loop), key)
+		with self._lock:
+			call = self._calls.get(key)
+			leader = call is None
+			if leader:
+				call = self._calls[key] = loop.create_future()
+		if not leader:
+			return await asyncio.shield(call)
+		try:
+			result = await func()
+		except BaseException as e:
+			call.set_exception(e)
+			call.exception()  # mark retrieved when nobody was waiting
+			raise
+		else:
+			call.set_result(result)
+			return result
+		finally:
+			with self._lock:
+				del self._calls[key]
+
+
+class _Entry:
+	__slots__ = ("value", "size", "expires", "stale_until", "tables")
+
+	def __init__(self, value, size, expires, stale_until, tables):
+		self.value = value
+		self.size = size
+		self.expires = expires
+		self.stale_until = stale_until
+		self.tables = tables
+
+
+class QueryCache:
+	"""
+	Thread-safe LRU cache for query results.
+	• bounded by entry count and by approximate total size in bytes
+	• optional time-to-live, per cache or per entry, plus an optional
+	  window after it in which the entry may still be served stale
+	  (lookup_stale) while it is refreshed
+	• entries remember the tables they read, so writes to those tables
+	  (see invalidate_tables) evict them
+	"""
+
+	# True if lookups and stores may block on I/O (see cache_query)
+	blocking = False
+
+	def __init__(self, max_entries=1024, max_bytes=64 * 1024 * 1024, ttl=None):
+		self.max_entries = max_entries
+		self.max_bytes = max_bytes
+		self.ttl = ttl
+		self._entries = OrderedDict()
+		self._bytes = 0
+		self._lock = threading.RLock()
+		self._table_versions = {}
+		self._version = 0
+		self._stats = dict.fromkeys(
+			("hits", "stale_hits", "misses", "evictions", "expirations", "invalidations"), 0
+		)
+		_caches.add(self)
+
+	def __len__(self):
+		return len(self._entries)
+
+	def __contains__(self, key):
+		return self.lookup(key, count=False)[0]
+
+	def lookup(self, key, count=True):
+		"""Return (hit, value); expired entries count as misses."""
+		hit, value, _ = self._lookup(key, count, stale_ok=False)
+		return hit, value
+
+	def lookup_stale(self, key):
+		"""
+		Return (hit, value, stale): like lookup(), but an entry past its
+		TTL and still inside its stale window is a hit with stale=True.
+		"""
+		return self._lookup(key, True, stale_ok=True)
+
+	def _lookup(self, key, count, stale_ok):
+		with self._lock:
+			entry = self._entries.get(key)
+			stale = False
+			if entry is not None and entry.expires is not None:
+				now = time.monotonic()
+				if entry.stale_until <= now:
+					self._remove(key)
+					self._stats["expirations"] += 1
+					entry = None
+				elif entry.expires <= now:
+					stale = True
+					if not stale_ok:
+						entry = None
+			if entry is None:
+				if count:
+					self._stats["misses"] += 1
+				return False, None, False
+			self._entries.move_to_end(key)
+			if count:
+				self._stats["stale_hits" if stale else "hits"] += 1
+			return True, entry.value, stale
+
+	def version(self):
+		"""
+		Token to take before running a query; pass it to store() so a
+		result read before a concurrent write is not cached after it.
+		"""
+		with self._lock:
+			return self._version
+
+	def store(self, key, value, tables=(), ttl=None, version=None, max_size=None,
+			stale=None, size=None):
+		"""
+		Cache `value`, evicting least recently used entries as needed.
+		Values larger than `max_size` (or the whole cache) are not cached.
+		`stale` is how many seconds after the TTL lookup_stale() may still
+		return the value; `size` skips estimate_size() when already known.
+		"""
+		tables = frozenset(table.lower() for table in tables)
+		size = estimate_size(value) if size is None else size
+		ttl = self.ttl if ttl is None else ttl
+		with self._lock:
+			if version is not None and any(
+				self._table_versions.get(table, 0) > version for table in tables
+			):
+				return False
+			if size > self.max_bytes or (max_size is not None and size > max_size):
+				return False
+			if key in self._entries:
+				self._remove(key)
+			expires = time.monotonic() + ttl if ttl is not None else None
+			stale_until = expires + stale if expires is not None and stale else expires
+			self._entries[key] = _Entry(value, size, expires, stale_until, tables)
+			self._bytes += size
+			while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+				self._remove(next(iter(self._entries)))
+				self._stats["evictions"] += 1
+			return True
+
+	def _remove(self, key):
+		entry = self._entries.pop(key)
+		self._bytes -= entry.size
+
+	def invalidate_tables(self, tables):
+		"""Drop every entry that read one of `tables`."""
+		tables = {table.lower() for table in tables}
+		if not tables:
+			return
+		with self._lock:
+			self._version += 1
+			for table in tables:
+				self._table_versions[table] = self._version
+			stale = [key for key, entry in self._entries.items() if entry.tables & tables]
+			for key in stale:
+				self._remove(key)
+			self._stats["invalidations"] += len(stale)
+
+	def clear(self):
+		with self._lock:
+			self._entries.clear()
+			self._bytes = 0
+
+	def stats(self):
+		"""Hit/miss/eviction counters plus current entries and bytes."""
+		with self._lock:
+			return dict(self._stats, entries=len(self._entries), bytes=self._bytes)
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+test_benchmark.py
+
+Unit tests for benchmark.py:
+- _run_writers accounting of failed operations
+"""
+
+import os
+import sqlite3
+import tempfile
+import unittest
+
+import benchmark
+
+
+class TestRunWriters(unittest.TestCase):
+    """Test suite for _run_writers."""
+
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.workdir.cleanup)
+        self.path = os.path.join(self.workdir.name, "users.db")
+        sqlite3.connect(self.path).close()
+
+    def test_failed_operations_are_samples_too(self):
+        """Test that giving up still counts as a (timed) operation."""
+        calls = []
+
+        def write(conn, user_id):
+            calls.append(user_id)
+            if len(calls) % 2:
+                raise sqlite3.OperationalError("database is locked")
+
+        samples, failed = benchmark._run_writers(self.path, write, threads=1, ops=10, rows=5)
+        self.assertEqual(len(samples), 10)
+        self.assertEqual(len(failed), 5)
+        self.assertTrue(set(failed) <= set(samples))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+test_cache_query.py
+
+Unit tests for 4-cache_query.py:
+- cache_query keys and stale-while-revalidate refreshes
+"""
+
+import asyncio
+import os
+import sqlite3
+import tempfile
+import time
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+
+import db
+from query_cache import QueryCache
+
+cache_query = __import__('4-cache_query').cache_query
+
+
+def make_db(path, ages):
+    """Create a users table at `path` holding one user per age."""
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, age INTEGER)")
+    conn.executemany("INSERT INTO users (age) VALUES (?)", [(a,) for a in ages])
+    conn.commit()
+    conn.close()
+
+
+def set_ages(path, age):
+    """Overwrite every user's age in the database at `path`."""
+    conn = sqlite3.connect(path)
+    conn.execute("UPDATE users SET age = ?", (age,))
+    conn.commit()
+    conn.close()
+
+
+def wait_for_fresh(store, timeout=5.0):
+    """Wait until every entry in `store` is fresh again; return them."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        entries = {key: store.lookup(key, count=False) for key in list(store._entries)}
+        if entries and all(hit for hit, _ in entries.values()):
+            return {key: value for key, (_, value) in entries.items()}
+        time.sleep(0.01)
+    raise AssertionError("background refresh did not finish")
+
+
+class TestStaleWhileRevalidate(unittest.TestCase):
+    """Test suite for refreshes of entries from a non-default database."""
+
+    def setUp(self):
+        """Create a default database and another one, pointing the pool at the first."""
+        self.workdir = tempfile.TemporaryDirectory()
+        self.default = os.path.join(self.workdir.name, "default.db")
+        self.other = os.path.join(self.workdir.name, "other.db")
+        make_db(self.default, [20, 30])
+        make_db(self.other, [40, 50, 60])
+        db.configure_pool(path=self.default)
+        self.store = QueryCache()
+        self.output = redirect_stdout(StringIO())
+        self.output.__enter__()
+
+    def tearDown(self):
+        """Close the pools and remove the databases."""
+        self.output.__exit__(None, None, None)
+        db.get_pool().close()
+        db.get_pool(readonly=True).close()
+        self.workdir.cleanup()
+
+    def test_refresh_uses_the_entry_database(self):
+        """Test that a sync refresh re-reads the database the entry came from."""
+        @cache_query(cache=self.store, ttl=0.05, stale_while_revalidate=60)
+        def ages(conn, query):
+            return conn.execute(query).fetchall()
+
+        conn = db.connect(self.other, readonly=True)
+        sql = "SELECT age FROM users ORDER BY id"
+        self.assertEqual(ages(conn, sql), [(40,), (50,), (60,)])
+        set_ages(self.other, 99)
+        time.sleep(0.06)
+        self.assertEqual(ages(conn, sql), [(40,), (50,), (60,)])  # stale
+        conn.close()
+        self.assertEqual(list(wait_for_fresh(self.store).values()), [[(99,)] * 3])
+
+    def test_generator_stale_entry_is_refreshed(self):
+        """Test that a stale streamed entry is refreshed in the background."""
+        @cache_query(cache=self.store, ttl=0.05, stale_while_revalidate=60)
+        def ages(conn, query):
+            yield from conn.execute(query)
+
+        conn = db.connect(self.other, readonly=True)
+        sql = "SELECT age FROM users ORDER BY id"
+        self.assertEqual(list(ages(conn, sql)), [(40,), (50,), (60,)])
+        set_ages(self.other, 7)
+        time.sleep(0.06)
+        self.assertEqual(list(ages(conn, sql)), [(40,), (50,), (60,)])  # stale
+        conn.close()
+        self.assertEqual(list(wait_for_fresh(self.store).values()), [[(7,)] * 3])
+
+    def test_async_refresh_uses_the_entry_database(self):
+        """Test that an async refresh re-reads the database the entry came from."""
+        @cache_query(cache=self.store, ttl=0.05, stale_while_revalidate=60)
+        async def ages(conn, query):
+            async with conn.execute(query) as cursor:
+                return await cursor.fetchall()
+
+        async def run():
+            async with db.async_pools():
+                async with db.AsyncConnectionPool(self.other, readonly=True) as pool:
+                    async with pool.connection() as conn:
+                        sql = "SELECT age FROM users ORDER BY id"
+                        first = await ages(conn, sql)
+                        set_ages(self.other, 5)
+                        await asyncio.sleep(0.06)
+                        stale = await ages(conn, sql)
+                        while self.store.stats()["entries"] and not all(
+                            self.store.lookup(key, count=False)[0]
+                            for key in list(self.store._entries)
+                        ):
+                            await asyncio.sleep(0.01)
+                return first, stale
+
+        first, stale = asyncio.run(asyncio.wait_for(run(), 10))
+        self.assertEqual(first, [(40,), (50,), (60,)])
+        self.assertEqual(stale, first)
+        self.assertEqual(list(wait_for_fresh(self.store).values()), [[(5,)] * 3])
+
+    def test_keys_differ_per_database(self):
+        """Test that the same query on two databases is cached separately."""
+        @cache_query(cache=self.store)
+        def count(conn, query):
+            return conn.execute(query).fetchone()
+
+        sql = "SELECT count(*) FROM users"
+        first = db.connect(self.default, readonly=True)
+        second = db.connect(self.other, readonly=True)
+        self.assertEqual(count(first, sql), (2,))
+        self.assertEqual(count(second, sql), (3,))
+        first.close()
+        second.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
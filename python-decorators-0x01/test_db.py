@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+test_db.py
+
+Unit tests for db.py:
+- AsyncConnectionPool lifecycle
+- close_async_pools / async_pools
+"""
+
+import asyncio
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import unittest
+
+import db
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+class TestAsyncPools(unittest.TestCase):
+    """Test suite for closing async connection pools."""
+
+    def setUp(self):
+        """Create a throwaway users.db and point the pools at it."""
+        self.workdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.workdir.name, "users.db")
+        conn = sqlite3.connect(self.path)
+        conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY)")
+        conn.execute("INSERT INTO users VALUES (1)")
+        conn.commit()
+        conn.close()
+        db.configure_pool(path=self.path)
+
+    def tearDown(self):
+        """Close the sync pools and remove the database."""
+        db.get_pool().close()
+        db.get_pool(readonly=True).close()
+        self.workdir.cleanup()
+
+    def test_async_with_closes_pool(self):
+        """Test that leaving `async with pool` closes it for good."""
+        async def run():
+            async with db.AsyncConnectionPool(self.path, size=2) as pool:
+                async with pool.connection() as conn:
+                    async with conn.execute("SELECT count(*) FROM users") as cur:
+                        self.assertEqual(await cur.fetchone(), (1,))
+            self.assertEqual(pool._all, [])
+            with self.assertRaises(RuntimeError):
+                await pool.acquire()
+
+        asyncio.run(run())
+
+    def test_close_async_pools_forgets_pools(self):
+        """Test that close_async_pools closes the loop's pools and drops them."""
+        async def run():
+            pool = db.get_async_pool()
+            async with pool.connection():
+                pass
+            await db.close_async_pools()
+            self.assertEqual(pool._all, [])
+            self.assertIsNot(db.get_async_pool(), pool)
+            await db.close_async_pools()
+
+        asyncio.run(run())
+
+    def test_script_exits_after_async_pools(self):
+        """Test that a one-shot asyncio.run script exits once pools close."""
+        code = (
+            "import asyncio, db\n"
+            f"db.configure_pool(path={self.path!r})\n"
+            "@db.with_db_connection\n"
+            "async def count(conn):\n"
+            "    async with conn.execute('SELECT count(*) FROM users') as cur:\n"
+            "        return await cur.fetchone()\n"
+            "async def main():\n"
+            "    async with db.async_pools():\n"
+            "        print(await count())\n"
+            "asyncio.run(main())\n"
+        )
+        completed = subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=HERE, capture_output=True, text=True, timeout=30, check=True,
+        )
+        self.assertEqual(completed.stdout.strip(), "(1,)")
+
+
+if __name__ == "__main__":
+    unittest.main()
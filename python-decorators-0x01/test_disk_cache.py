@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+test_disk_cache.py
+
+Unit tests for disk_cache.py:
+- dumps / loads
+- hash_key
+- DiskCache file permissions
+"""
+
+import os
+import pickle
+import subprocess
+import sys
+import tempfile
+import unittest
+from decimal import Decimal
+
+from parameterized import parameterized
+
+import disk_cache
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+class TestSerialization(unittest.TestCase):
+    """Test suite for dumps/loads."""
+
+    def test_round_trip_rows(self):
+        """Test that plain rows survive a round trip."""
+        rows = [(1, "Ada", 36, 1.5, None, b"x"), (2, "Bob", 40, 2.0, True, b"")]
+        self.assertEqual(disk_cache.loads(disk_cache.dumps(rows)), rows)
+
+    @parameterized.expand([
+        ("decimal", [(Decimal("1.5"),)]),
+        ("object", [(object(),)]),
+        ("str_subclass", [(type("Name", (str,), {})("x"),)]),
+    ])
+    def test_dumps_refuses_non_plain_values(self, _, value):
+        """Test that anything but built-in data is refused."""
+        with self.assertRaises(ValueError):
+            disk_cache.dumps(value)
+
+    def test_loads_refuses_pickles(self):
+        """Test that a pickled entry is never unpickled."""
+        with self.assertRaises(ValueError):
+            disk_cache.loads(b"p" + pickle.dumps([(1,)]))
+
+
+class TestHashKey(unittest.TestCase):
+    """Test suite for hash_key."""
+
+    def digest_in_child(self, seed):
+        """hash_key of a set-bearing key in a process with hash seed `seed`."""
+        code = (
+            "import disk_cache\n"
+            "key = ('f', '/db', 'SELECT ?', "
+            "(frozenset({'alpha', 'beta', 'gamma', 'delta'}),))\n"
+            "print(disk_cache.hash_key(key).hex())\n"
+        )
+        env = dict(os.environ, PYTHONHASHSEED=str(seed))
+        completed = subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=HERE, env=env, capture_output=True, text=True, check=True,
+        )
+        return completed.stdout.strip()
+
+    def test_same_digest_in_every_process(self):
+        """Test that hash seeds do not change the digest of a set key."""
+        digests = {self.digest_in_child(seed) for seed in range(6)}
+        self.assertEqual(len(digests), 1)
+
+    @parameterized.expand([
+        ("tuple_vs_list", (1, 2), [1, 2]),
+        ("int_vs_str", 1, "1"),
+        ("int_vs_float", 1, 1.0),
+        ("int_vs_bool", 1, True),
+    ])
+    def test_distinct_keys_differ(self, _, left, right):
+        """Test that values of different types hash differently."""
+        self.assertNotEqual(disk_cache.hash_key(left), disk_cache.hash_key(right))
+
+
+class TestFilePermissions(unittest.TestCase):
+    """Test suite for the private cache file."""
+
+    def setUp(self):
+        """Make a scratch directory."""
+        self.workdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.workdir.name, "cache.db")
+
+    def tearDown(self):
+        """Remove the scratch directory."""
+        self.workdir.cleanup()
+
+    def test_new_file_is_private(self):
+        """Test that a new cache file is created with mode 0600."""
+        cache = disk_cache.DiskCache(self.path)
+        cache.store("key", [(1,)])
+        cache.close()
+        self.assertEqual(os.stat(self.path).st_mode & 0o777, 0o600)
+
+    def test_group_writable_file_is_refused(self):
+        """Test that a file others can write is never read."""
+        cache = disk_cache.DiskCache(self.path)
+        cache.store("key", [(1,)])
+        cache.close()
+        os.chmod(self.path, 0o666)
+        with self.assertRaises(disk_cache.UnsafeCacheFile):
+            disk_cache.DiskCache(self.path).get("key")
+
+    def test_two_tier_cache_falls_back_to_memory(self):
+        """Test that TwoTierCache still works in memory over a refused file."""
+        disk_cache.DiskCache(self.path).stats()
+        os.chmod(self.path, 0o666)
+        cache = disk_cache.TwoTierCache(self.path)
+        self.assertTrue(cache.store("key", [(1,)]))
+        self.assertEqual(cache.lookup("key"), (True, [(1,)]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+test_loader.py
+
+Unit tests for loader.py:
+- DataLoader / Pending
+"""
+
+import threading
+import unittest
+
+from loader import DataLoader
+
+
+class TestDataLoader(unittest.TestCase):
+    """Test suite for DataLoader batching."""
+
+    def test_batches_and_deduplicates(self):
+        """Test that queued keys go to batch_fn once, in one call."""
+        calls = []
+
+        def batch_fn(keys):
+            calls.append(list(keys))
+            return {key: key * 10 for key in keys}
+
+        loader = DataLoader(batch_fn)
+        self.assertEqual(loader.load_many([1, 2, 1, 3]), [10, 20, 10, 30])
+        self.assertEqual(calls, [[1, 2, 3]])
+
+    def test_result_waits_for_dispatch_in_another_thread(self):
+        """Test that result() waits for a dispatch already in flight."""
+        started, release = threading.Event(), threading.Event()
+
+        def batch_fn(keys):
+            started.set()
+            release.wait(5)
+            return {key: key * 10 for key in keys}
+
+        loader = DataLoader(batch_fn)
+        pending = loader.load(7)
+        dispatcher = threading.Thread(target=loader.dispatch)
+        dispatcher.start()
+        started.wait(5)
+        results = []
+        waiter = threading.Thread(target=lambda: results.append(pending.result()))
+        waiter.start()
+        waiter.join(0.1)
+        self.assertTrue(waiter.is_alive())  # not None while in flight
+        release.set()
+        waiter.join(5)
+        dispatcher.join(5)
+        self.assertEqual(results, [70])
+
+    def test_errors_reach_every_key_and_are_not_cached(self):
+        """Test that a failed batch fails its keys and is retried later."""
+        fail = [True]
+
+        def batch_fn(keys):
+            if fail[0]:
+                raise LookupError("down")
+            return {key: key for key in keys}
+
+        loader = DataLoader(batch_fn)
+        first, second = loader.load(1), loader.load(2)
+        for pending in (first, second):
+            with self.assertRaises(LookupError):
+                pending.result()
+        fail[0] = False
+        self.assertEqual(loader.load(1).result(), 1)
+
+    def test_interrupted_batch_resolves_waiters(self):
+        """Test that KeyboardInterrupt in batch_fn does not strand keys."""
+        def batch_fn(keys):
+            raise KeyboardInterrupt
+
+        loader = DataLoader(batch_fn, max_batch=1)
+        first, second = loader.load(1), loader.load(2)
+        with self.assertRaises(KeyboardInterrupt):
+            loader.dispatch()
+        self.assertTrue(first.done() and second.done())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+test_query_cache.py
+
+Unit tests for query_cache.py:
+- track_tables (nesting)
+- QueryCache invalidation and versions
+"""
+
+import sqlite3
+import unittest
+
+import query_cache
+from query_cache import QueryCache, track_tables, READ_ACTIONS, WRITE_ACTIONS
+
+
+class TestTrackTables(unittest.TestCase):
+    """Test suite for track_tables."""
+
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:", isolation_level=None)
+        self.conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, email TEXT)")
+        self.conn.execute("CREATE TABLE orders (id INTEGER PRIMARY KEY, user_id INTEGER)")
+        self.conn.execute("CREATE TABLE audit (id INTEGER PRIMARY KEY, note TEXT)")
+        self.addCleanup(self.conn.close)
+
+    def test_nested_trackers_each_see_statements(self):
+        """Test that a cached read inside a transaction does not blind it."""
+        with track_tables(self.conn, WRITE_ACTIONS) as written:
+            self.conn.execute("UPDATE users SET email = 'a' WHERE id = 1")
+            with track_tables(self.conn, READ_ACTIONS) as read:
+                self.conn.execute("SELECT * FROM orders").fetchall()
+                self.conn.execute("INSERT INTO orders (user_id) VALUES (1)")
+            # Closing the inner tracker must leave the outer one installed
+            self.conn.execute("INSERT INTO audit (note) VALUES ('x')")
+        self.assertEqual(written, {"users", "orders", "audit"})
+        self.assertEqual(read, {"orders"})
+
+    def test_last_tracker_removes_the_authorizer(self):
+        """Test that no tracker state is left once every tracker closes."""
+        with track_tables(self.conn, READ_ACTIONS):
+            with track_tables(self.conn, READ_ACTIONS):
+                pass
+        self.assertNotIn(id(self.conn), query_cache._trackers)
+
+
+class TestQueryCache(unittest.TestCase):
+    """Test suite for QueryCache invalidation."""
+
+    def test_write_evicts_entries_that_read_the_table(self):
+        """Test that invalidate_tables drops only the affected entries."""
+        cache = QueryCache()
+        cache.store("users", [1], tables={"Users"})
+        cache.store("orders", [2], tables={"orders"})
+        query_cache.invalidate_tables({"users"})
+        self.assertEqual(cache.lookup("users"), (False, None))
+        self.assertEqual(cache.lookup("orders"), (True, [2]))
+
+    def test_result_read_before_a_write_is_not_cached(self):
+        """Test that a store racing a write to its tables is refused."""
+        cache = QueryCache()
+        version = cache.version()
+        cache.invalidate_tables({"users"})  # a write commits mid-query
+        self.assertFalse(cache.store("q", [1], tables={"users"}, version=version))
+        self.assertTrue(cache.store("q", [1], tables={"users"}, version=cache.version()))
+
+    def test_bounded_by_bytes(self):
+        """Test that the least recently used entries are evicted first."""
+        cache = QueryCache(max_entries=10, max_bytes=300)
+        cache.store("a", "x", size=100)
+        cache.store("b", "x", size=100)
+        cache.lookup("a")
+        cache.store("c", "x", size=150)
+        self.assertIn("a", cache)
+        self.assertNotIn("b", cache)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+test_retry_on_failure.py
+
+Unit tests for 3-retry_on_failure.py:
+- retry_on_failure
+- CircuitBreaker
+"""
+
+import asyncio
+import os
+import sqlite3
+import tempfile
+import time
+import unittest
+
+retry = __import__('3-retry_on_failure')
+
+
+class TestRetryOnFailure(unittest.TestCase):
+    """Test suite for the retry_on_failure decorator."""
+
+    def setUp(self):
+        """Open connections to two separate database files."""
+        self.workdir = tempfile.TemporaryDirectory()
+        self.first = sqlite3.connect(os.path.join(self.workdir.name, "a.db"))
+        self.second = sqlite3.connect(os.path.join(self.workdir.name, "b.db"))
+
+    def tearDown(self):
+        """Close the connections and remove the files."""
+        self.first.close()
+        self.second.close()
+        self.workdir.cleanup()
+
+    def test_zero_retries_still_calls_once(self):
+        """Test that retries=0 runs the function once instead of skipping it."""
+        calls = []
+
+        @retry.retry_on_failure(retries=0, verbose=False)
+        def fetch(conn):
+            calls.append(conn)
+            return 42
+
+        self.assertEqual(fetch(self.first), 42)
+        self.assertEqual(len(calls), 1)
+
+    def test_breaker_is_per_database(self):
+        """Test that a failing database does not open another's breaker."""
+        @retry.retry_on_failure(retries=1, verbose=False)
+        def unavailable(conn):
+            raise sqlite3.OperationalError("unable to open database file")
+
+        @retry.retry_on_failure(retries=1, verbose=False)
+        def fetch(conn):
+            return conn.execute("SELECT 1").fetchone()
+
+        for _ in range(retry.CircuitBreaker().failure_threshold):
+            with self.assertRaises(sqlite3.OperationalError):
+                unavailable(self.first)
+        with self.assertRaises(retry.CircuitOpenError):
+            fetch(self.first)
+        self.assertEqual(fetch(self.second), (1,))
+
+    def test_explicit_breaker_is_used(self):
+        """Test that a breaker passed in is used instead of the shared one."""
+        breaker = retry.CircuitBreaker(failure_threshold=1, reset_timeout=60)
+
+        @retry.retry_on_failure(retries=1, breaker=breaker, verbose=False)
+        def unavailable(conn):
+            raise sqlite3.OperationalError("disk I/O error")
+
+        with self.assertRaises(sqlite3.OperationalError):
+            unavailable(self.first)
+        with self.assertRaises(retry.CircuitOpenError):
+            unavailable(self.second)
+
+
+class TestHalfOpenTrial(unittest.TestCase):
+    """Test suite for releasing a half-open trial call."""
+
+    def half_open_breaker(self):
+        """A breaker whose next call is the half-open trial."""
+        breaker = retry.CircuitBreaker(failure_threshold=1, reset_timeout=0.01)
+        breaker.record_failure()
+        time.sleep(0.02)
+        return breaker
+
+    def test_interrupted_trial_is_released(self):
+        """Test that KeyboardInterrupt during the trial does not wedge it."""
+        breaker = self.half_open_breaker()
+
+        @retry.retry_on_failure(
+            budget=retry.RetryBudget(), breaker=breaker, verbose=False
+        )
+        def interrupted(conn):
+            raise KeyboardInterrupt
+
+        with self.assertRaises(KeyboardInterrupt):
+            interrupted(None)
+        time.sleep(0.02)
+        breaker.before_call()  # a new trial is allowed
+
+    def test_cancelled_trial_is_released(self):
+        """Test that cancelling an async trial does not wedge it."""
+        breaker = self.half_open_breaker()
+
+        @retry.retry_on_failure(
+            budget=retry.RetryBudget(), breaker=breaker, verbose=False
+        )
+        async def slow(conn):
+            await asyncio.sleep(10)
+
+        async def cancel_trial():
+            task = asyncio.ensure_future(slow(None))
+            await asyncio.sleep(0.01)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(cancel_trial())
+        time.sleep(0.02)
+        breaker.before_call()
+
+
+if __name__ == "__main__":
+    unittest.main()
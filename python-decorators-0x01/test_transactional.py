@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+test_transactional.py
+
+Unit tests for 2-transactional.py:
+- GroupCommitter outcomes and failure propagation
+- nested @transactional inside a batch
+"""
+
+import os
+import sqlite3
+import tempfile
+import unittest
+
+import db
+
+tx = __import__('2-transactional')
+
+
+class TestGroupCommitter(unittest.TestCase):
+    """Test suite for GroupCommitter."""
+
+    def setUp(self):
+        """Create a users.db whose orders check users only on commit."""
+        self.workdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.workdir.name, "users.db")
+        conn = sqlite3.connect(self.path)
+        conn.executescript("""
+            CREATE TABLE users (id INTEGER PRIMARY KEY, email TEXT);
+            CREATE TABLE orders (
+                id INTEGER PRIMARY KEY,
+                user_id INTEGER REFERENCES users(id) DEFERRABLE INITIALLY DEFERRED
+            );
+            INSERT INTO users VALUES (1, 'a'), (2, 'b');
+        """)
+        conn.commit()
+        conn.close()
+        db.configure_pool(path=self.path, profile={"foreign_keys": "ON"})
+        self.committer = tx.GroupCommitter(max_delay=0.2)
+
+    def tearDown(self):
+        self.committer.close()
+        db.get_pool().close()
+        db.get_pool(readonly=True).close()
+        self.workdir.cleanup()
+
+    def emails(self):
+        conn = sqlite3.connect(self.path)
+        try:
+            return dict(conn.execute("SELECT id, email FROM users"))
+        finally:
+            conn.close()
+
+    def test_each_call_gets_its_own_outcome(self):
+        """Test that one failing call only rolls back its own savepoint."""
+        def set_email(conn, user_id, email):
+            conn.execute("UPDATE users SET email = ? WHERE id = ?", (email, user_id))
+            return user_id
+
+        def broken(conn):
+            conn.execute("UPDATE users SET email = 'lost' WHERE id = 2")
+            raise ValueError("bad input")
+
+        ok = self.committer.submit(set_email, 1, "new")
+        failed = self.committer.submit(broken)
+        self.assertEqual(ok.result(5), 1)
+        with self.assertRaises(ValueError):
+            failed.result(5)
+        self.assertEqual(self.emails(), {1: "new", 2: "b"})
+
+    def test_commit_failure_fails_every_call(self):
+        """Test that a failed commit reaches every call in the batch."""
+        def set_email(conn):
+            conn.execute("UPDATE users SET email = 'new' WHERE id = 1")
+
+        def dangling_order(conn):
+            conn.execute("INSERT INTO orders (user_id) VALUES (99)")
+
+        futures = [self.committer.submit(set_email), self.committer.submit(dangling_order)]
+        for future in futures:
+            with self.assertRaises(sqlite3.IntegrityError):
+                future.result(5)
+        self.assertEqual(self.emails(), {1: "a", 2: "b"})
+
+    def test_nested_transactional_does_not_commit_the_batch(self):
+        """Test that a nested @transactional call only uses a savepoint."""
+        @tx.transactional(verbose=False)
+        def set_email(conn):
+            conn.execute("UPDATE users SET email = 'new' WHERE id = 1")
+
+        def dangling_order(conn):
+            set_email(conn)
+            conn.execute("INSERT INTO orders (user_id) VALUES (99)")
+
+        with self.assertRaises(sqlite3.IntegrityError):
+            self.committer.submit(dangling_order).result(5)
+        self.assertEqual(self.emails(), {1: "a", 2: "b"})
+
+    def test_unopenable_database_fails_every_submit(self):
+        """Test that callers are not left waiting when connect fails."""
+        committer = tx.GroupCommitter(path=os.path.join(self.path, "missing", "x.db"))
+        self.addCleanup(committer.close)
+        with self.assertRaises(sqlite3.OperationalError):
+            committer.submit(lambda conn: None).result(5)
+        with self.assertRaises(sqlite3.OperationalError):
+            committer.submit(lambda conn: None).result(5)
+
+
+if __name__ == "__main__":
+    unittest.main()
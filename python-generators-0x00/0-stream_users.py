@@ -3,15 +3,26 @@
 Generator for streaming rows from user_data table one by one.
 """
 from seed import connect_to_prodev
+from filters import build_select
 
-def stream_users():
+def stream_users(columns=None, where=None):
 	"""
 	Connects to ALX_prodev and yields each row from user_data as a dict.
+	`columns` and `where` (a filters.Predicate) are pushed down into the SQL.
 	"""
 	connection = connect_to_prodev()
-	cursor = connection.cursor(dictionary=True)
-	cursor.execute("SELECT * FROM user_data;")
-	for record in cursor:
-		yield record
-	cursor.close()
-	connection.close()
\ No newline at end of file
+	exhausted = False
+	try:
+		cursor = connection.cursor(dictionary=True)
+		cursor.execute(*build_select(columns, where))
+		for record in cursor:
+			yield record
+		cursor.close()
+		exhausted = True
+	finally:
+		if exhausted:
+			connection.close()
+		else:
+			# Abandoned part-way (or failed): unread rows may still be in
+			# flight, so drop the socket rather than drain it
+			connection.shutdown()
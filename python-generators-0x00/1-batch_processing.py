@@ -4,33 +4,126 @@ Batch processing for user_data table using generators.
 """
 
 from seed import connect_to_prodev
+from filters import build_select, eq, gt, lt
+from columnar import ColumnBatch, column_names
+from checkpoint import Checkpoint
 
-def stream_users_in_batches(batch_size):
+def stream_users_in_batches(batch_size, buffered=False, columns=None, where=None,
+		columnar=False):
 	"""
 	Generator that yields lists of user records from user_data table in batches.
+	`columns` and `where` (a filters.Predicate) are pushed down into the SQL,
+	so only the needed columns of matching rows are sent.
+	With columnar=True each batch is a columnar.ColumnBatch instead of a list
+	of dicts.
+	By default the cursor is unbuffered: rows stay on the server until they
+	are fetched, so client memory is bounded by batch_size rather than by the
+	size of the table. Pass buffered=True to load the whole result up front.
 	"""
 	connection = connect_to_prodev()
-	# Use buffered cursor to avoid "Unread result found" on close
-	cursor = connection.cursor(dictionary=True, buffered=True)
-	cursor.execute("SELECT * FROM user_data")
+	cursor = None
+	exhausted = False
 	try:
+		cursor = connection.cursor(dictionary=not columnar, buffered=buffered)
+		cursor.execute(*build_select(columns, where))
+		names = column_names(cursor) if columnar else None
 		while True:
 			batch = cursor.fetchmany(batch_size)
 			if not batch:
+				exhausted = True
 				break
-			yield batch
+			yield ColumnBatch(names, batch) if columnar else batch
 	finally:
-		cursor.close()
-		connection.close()
+		if exhausted or (buffered and cursor is not None):
+			cursor.close()
+			connection.close()
+		else:
+			# The consumer stopped early (or the query failed) and the rest
+			# of the result may still be in flight; a normal close would
+			# raise "Unread result found" or drain every remaining row
+			# first, so drop the socket instead.
+			connection.shutdown()
 
 
-def batch_processing(batch_size):
+def batch_processing(batch_size, workers=None):
 	"""
 	Processes batches of users and prints users whose age > 25.
+	With `workers` set, the table is read by that many processes in parallel.
 	"""
-	for batch in stream_users_in_batches(batch_size):
+	if workers:
+		# parallel_scan imports this module, so import it lazily
+		from parallel_scan import parallel_scan
+		batches = parallel_scan(workers, batch_size, where=gt('age', 25))
+	else:
+		batches = stream_users_in_batches(batch_size, where=gt('age', 25))
+	for batch in batches:
 		for user in batch:
-			# age is Decimal, compare > 25
-			if user.get('age', 0) > 25:
-				print(user)
+			print(user)
 	return
+
+
+def stream_changed_users_in_batches(batch_size, checkpoint_path, columns=None,
+		where=None, lag=5.0):
+	"""
+	Generator that yields only the user_data rows added or changed since the
+	last run, in batches ordered by (updated_at, user_id).
+	The watermark is the (updated_at, user_id) of the last row of a batch.
+	It is saved atomically to `checkpoint_path` once the consumer asks for
+	the next batch, so a crash reprocesses at most the batch in progress.
+	updated_at is stamped when a row is written, not when it commits, so a
+	row can commit behind the watermark. Rows stamped within the last `lag`
+	seconds (by the server clock) are therefore left for the next run;
+	a row whose transaction commits more than `lag` seconds after writing
+	it can still be skipped for good, so keep `lag` above the longest
+	write transaction on user_data.
+	"""
+	checkpoint = Checkpoint(checkpoint_path)
+	state = checkpoint.load()
+	if columns:
+		columns = tuple(columns) + tuple(
+			c for c in ('updated_at', 'user_id') if c not in columns
+		)
+	connection = connect_to_prodev()
+	try:
+		cursor = connection.cursor()
+		cursor.execute(
+			"SELECT NOW(6) - INTERVAL %s MICROSECOND", (int(lag * 1_000_000),)
+		)
+		(cutoff,) = cursor.fetchone()
+		cursor.close()
+		settled = lt('updated_at', cutoff)
+		while True:
+			condition = settled if where is None else where & settled
+			if state is not None:
+				seek = gt('updated_at', state['updated_at']) | (
+					eq('updated_at', state['updated_at'])
+					& gt('user_id', state['user_id'])
+				)
+				condition = condition & seek
+			cursor = connection.cursor(dictionary=True)
+			cursor.execute(*build_select(
+				columns, condition,
+				"ORDER BY updated_at, user_id LIMIT %s", (batch_size,)
+			))
+			batch = cursor.fetchall()
+			cursor.close()
+			if not batch:
+				return
+			yield batch
+			last = batch[-1]
+			state = {'updated_at': str(last['updated_at']), 'user_id': last['user_id']}
+			checkpoint.save(state)
+	finally:
+		connection.close()
+
+
+def incremental_batch_processing(batch_size, checkpoint_path='batch_processing.checkpoint'):
+	"""
+	Like batch_processing, but only looks at users added or changed since
+	the previous run recorded in `checkpoint_path`.
+	"""
+	for batch in stream_changed_users_in_batches(
+		batch_size, checkpoint_path, where=gt('age', 25)
+	):
+		for user in batch:
+			print(user)
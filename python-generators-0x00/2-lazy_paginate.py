@@ -2,33 +2,105 @@
 """
 Lazy pagination generator for the user_data table.
 """
+import base64
+import json
+
 from seed import connect_to_prodev
+from filters import build_select, gt
 
-def paginate_users(page_size, offset):
+def paginate_users(page_size, offset, columns=None, where=None):
 	"""
 	Fetch a single page of user_data with given page_size and offset.
 	Returns a list of row-dicts.
 	"""
 	connection = connect_to_prodev()
-	cursor = connection.cursor(dictionary=True)
-	cursor.execute(
-		f"SELECT * FROM user_data LIMIT {page_size} OFFSET {offset}"
-	)
-	rows = cursor.fetchall()
-	cursor.close()
-	connection.close()
-	return rows
+	try:
+		cursor = connection.cursor(dictionary=True)
+		cursor.execute(*build_select(
+			columns, where, "LIMIT %s OFFSET %s", (page_size, offset)
+		))
+		rows = cursor.fetchall()
+		cursor.close()
+		return rows
+	finally:
+		connection.close()
 
 
-def lazy_pagination(page_size):
+def lazy_pagination(page_size, columns=None, where=None):
 	"""
 	Generator that lazily yields pages of size `page_size` from user_data.
 	Only fetches the next page when needed.
 	"""
 	offset = 0
 	while True:
-		page = paginate_users(page_size, offset)
+		page = paginate_users(page_size, offset, columns, where)
 		if not page:
 			return  # no more data, end generator
 		yield page
 		offset += page_size
+
+
+def encode_resume_token(last_user_id):
+	"""
+	Wrap the last seen user_id in an opaque, URL-safe resume token.
+	"""
+	payload = json.dumps({"v": 1, "after": last_user_id}).encode('utf-8')
+	return base64.urlsafe_b64encode(payload).decode('ascii')
+
+
+def decode_resume_token(token):
+	"""
+	Return the user_id stored in a resume token (None for a fresh walk).
+	Raises ValueError if the token is malformed.
+	"""
+	if not token:
+		return None
+	try:
+		payload = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+		return payload["after"]
+	except (ValueError, KeyError, TypeError) as e:
+		raise ValueError(f"Invalid resume token: {token!r}") from e
+
+
+def paginate_users_after(connection, page_size, last_user_id=None,
+		columns=None, where=None):
+	"""
+	Fetch the page of user_data that follows `last_user_id` in primary key
+	order, on an already open connection. Returns a list of row-dicts.
+	"""
+	if columns and 'user_id' not in columns:
+		columns = ('user_id',) + tuple(columns)
+	if last_user_id is not None:
+		seek = gt('user_id', last_user_id)
+		where = seek if where is None else where & seek
+	cursor = connection.cursor(dictionary=True)
+	cursor.execute(*build_select(
+		columns, where, "ORDER BY user_id LIMIT %s", (page_size,)
+	))
+	rows = cursor.fetchall()
+	cursor.close()
+	return rows
+
+
+def keyset_pagination(page_size, resume_token=None, columns=None, where=None):
+	"""
+	Generator that walks user_data in pages of `page_size` by seeking on
+	user_id instead of using OFFSET, so every page costs the same no matter
+	how deep the walk is. One connection is held for the whole walk.
+
+	Yields (page, resume_token) tuples; passing the last token back in
+	continues the walk right after that page. user_id is always selected.
+	"""
+	last_user_id = decode_resume_token(resume_token)
+	connection = connect_to_prodev()
+	try:
+		while True:
+			page = paginate_users_after(
+				connection, page_size, last_user_id, columns, where
+			)
+			if not page:
+				return
+			last_user_id = page[-1]['user_id']
+			yield page, encode_resume_token(last_user_id)
+	finally:
+		connection.close()
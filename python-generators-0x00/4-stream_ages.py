@@ -2,19 +2,39 @@
 """
 Memory-efficient aggregation: compute average age via generator.
 """
+import math
+
 from seed import connect_to_prodev
+from filters import build_select
+from stats import StreamingStats
+from parallel_scan import parallel_reduce, stream_users_in_batches
 
-def stream_user_ages():
+def stream_user_ages(where=None, batch_size=None):
 	"""
 	Generator that yields the 'age' of each user one by one.
+	`where` (a filters.Predicate) restricts the users in the database.
+	With `batch_size` set it yields array('d') batches of ages instead.
 	"""
+	if batch_size:
+		for batch in stream_users_in_batches(
+			batch_size, columns=('age',), where=where, columnar=True
+		):
+			yield batch.column('age')
+		return
 	connection = connect_to_prodev()
-	cursor = connection.cursor(dictionary=True)
-	cursor.execute("SELECT age FROM user_data")
-	for row in cursor:
-		yield row['age']
-	cursor.close()
-	connection.close()
+	exhausted = False
+	try:
+		cursor = connection.cursor(dictionary=True)
+		cursor.execute(*build_select(('age',), where))
+		for row in cursor:
+			yield row['age']
+		cursor.close()
+		exhausted = True
+	finally:
+		if exhausted:
+			connection.close()
+		else:
+			connection.shutdown()  # abandoned: don't drain unread rows
 
 def calculate_average_age():
 	"""
@@ -28,5 +48,83 @@ def calculate_average_age():
 	average = float(total) / count if count else 0
 	print(f"Average age of users: {average}")  # second loop implicitly via generator consumption
 
+def pushdown_age_stats(percentiles=(50, 95, 99), where=None):
+	"""
+	Ask MySQL for the age histogram (one GROUP BY age query, read along
+	idx_user_data_age) instead of streaming the rows, and derive every
+	statistic from it. Percentiles are exact, by nearest rank. Returns
+	the same dict as calculate_age_stats.
+	"""
+	where_sql = f" WHERE {where.sql}" if where is not None else ""
+	params = where.params if where is not None else ()
+	connection = connect_to_prodev()
+	cursor = connection.cursor()
+	try:
+		cursor.execute(
+			f"SELECT age, COUNT(*) FROM user_data{where_sql} GROUP BY age ORDER BY age",
+			params
+		)
+		histogram = [(float(age), n) for age, n in cursor.fetchall() if age is not None]
+	finally:
+		cursor.close()
+		connection.close()
+	count = sum(n for _, n in histogram)
+	result = dict.fromkeys(('count', 'mean', 'variance', 'min', 'max'))
+	result['count'] = count
+	if count:
+		mean = sum(age * n for age, n in histogram) / count
+		result.update(
+			mean=mean,
+			variance=sum(n * (age - mean) ** 2 for age, n in histogram) / count,
+			min=histogram[0][0],
+			max=histogram[-1][0],
+		)
+	for p in percentiles:
+		value = None
+		if count:
+			rank = max(0, math.ceil(p * count / 100.0) - 1)  # 0-based
+			seen = 0
+			for age, n in histogram:
+				seen += n
+				if seen > rank:
+					value = age
+					break
+		result[f'p{p:g}'] = value
+	return result
+
+def fold_age_batch(stats, batch):
+	"""
+	Add the ages of one columnar.ColumnBatch to a StreamingStats.
+	"""
+	return stats.update_batch(batch.column('age'))
+
+def merge_stats(left, right):
+	"""
+	Combine two partial StreamingStats.
+	"""
+	return left.merge(right)
+
+def calculate_age_stats(percentiles=(50, 95, 99), where=None, pushdown=False,
+		workers=None, batch_size=10000):
+	"""
+	Compute count, mean, variance, min, max and the requested percentiles
+	of user ages in one pass with constant memory (percentiles are t-digest
+	estimates). Ages are read as columnar batches of `batch_size` and
+	aggregated per batch. With pushdown=True the database computes them
+	instead; with `workers` set, the scan is split across that many processes.
+	"""
+	if pushdown:
+		return pushdown_age_stats(percentiles, where)
+	if workers:
+		stats = parallel_reduce(
+			fold_age_batch, merge_stats, StreamingStats(), workers,
+			batch_size=batch_size, columns=('age',), where=where, columnar=True
+		)
+		return stats.summary(percentiles)
+	stats = StreamingStats()
+	for ages in stream_user_ages(where, batch_size):
+		stats.update_batch(ages)
+	return stats.summary(percentiles)
+
 if __name__ == '__main__':
 	calculate_average_age()
@@ -0,0 +1,278 @@
+#!/usr/bin/python3
+"""
+Reproducible benchmarks for the python-generators-0x00 strategies.
+
+Generates a synthetic user_data table with seed.py's schema, runs each
+streaming strategy in a fresh process and reports rows/sec, time to first
+row and peak RSS. Runs offline against a local MySQL, or against a SQLite
+file (sqlite_seed.py) when MySQL is unavailable.
+
+Usage:
+  ./benchmark.py run [--rows N] [--batch-size N] [--backend auto|mysql|sqlite]
+                     [--strategies name ...] [--skip-generate] [--output FILE]
+  ./benchmark.py generate --rows N [--backend ...]
+  ./benchmark.py prefetch [--batch-size N] [--work-ms MS] [--depth K]
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import time
+import uuid
+
+STRATEGIES = (
+	'stream_users',
+	'stream_users_in_batches',
+	'lazy_pagination',
+	'keyset_pagination',
+	'stream_user_ages',
+	'prefetch_batches',
+)
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def use_backend(backend):
+	"""
+	Make `import seed` resolve to the requested backend and return its
+	name. 'auto' picks MySQL when the driver is installed and the server
+	answers, SQLite otherwise.
+	"""
+	if backend in ('auto', 'mysql'):
+		try:
+			import seed
+			seed.connect_to_prodev(pooled=False).close()
+			return 'mysql'
+		except Exception:
+			if backend == 'mysql':
+				raise
+			sys.modules.pop('seed', None)
+	import sqlite_seed
+	sys.modules['seed'] = sqlite_seed
+	return 'sqlite'
+
+
+def synthetic_rows(count, random_seed=42):
+	"""
+	Yield `count` deterministic (user_id, name, email, age) tuples.
+	"""
+	rng = random.Random(random_seed)
+	for i in range(count):
+		user_id = str(uuid.UUID(int=rng.getrandbits(128), version=4))
+		yield (user_id, f"User {i}", f"user{i}@example.com", rng.randint(18, 100))
+
+
+def generate(backend, rows, chunk_size=10000):
+	"""
+	Replace the contents of user_data with `rows` synthetic users.
+	"""
+	import seed
+	if backend == 'mysql':
+		server = seed.connect_db()
+		seed.create_database(server)
+		server.close()
+	connection = seed.connect_to_prodev()
+	seed.create_table(connection)
+	cursor = connection.cursor()
+	cursor.execute("TRUNCATE TABLE user_data" if backend == 'mysql' else "DELETE FROM user_data")
+	connection.commit()
+	start = time.perf_counter()
+	chunk = []
+	for values in synthetic_rows(rows):
+		chunk.append(values)
+		if len(chunk) >= chunk_size:
+			_insert(cursor, chunk)
+			connection.commit()
+			chunk = []
+	if chunk:
+		_insert(cursor, chunk)
+		connection.commit()
+	cursor.close()
+	connection.close()
+	print(f"Generated {rows} rows in {time.perf_counter() - start:.2f}s", file=sys.stderr)
+
+
+def _insert(cursor, chunk):
+	cursor.executemany(
+		"INSERT INTO user_data (user_id, name, email, age) VALUES (%s, %s, %s, %s)",
+		chunk
+	)
+
+
+def _row_counts(strategy, batch_size):
+	"""
+	Run one strategy, yielding the number of rows in each item it yields.
+	"""
+	if strategy == 'stream_users':
+		stream_users = __import__('0-stream_users').stream_users
+		return (1 for _ in stream_users())
+	if strategy == 'stream_users_in_batches':
+		batches = __import__('1-batch_processing').stream_users_in_batches
+		return (len(batch) for batch in batches(batch_size))
+	if strategy == 'lazy_pagination':
+		lazy_pagination = __import__('2-lazy_paginate').lazy_pagination
+		return (len(page) for page in lazy_pagination(batch_size))
+	if strategy == 'keyset_pagination':
+		keyset_pagination = __import__('2-lazy_paginate').keyset_pagination
+		return (len(page) for page, _ in keyset_pagination(batch_size))
+	if strategy == 'stream_user_ages':
+		stream_user_ages = __import__('4-stream_ages').stream_user_ages
+		return (1 for _ in stream_user_ages())
+	if strategy == 'prefetch_batches':
+		from prefetch import prefetch
+		batches = __import__('1-batch_processing').stream_users_in_batches
+		return (len(batch) for batch in prefetch(batches(batch_size), 4))
+	raise ValueError(f"Unknown strategy: {strategy!r}")
+
+
+def peak_rss_kb():
+	"""
+	Peak resident set size of this process in KiB. On Linux this is
+	VmHWM, which starts over at exec; getrusage's ru_maxrss is inherited
+	across fork+exec, so a child would report its parent's peak if that
+	was higher.
+	"""
+	try:
+		with open('/proc/self/status') as status:
+			for line in status:
+				if line.startswith('VmHWM:'):
+					return int(line.split()[1])
+	except OSError:
+		pass
+	peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+	if sys.platform == 'darwin':  # bytes there, KiB on Linux
+		peak_rss //= 1024
+	return peak_rss
+
+
+def measure(strategy, batch_size):
+	"""
+	Run `strategy` to completion in this process and return its metrics.
+	"""
+	counts = _row_counts(strategy, batch_size)
+	start = time.perf_counter()
+	first_row = None
+	rows = 0
+	for count in counts:
+		if first_row is None:
+			first_row = time.perf_counter() - start
+		rows += count
+	elapsed = time.perf_counter() - start
+	peak_rss = peak_rss_kb()
+	return {
+		'strategy': strategy,
+		'rows': rows,
+		'seconds': elapsed,
+		'rows_per_sec': rows / elapsed if elapsed else None,
+		'time_to_first_row': first_row,
+		'peak_rss_kb': peak_rss,
+	}
+
+
+def run(backend, batch_size, strategies):
+	"""
+	Measure each strategy in a fresh interpreter so peak RSS is per strategy.
+	The children run from HERE, so the SQLite path is passed resolved.
+	"""
+	import sqlite_seed
+	env = dict(os.environ, PRODEV_SQLITE_PATH=sqlite_seed.database_path())
+	results = []
+	for strategy in strategies:
+		completed = subprocess.run(
+			[sys.executable, os.path.abspath(__file__), '_measure', strategy,
+				'--backend', backend, '--batch-size', str(batch_size)],
+			cwd=HERE, env=env, capture_output=True, text=True, check=True,
+		)
+		result = json.loads(completed.stdout.strip().splitlines()[-1])
+		results.append(result)
+		print(
+			f"{strategy:<24} {result['rows']:>10} rows "
+			f"{result['rows_per_sec'] or 0:>12.0f} rows/sec "
+			f"first row {result['time_to_first_row'] or 0:.4f}s "
+			f"peak RSS {result['peak_rss_kb']} KiB",
+			file=sys.stderr
+		)
+	return results
+
+
+def benchmark_prefetch(batch_size=1000, work_ms=5.0, depth=4):
+	"""
+	Compare strictly sequential fetching with prefetch() for the same
+	simulated per-batch processing cost. Returns a dict of rows/sec.
+	"""
+	from prefetch import prefetch
+	stream_users_in_batches = __import__('1-batch_processing').stream_users_in_batches
+	work = work_ms / 1000.0
+	results = {}
+	for name, batches in (
+		('sequential', lambda: stream_users_in_batches(batch_size)),
+		(f'prefetch(depth={depth})',
+			lambda: prefetch(stream_users_in_batches(batch_size), depth)),
+	):
+		start = time.perf_counter()
+		rows = 0
+		for batch in batches():
+			rows += len(batch)
+			time.sleep(work)
+		elapsed = time.perf_counter() - start
+		results[name] = rows / elapsed if elapsed else 0.0
+		print(f"{name:<20} {rows} rows in {elapsed:.3f}s ({results[name]:.0f} rows/sec)")
+	return results
+
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description="Benchmark the user_data generators.")
+	commands = parser.add_subparsers(dest='command', required=True)
+
+	run_parser = commands.add_parser('run', help="generate data and benchmark strategies")
+	run_parser.add_argument('--rows', type=int, default=10000)
+	run_parser.add_argument('--skip-generate', action='store_true')
+	run_parser.add_argument('--strategies', nargs='+', choices=STRATEGIES, default=list(STRATEGIES))
+	run_parser.add_argument('--output', help="write JSON results to this file")
+
+	generate_parser = commands.add_parser('generate', help="only generate synthetic data")
+	generate_parser.add_argument('--rows', type=int, required=True)
+
+	prefetch_parser = commands.add_parser('prefetch', help="sequential vs prefetched batches")
+	prefetch_parser.add_argument('--work-ms', type=float, default=5.0)
+	prefetch_parser.add_argument('--depth', type=int, default=4)
+
+	measure_parser = commands.add_parser('_measure')
+	measure_parser.add_argument('strategy', choices=STRATEGIES)
+
+	for sub in (run_parser, generate_parser, prefetch_parser, measure_parser):
+		sub.add_argument('--backend', choices=('auto', 'mysql', 'sqlite'), default='auto')
+		sub.add_argument('--batch-size', type=int, default=1000)
+	args = parser.parse_args(argv)
+
+	backend = use_backend(args.backend)
+	if args.command == '_measure':
+		print(json.dumps(measure(args.strategy, args.batch_size)))
+	elif args.command == 'generate':
+		generate(backend, args.rows)
+	elif args.command == 'prefetch':
+		benchmark_prefetch(args.batch_size, args.work_ms, args.depth)
+	else:
+		if not args.skip_generate:
+			generate(backend, args.rows)
+		report = {
+			'backend': backend,
+			'rows': args.rows,
+			'batch_size': args.batch_size,
+			'python': platform.python_version(),
+			'platform': platform.platform(),
+			'results': run(backend, args.batch_size, args.strategies),
+		}
+		if args.output:
+			with open(args.output, 'w', encoding='utf-8') as handle:
+				json.dump(report, handle, indent=2)
+		else:
+			print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+	main()
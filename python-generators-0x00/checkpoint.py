@@ -0,0 +1,63 @@
+#!/usr/bin/python3
+"""
+Small on-disk checkpoints for resumable, incremental jobs.
+"""
+import json
+import os
+import tempfile
+
+
+class Checkpoint:
+	"""
+	A JSON document stored at `path` and replaced atomically on save, so a
+	crash leaves either the previous or the new state, never a torn file.
+	"""
+
+	def __init__(self, path):
+		self.path = os.path.abspath(path)
+
+	def load(self):
+		"""
+		Return the saved state, or None if no checkpoint exists yet.
+		"""
+		try:
+			with open(self.path, encoding='utf-8') as handle:
+				return json.load(handle)
+		except FileNotFoundError:
+			return None
+
+	def save(self, state):
+		"""
+		Write `state` to a temporary file, fsync it and rename it over the
+		checkpoint.
+		"""
+		directory = os.path.dirname(self.path)
+		fd, temp_path = tempfile.mkstemp(
+			dir=directory, prefix='.', suffix='.tmp'
+		)
+		try:
+			with os.fdopen(fd, 'w', encoding='utf-8') as handle:
+				json.dump(state, handle)
+				handle.flush()
+				os.fsync(handle.fileno())
+			os.replace(temp_path, self.path)
+		except BaseException:
+			if os.path.exists(temp_path):
+				os.unlink(temp_path)
+			raise
+		# Make the rename itself durable
+		if hasattr(os, 'O_DIRECTORY'):
+			dir_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+			try:
+				os.fsync(dir_fd)
+			finally:
+				os.close(dir_fd)
+
+	def clear(self):
+		"""
+		Remove the checkpoint so the next run starts from scratch.
+		"""
+		try:
+			os.unlink(self.path)
+		except FileNotFoundError:
+			pass
@@ -0,0 +1,111 @@
+#!/usr/bin/python3
+"""
+Compact column-oriented batches for the user_data generators. Numeric
+columns are packed into array('d') buffers (8 bytes per value) and the
+remaining columns are kept as plain tuples, instead of one dict per row.
+"""
+from array import array
+from decimal import Decimal
+
+try:
+	import numpy
+except ImportError:  # NumPy is optional
+	numpy = None
+
+NUMERIC_COLUMNS = ('age',)
+
+
+class ColumnBatch:
+	"""
+	A batch of rows stored by column.
+	- numeric columns: array('d') via column(name) or as_numpy(name)
+	- other columns: one tuple per row in `rows`, ordered as `row_columns`
+	- `types`: the Python type each numeric column arrived as (e.g. Decimal
+	  for a DECIMAL column), which records() converts back to
+	"""
+
+	__slots__ = ('columns', 'row_columns', 'arrays', 'types', 'rows', '_length')
+
+	def __init__(self, columns, records, numeric_columns=NUMERIC_COLUMNS):
+		"""
+		:param columns: column names, in the order of each record
+		:param records: sequence of tuples as returned by a plain cursor
+		"""
+		self.columns = tuple(columns)
+		numeric = [i for i, name in enumerate(self.columns) if name in numeric_columns]
+		other = [i for i, name in enumerate(self.columns) if name not in numeric_columns]
+		self.row_columns = tuple(self.columns[i] for i in other)
+		self.arrays = {
+			self.columns[i]: array('d', (float(record[i]) for record in records))
+			for i in numeric
+		}
+		self.types = {
+			self.columns[i]: type(records[0][i]) if records else float
+			for i in numeric
+		}
+		if other:
+			self.rows = [tuple(record[i] for i in other) for record in records]
+		else:
+			self.rows = []
+		self._length = len(records)
+
+	def __len__(self):
+		return self._length
+
+	def column(self, name):
+		"""
+		Return a column: an array('d') if numeric, otherwise a list.
+		"""
+		if name in self.arrays:
+			return self.arrays[name]
+		index = self.row_columns.index(name)
+		return [row[index] for row in self.rows]
+
+	def as_numpy(self, name):
+		"""
+		Return a numeric column as a NumPy array without copying.
+		"""
+		if numpy is None:
+			raise ImportError("as_numpy() requires NumPy")
+		return numpy.frombuffer(self.arrays[name], dtype=numpy.float64)
+
+	def records(self):
+		"""
+		Yield the batch back as row-dicts, like the dictionary cursors do.
+		Numeric values get their original type back (Decimal, int, float),
+		equal to the values read as long as they fit a float: Decimals with
+		more than 15 significant digits come back rounded.
+		"""
+		restore = {name: _restorer(kind) for name, kind in self.types.items()}
+		for position in range(self._length):
+			record = {
+				name: restore[name](values[position])
+				for name, values in self.arrays.items()
+			}
+			if self.rows:
+				record.update(zip(self.row_columns, self.rows[position]))
+			yield record
+
+
+def _restorer(kind):
+	"""
+	Function turning a packed float back into a value of type `kind`.
+	"""
+	if kind is Decimal:
+		def to_decimal(value):
+			# Integral values keep an exponent of 0, as DECIMAL(n, 0) has;
+			# repr() is the shortest string that round-trips, so 0.1 -> '0.1'
+			if value.is_integer():
+				return Decimal(int(value))
+			return Decimal(repr(value))
+		return to_decimal
+	if kind is int:
+		return int
+	return float
+
+
+def column_names(cursor):
+	"""
+	Return the column names of an executed DB-API cursor.
+	"""
+	return [description[0] for description in cursor.description]
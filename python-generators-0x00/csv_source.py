@@ -0,0 +1,152 @@
+#!/usr/bin/python3
+"""
+File-backed source for user_data records: streams user_data.csv straight
+from a memory map, in the same row and batch shapes as stream_users and
+stream_users_in_batches, for read-only analyses that do not need MySQL.
+"""
+import csv
+import mmap
+import os
+import uuid
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal
+
+CSV_COLUMNS = ('user_id', 'name', 'email', 'age')
+
+
+def _lines(mapped, start, end):
+	"""
+	Yield decoded lines of mapped[start:end], one at a time.
+	"""
+	mapped.seek(start)
+	while mapped.tell() < end:
+		line = mapped.readline()
+		if not line:
+			return
+		yield line.decode('utf-8')
+
+
+def _records(header, lines):
+	"""
+	Parse CSV lines into row-dicts shaped like the user_data rows.
+	A user_id is generated for rows where it is missing or empty.
+	"""
+	for values in csv.reader(lines):
+		if not values:
+			continue
+		row = dict(zip(header, values))
+		yield {
+			'user_id': row.get('user_id') or str(uuid.uuid4()),
+			'name': row['name'],
+			'email': row['email'],
+			'age': Decimal(row['age']),
+		}
+
+
+def _open(path):
+	"""
+	Memory-map `path` and parse its header.
+	Returns (file, mmap, header, offset of the first data line).
+	"""
+	handle = open(path, 'rb')
+	try:
+		mapped = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+	except ValueError:  # empty file
+		handle.close()
+		raise ValueError(f"{path} is empty")
+	first = mapped.readline().decode('utf-8-sig')
+	header = next(csv.reader([first]))
+	return handle, mapped, header, mapped.tell()
+
+
+def stream_csv_users(path):
+	"""
+	Generator that yields each user in the CSV as a dict, parsed lazily
+	from a memory map of the file.
+	"""
+	handle, mapped, header, start = _open(path)
+	try:
+		yield from _records(header, _lines(mapped, start, len(mapped)))
+	finally:
+		mapped.close()
+		handle.close()
+
+
+def line_aligned_chunks(path, chunk_bytes):
+	"""
+	Split the data part of the CSV into (start, end) byte ranges of about
+	`chunk_bytes`, each ending on a line boundary. Quoted fields containing
+	newlines would be cut in two, so parallel parsing assumes they do not occur.
+	"""
+	handle, mapped, header, start = _open(path)
+	try:
+		size = len(mapped)
+		chunks = []
+		while start < size:
+			end = min(start + chunk_bytes, size)
+			if end < size:
+				newline = mapped.find(b'\n', end)
+				end = size if newline == -1 else newline + 1
+			chunks.append((start, end))
+			start = end
+		return header, chunks
+	finally:
+		mapped.close()
+		handle.close()
+
+
+def _parse_chunk(path, header, start, end):
+	"""
+	Worker process body: parse one line-aligned byte range.
+	"""
+	with open(path, 'rb') as handle:
+		with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+			return list(_records(header, _lines(mapped, start, end)))
+
+
+def stream_csv_users_in_batches(path, batch_size, workers=None, chunk_bytes=8 << 20):
+	"""
+	Generator that yields lists of up to `batch_size` user dicts from the CSV.
+	With `workers` set, line-aligned chunks of about `chunk_bytes` are parsed
+	by that many processes; rows still come out in file order and at most
+	2 * workers chunks are in flight at a time.
+	"""
+	if not workers:
+		batch = []
+		for record in stream_csv_users(path):
+			batch.append(record)
+			if len(batch) >= batch_size:
+				yield batch
+				batch = []
+		if batch:
+			yield batch
+		return
+
+	path = os.path.abspath(path)
+	header, chunks = line_aligned_chunks(path, chunk_bytes)
+	chunks = iter(chunks)
+	executor = ProcessPoolExecutor(max_workers=workers)
+	pending = deque()
+	batch = []
+
+	def submit():
+		chunk = next(chunks, None)
+		if chunk is not None:
+			pending.append(executor.submit(_parse_chunk, path, header, *chunk))
+
+	try:
+		for _ in range(2 * workers):
+			submit()
+		while pending:
+			records = pending.popleft().result()
+			submit()
+			for record in records:
+				batch.append(record)
+				if len(batch) >= batch_size:
+					yield batch
+					batch = []
+	finally:
+		executor.shutdown(wait=True, cancel_futures=True)
+	if batch:
+		yield batch
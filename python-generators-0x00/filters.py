@@ -0,0 +1,115 @@
+#!/usr/bin/python3
+"""
+Composable filters and column projections for the user_data generators.
+Predicates are turned into parameterized WHERE clauses so that only the
+matching rows and requested columns leave the database.
+"""
+from seed import USER_DATA_COLUMNS
+
+
+def check_column(column):
+	"""
+	Return `column` if it is a user_data column, else raise ValueError.
+	Column names are spliced into SQL, so only known names are allowed.
+	"""
+	if column not in USER_DATA_COLUMNS:
+		raise ValueError(f"Unknown user_data column: {column!r}")
+	return column
+
+
+class Predicate:
+	"""
+	A SQL condition plus its parameters. Combine with & (AND), | (OR)
+	and ~ (NOT).
+	"""
+
+	def __init__(self, sql, params=()):
+		self.sql = sql
+		self.params = tuple(params)
+
+	def __and__(self, other):
+		return Predicate(f"({self.sql}) AND ({other.sql})", self.params + other.params)
+
+	def __or__(self, other):
+		return Predicate(f"({self.sql}) OR ({other.sql})", self.params + other.params)
+
+	def __invert__(self):
+		return Predicate(f"NOT ({self.sql})", self.params)
+
+	def __repr__(self):
+		return f"Predicate({self.sql!r}, {self.params!r})"
+
+
+def _compare(column, operator, value):
+	return Predicate(f"{check_column(column)} {operator} %s", (value,))
+
+
+def eq(column, value):
+	"""column = value"""
+	return _compare(column, "=", value)
+
+
+def ne(column, value):
+	"""column <> value"""
+	return _compare(column, "<>", value)
+
+
+def gt(column, value):
+	"""column > value"""
+	return _compare(column, ">", value)
+
+
+def ge(column, value):
+	"""column >= value"""
+	return _compare(column, ">=", value)
+
+
+def lt(column, value):
+	"""column < value"""
+	return _compare(column, "<", value)
+
+
+def le(column, value):
+	"""column <= value"""
+	return _compare(column, "<=", value)
+
+
+def like(column, pattern):
+	"""column LIKE pattern"""
+	return _compare(column, "LIKE", pattern)
+
+
+def between(column, low, high):
+	"""low <= column <= high"""
+	return Predicate(f"{check_column(column)} BETWEEN %s AND %s", (low, high))
+
+
+def in_(column, values):
+	"""column IN (values...); an empty list matches nothing."""
+	values = tuple(values)
+	if not values:
+		return Predicate("1 = 0")
+	placeholders = ", ".join(["%s"] * len(values))
+	return Predicate(f"{check_column(column)} IN ({placeholders})", values)
+
+
+def build_select(columns=None, where=None, suffix="", suffix_params=()):
+	"""
+	Build a SELECT over user_data. Returns (sql, params).
+	:param columns: iterable of column names, or None for every column
+	:param where: a Predicate, or None for no filter
+	:param suffix: trailing SQL such as "ORDER BY user_id LIMIT %s"
+	:param suffix_params: parameters for the placeholders in `suffix`
+	"""
+	if columns:
+		projection = ", ".join(check_column(column) for column in columns)
+	else:
+		projection = "*"
+	sql = f"SELECT {projection} FROM user_data"
+	params = ()
+	if where is not None:
+		sql += f" WHERE {where.sql}"
+		params = where.params
+	if suffix:
+		sql += f" {suffix}"
+	return sql, params + tuple(suffix_params)
@@ -0,0 +1,90 @@
+#!/usr/bin/python3
+"""
+Check that stream_users_in_batches keeps client memory flat while it walks
+user_data: samples the process RSS as rows are consumed and prints it.
+With the (default) unbuffered cursor it exits with status 1 if RSS grew by
+more than --max-growth KiB (default MAX_GROWTH_KB) between the first and
+the last sample; buffered runs are expected to grow and only report.
+
+Usage: ./memory_check.py [batch_size] [--buffered] [--max-growth KiB]
+"""
+import gc
+import os
+import sys
+
+stream_users_in_batches = __import__('1-batch_processing').stream_users_in_batches
+
+# Allowed RSS growth over an unbuffered scan: allocator noise, not rows
+MAX_GROWTH_KB = 4096
+
+
+def current_rss_kb():
+	"""
+	Return the resident set size of this process in KiB.
+	"""
+	with open('/proc/self/statm') as statm:
+		pages = int(statm.read().split()[1])
+	return pages * os.sysconf('SC_PAGE_SIZE') // 1024
+
+
+def subsample(points, samples):
+	"""
+	About `samples` evenly spaced points, always including the first and
+	the last (where unbounded growth shows).
+	"""
+	picked = points[::max(1, len(points) // samples)]
+	if picked[-1] != points[-1]:
+		picked.append(points[-1])
+	return picked
+
+
+def check_memory(batch_size=1000, buffered=False, samples=10):
+	"""
+	Stream the whole table, printing RSS at `samples` evenly spaced points.
+	Returns the list of (rows_seen, rss_kb) samples.
+	"""
+	gc.collect()
+	baseline = current_rss_kb()
+	points = []
+	rows = 0
+	for count, batch in enumerate(
+		stream_users_in_batches(batch_size, buffered=buffered), 1
+	):
+		rows += len(batch)
+		if count % 10 == 0:
+			points.append((rows, current_rss_kb()))
+	if not points or points[-1][0] != rows:
+		points.append((rows, current_rss_kb()))
+	points = subsample(points, samples)
+	mode = "buffered" if buffered else "unbuffered"
+	print(f"{mode} cursor, batch_size={batch_size}, baseline={baseline} KiB")
+	for seen, rss in points:
+		print(f"{seen:>12} rows  {rss:>10} KiB  (+{rss - baseline} KiB)")
+	return points
+
+
+def rss_growth_kb(points):
+	"""
+	RSS growth in KiB between the first and the last sample.
+	"""
+	return points[-1][1] - points[0][1]
+
+
+if __name__ == '__main__':
+	args = sys.argv[1:]
+	buffered = '--buffered' in args
+	max_growth = MAX_GROWTH_KB
+	if '--max-growth' in args:
+		index = args.index('--max-growth')
+		max_growth = int(args[index + 1])
+		del args[index:index + 2]
+	args = [arg for arg in args if arg != '--buffered']
+	points = check_memory(
+		batch_size=int(args[0]) if args else 1000,
+		buffered=buffered,
+	)
+	growth = rss_growth_kb(points)
+	print(f"RSS growth first to last sample: {growth} KiB (limit {max_growth} KiB)")
+	if not buffered and growth > max_growth:
+		print("FAIL: unbuffered streaming grew with the row count", file=sys.stderr)
+		sys.exit(1)
@@ -0,0 +1,155 @@
+#!/usr/bin/python3
+"""
+Parallel scans of user_data: the user_id keyspace is split into ranges and
+each range is read by its own worker process over its own connection.
+"""
+import multiprocessing
+import queue as queues
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+
+from filters import ge, lt
+
+stream_users_in_batches = __import__('1-batch_processing').stream_users_in_batches
+
+_DONE = 'done'
+_BATCH = 'batch'
+_ERROR = 'error'
+
+
+def keyspace_ranges(partitions):
+	"""
+	Split the user_id keyspace into `partitions` contiguous (low, high)
+	ranges, low inclusive and high exclusive, None meaning unbounded.
+	user_id values are UUID4 strings, so evenly spaced hex prefixes give
+	evenly sized ranges; any other id still falls into exactly one range.
+	"""
+	if partitions < 1:
+		raise ValueError("partitions must be at least 1")
+	bounds = [format(i * 16 ** 8 // partitions, '08x') for i in range(1, partitions)]
+	lows = [None] + bounds
+	highs = bounds + [None]
+	return list(zip(lows, highs))
+
+
+def range_predicate(low, high, where=None):
+	"""
+	Restrict `where` (a filters.Predicate or None) to low <= user_id < high.
+	"""
+	for bound in (
+		ge('user_id', low) if low is not None else None,
+		lt('user_id', high) if high is not None else None,
+	):
+		if bound is not None:
+			where = bound if where is None else where & bound
+	return where
+
+
+def _produce(queue, index, bounds, batch_size, columns, where):
+	"""
+	Worker process body: stream one range into the shared queue.
+	"""
+	try:
+		for batch in stream_users_in_batches(
+			batch_size, columns=columns, where=range_predicate(*bounds, where)
+		):
+			queue.put((_BATCH, index, batch))
+	except Exception:
+		queue.put((_ERROR, index, traceback.format_exc()))
+	else:
+		queue.put((_DONE, index, None))
+
+
+def parallel_scan(workers, batch_size=1000, columns=None, where=None, queue_size=None,
+		poll_interval=1.0):
+	"""
+	Generator that yields user_data batches read by `workers` processes in
+	parallel, one keyspace range each. Batches arrive in completion order,
+	not user_id order. A worker error is re-raised here as RuntimeError;
+	stopping early terminates the workers. A worker that dies without
+	reporting (killed, crashed) is noticed within about two
+	`poll_interval`s and also raises RuntimeError.
+	"""
+	queue = multiprocessing.Queue(queue_size or workers * 2)
+	processes = [
+		multiprocessing.Process(
+			target=_produce,
+			args=(queue, index, bounds, batch_size, columns, where),
+			daemon=True,
+		)
+		for index, bounds in enumerate(keyspace_ranges(workers))
+	]
+	for process in processes:
+		process.start()
+	try:
+		finished = set()
+		exited = set()  # found dead at the previous idle poll
+		while len(finished) < len(processes):
+			try:
+				kind, index, payload = queue.get(timeout=poll_interval)
+			except queues.Empty:
+				# A dead worker's last messages are already in the pipe,
+				# so it is only lost if a whole idle poll later it still
+				# has not reported
+				for index, process in enumerate(processes):
+					if index in finished or process.is_alive():
+						continue
+					if index in exited:
+						raise RuntimeError(
+							f"parallel_scan worker {index} exited with code "
+							f"{process.exitcode} without reporting"
+						)
+					exited.add(index)
+				continue
+			if kind == _BATCH:
+				yield payload
+			elif kind == _DONE:
+				finished.add(index)
+			else:
+				raise RuntimeError(f"parallel_scan worker failed:\n{payload}")
+	finally:
+		for process in processes:
+			if process.is_alive():
+				process.terminate()
+		for process in processes:
+			process.join()
+		queue.close()
+
+
+def _reduce_range(fold, initial, bounds, batch_size, columns, where, columnar):
+	"""
+	Worker process body: fold every batch of one range into an accumulator.
+	"""
+	accumulator = initial
+	for batch in stream_users_in_batches(
+		batch_size, columns=columns, where=range_predicate(*bounds, where),
+		columnar=columnar
+	):
+		accumulator = fold(accumulator, batch)
+	return accumulator
+
+
+def parallel_reduce(fold, combine, initial, workers, batch_size=1000,
+		columns=None, where=None, columnar=False):
+	"""
+	Reduce user_data in parallel. Each worker process starts from its own
+	copy of `initial` and applies accumulator = fold(accumulator, batch) to
+	the batches of its range; the partial results are then merged in range
+	order with combine(left, right). fold, combine and initial must be
+	picklable (module-level functions, plain objects). With columnar=True
+	fold receives columnar.ColumnBatch batches.
+	"""
+	ranges = keyspace_ranges(workers)
+	with ProcessPoolExecutor(max_workers=workers) as executor:
+		futures = [
+			executor.submit(
+				_reduce_range, fold, initial, bounds, batch_size, columns, where,
+				columnar
+			)
+			for bounds in ranges
+		]
+		partials = [future.result() for future in futures]
+	result = partials[0]
+	for partial in partials[1:]:
+		result = combine(result, partial)
+	return result
@@ -0,0 +1,67 @@
+#!/usr/bin/python3
+"""
+Background prefetching for batch generators: the next batches are fetched
+on a worker thread while the consumer processes the current one.
+"""
+import queue
+import threading
+
+_ITEM = 'item'
+_DONE = 'done'
+_ERROR = 'error'
+
+
+def prefetch(iterable, depth=2):
+	"""
+	Generator that yields the items of `iterable`, reading up to `depth`
+	items ahead on a background thread.
+	- backpressure: the thread blocks once `depth` items are waiting
+	- errors raised by `iterable` are re-raised in the consumer
+	- stopping early (break/close) stops the thread and closes `iterable`
+	`iterable` is consumed entirely on the background thread, so it must
+	not share a connection with the consumer.
+	"""
+	if depth < 1:
+		raise ValueError("depth must be at least 1")
+	items = queue.Queue(maxsize=depth)
+	stop = threading.Event()
+
+	def put(message):
+		# Retry with a timeout so a stopped consumer never strands the thread
+		while not stop.is_set():
+			try:
+				items.put(message, timeout=0.1)
+				return True
+			except queue.Full:
+				continue
+		return False
+
+	def produce():
+		iterator = iter(iterable)
+		try:
+			for item in iterator:
+				if not put((_ITEM, item)):
+					break
+			else:
+				put((_DONE, None))
+		except BaseException as e:
+			put((_ERROR, e))
+		finally:
+			close = getattr(iterator, 'close', None)
+			if close is not None:
+				close()
+
+	worker = threading.Thread(target=produce, name='prefetch', daemon=True)
+	worker.start()
+	try:
+		while True:
+			kind, payload = items.get()
+			if kind == _ITEM:
+				yield payload
+			elif kind == _DONE:
+				return
+			else:
+				raise payload
+	finally:
+		stop.set()
+		worker.join()
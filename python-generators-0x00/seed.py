@@ -2,9 +2,20 @@
 
 import os
 import csv
+import time
+import queue
+import weakref
+import threading
 import mysql.connector
+from mysql.connector.errors import PoolError
 import uuid
 
+USER_DATA_COLUMNS = ('user_id', 'name', 'email', 'age', 'updated_at')
+UPDATED_AT_DEFINITION = (
+	"TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) "
+	"ON UPDATE CURRENT_TIMESTAMP(6)"
+)
+
 
 def connect_db():
 	"""
@@ -26,60 +37,435 @@ def create_database(connection):
 	connection.commit()
 	cursor.close()
 
-def connect_to_prodev():
+def prodev_config():
 	"""
-	Connect to the ALX_prodev database.
+	Connection settings for the ALX_prodev database.
 	"""
-	return mysql.connector.connect(
-		host=os.getenv('DB_HOST', 'localhost'),
-		user=os.getenv('DB_USER', 'root'),
-		password=os.getenv('DB_PASSWORD', ''),
-		database='ALX_prodev'
+	return {
+		'host': os.getenv('DB_HOST', 'localhost'),
+		'user': os.getenv('DB_USER', 'root'),
+		'password': os.getenv('DB_PASSWORD', ''),
+		'database': 'ALX_prodev',
+	}
+
+def _reclaim(pool, connection):
+	"""
+	Give back the slot of a PooledConnection that was garbage collected
+	without close(). Its state is unknown (it may have unread results), so
+	the socket is dropped and the connection discarded.
+	"""
+	try:
+		connection.shutdown()
+	except mysql.connector.Error:
+		pass
+	pool.release(connection, broken=True)
+
+class PooledConnection:
+	"""
+	A connection borrowed from a ConnectionPool. Behaves like the underlying
+	mysql.connector connection, except that close() hands it back to the
+	pool instead of closing the socket. A wrapper that is garbage collected
+	without close() or shutdown() still gives its slot back.
+	"""
+
+	def __init__(self, pool, connection):
+		self._pool = pool
+		self._connection = connection
+		self._finalizer = weakref.finalize(self, _reclaim, pool, connection)
+
+	def __getattr__(self, name):
+		if self._connection is None:
+			raise mysql.connector.errors.InterfaceError(
+				"Connection was returned to the pool"
+			)
+		return getattr(self._connection, name)
+
+	def close(self):
+		"""Return the connection to the pool."""
+		if self._connection is not None:
+			self._finalizer.detach()
+			connection, self._connection = self._connection, None
+			self._pool.release(connection)
+
+	def shutdown(self):
+		"""Drop the socket without draining it; the pool discards it."""
+		if self._connection is not None:
+			self._finalizer.detach()
+			connection, self._connection = self._connection, None
+			try:
+				connection.shutdown()
+			finally:
+				self._pool.release(connection, broken=True)
+
+class PoolTimeout(PoolError):
+	"""No connection could be checked out within the pool's timeout."""
+
+class ConnectionPool:
+	"""
+	A named, fixed-size pool of MySQL connections. The repo's one pool
+	implementation: python-context-async-perations-0x02/pool.py builds on it.
+	- checkout waits up to `timeout` seconds for a free slot, then raises
+	  PoolTimeout; connections are opened lazily up to `size`
+	- idle connections are pinged on checkout and replaced if dead
+	- open transactions are rolled back and session state is reset on
+	  return; connections that cannot be reset are discarded
+	- metrics() reports in-use/idle counts, checkout wait times and timeouts
+	"""
+
+	def __init__(self, size=5, timeout=30.0, name="default", **config):
+		if size < 1:
+			raise ValueError("Pool size must be at least 1")
+		self.name = name
+		self.size = size
+		self.timeout = timeout
+		self.config = config
+		self.pid = os.getpid()
+		self._idle = queue.LifoQueue()
+		self._slots = threading.BoundedSemaphore(size)
+		self._lock = threading.Lock()
+		self._in_use = 0
+		self._checkouts = 0
+		self._timeouts = 0
+		self._wait_total = 0.0
+		self._wait_max = 0.0
+
+	def get_connection(self):
+		"""
+		Borrow a healthy connection; close() on it returns it to the pool.
+		"""
+		return PooledConnection(self, self.acquire())
+
+	def acquire(self):
+		"""
+		Borrow a healthy, unwrapped connection; give it back with release().
+		"""
+		start = time.perf_counter()
+		acquired = self._slots.acquire(timeout=self.timeout)
+		waited = time.perf_counter() - start
+		with self._lock:
+			self._wait_total += waited
+			self._wait_max = max(self._wait_max, waited)
+			if not acquired:
+				self._timeouts += 1
+		if not acquired:
+			raise PoolTimeout(
+				f"No connection in pool {self.name!r} available within "
+				f"{self.timeout}s (pool size {self.size})"
+			)
+		try:
+			connection = self._checkout()
+		except BaseException:
+			self._slots.release()
+			raise
+		with self._lock:
+			self._in_use += 1
+			self._checkouts += 1
+		return connection
+
+	def _checkout(self):
+		while True:
+			try:
+				connection = self._idle.get_nowait()
+			except queue.Empty:
+				return mysql.connector.connect(**self.config)
+			try:
+				connection.ping(reconnect=False)
+				return connection
+			except mysql.connector.Error:
+				self._discard(connection)
+
+	def release(self, connection, broken=False):
+		"""
+		Take a connection back, rolling back and resetting its session.
+		"""
+		try:
+			if not broken:
+				try:
+					if connection.in_transaction:
+						connection.rollback()
+					connection.reset_session()
+				except mysql.connector.Error:
+					broken = True
+			if broken:
+				self._discard(connection)
+			else:
+				self._idle.put(connection)
+		finally:
+			with self._lock:
+				self._in_use -= 1
+			self._slots.release()
+
+	@staticmethod
+	def _discard(connection):
+		try:
+			connection.close()
+		except mysql.connector.Error:
+			pass
+
+	def metrics(self):
+		"""
+		Pool counters: connections in use and idle, checkouts served,
+		checkout timeouts, and total/average/max seconds spent waiting
+		for a connection.
+		"""
+		with self._lock:
+			attempts = self._checkouts + self._timeouts
+			return {
+				"name": self.name,
+				"size": self.size,
+				"in_use": self._in_use,
+				"idle": self._idle.qsize(),
+				"checkouts": self._checkouts,
+				"timeouts": self._timeouts,
+				"wait_total": self._wait_total,
+				"wait_avg": self._wait_total / attempts if attempts else 0.0,
+				"wait_max": self._wait_max,
+			}
+
+	def close(self):
+		"""
+		Close every idle connection. Borrowed ones are closed on return.
+		"""
+		while True:
+			try:
+				self._discard(self._idle.get_nowait())
+			except queue.Empty:
+				return
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def _new_pool(size=None, timeout=None):
+	return ConnectionPool(
+		size=size or int(os.getenv('DB_POOL_SIZE', 5)),
+		timeout=timeout or float(os.getenv('DB_POOL_TIMEOUT', 30)),
+		**prodev_config()
 	)
 
+def configure_pool(size=None, timeout=None):
+	"""
+	(Re)create the process-wide ALX_prodev pool. Defaults come from the
+	DB_POOL_SIZE (5) and DB_POOL_TIMEOUT (30 seconds) environment variables.
+	"""
+	global _pool
+	with _pool_lock:
+		if _pool is not None and _pool.pid == os.getpid():
+			_pool.close()
+		_pool = _new_pool(size, timeout)
+		return _pool
+
+def get_pool():
+	"""
+	Return the process-wide ALX_prodev pool, creating it on first use.
+	A forked child gets its own pool rather than sharing the parent's sockets.
+	"""
+	global _pool
+	pool = _pool
+	if pool is None or pool.pid != os.getpid():
+		with _pool_lock:
+			if _pool is None or _pool.pid != os.getpid():
+				_pool = _new_pool()
+			pool = _pool
+	return pool
+
+def connect_to_prodev(pooled=True, **options):
+	"""
+	Connect to the ALX_prodev database.
+	By default the connection is borrowed from the process-wide pool and
+	close() returns it. pooled=False opens a dedicated connection, which is
+	required for extra options such as allow_local_infile=True.
+	"""
+	if not pooled:
+		return mysql.connector.connect(**prodev_config(), **options)
+	if options:
+		raise ValueError("Connection options require pooled=False")
+	return get_pool().get_connection()
+
 def create_table(connection):
 	"""
 	Create the user_data table if it does not exist.
 	"""
 	cursor = connection.cursor()
 	cursor.execute(
-		"""
+		f"""
 		CREATE TABLE IF NOT EXISTS user_data (
 			user_id VARCHAR(36) PRIMARY KEY,
 			name VARCHAR(255) NOT NULL,
 			email VARCHAR(255) NOT NULL,
-			age DECIMAL NOT NULL
+			age DECIMAL NOT NULL,
+			updated_at {UPDATED_AT_DEFINITION},
+			INDEX idx_user_data_age (age),
+			INDEX idx_user_data_updated (updated_at, user_id)
 		);
 		"""
 	)
+	# Tables created before these existed get them added here
+	ensure_column(cursor, 'updated_at', UPDATED_AT_DEFINITION)
+	ensure_index(cursor, 'idx_user_data_age', ('age',))
+	ensure_index(cursor, 'idx_user_data_updated', ('updated_at', 'user_id'))
 	connection.commit()
 	cursor.close()
 
+def ensure_column(cursor, name, definition):
+	"""
+	Add column `name` to user_data unless it already exists.
+	"""
+	cursor.execute(
+		"""
+		SELECT COUNT(*) FROM information_schema.columns
+		WHERE table_schema = DATABASE()
+			AND table_name = 'user_data'
+			AND column_name = %s;
+		""",
+		(name,)
+	)
+	(exists,) = cursor.fetchone()
+	if not exists:
+		cursor.execute(f"ALTER TABLE user_data ADD COLUMN {name} {definition};")
+
+def ensure_index(cursor, name, columns):
+	"""
+	Add index `name` on user_data(columns) unless it already exists.
+	"""
+	cursor.execute(
+		"""
+		SELECT COUNT(*) FROM information_schema.statistics
+		WHERE table_schema = DATABASE()
+			AND table_name = 'user_data'
+			AND index_name = %s;
+		""",
+		(name,)
+	)
+	(exists,) = cursor.fetchone()
+	if not exists:
+		cursor.execute(
+			f"ALTER TABLE user_data ADD INDEX {name} ({', '.join(columns)});"
+		)
+
+def read_csv_rows(data_file):
+	"""
+	Stream (user_id, name, email, age) tuples from the given CSV file.
+	A user_id is generated for every row whose user_id is missing or empty.
+	"""
+	with open(data_file, newline='', encoding='utf-8-sig') as csvfile:
+		reader = csv.DictReader(csvfile)
+		for row in reader:
+			uid = row.get('user_id') or str(uuid.uuid4())
+			yield (uid, row['name'], row['email'], row['age'])
+
 def insert_data(connection, data_file):
 	"""
 	Read rows from the give CSV file and insert them into the user_data table.
 	Auto-generate user_id if none is present in the CSV.
 	"""
 	cursor = connection.cursor()
+	for values in read_csv_rows(data_file):
+		cursor.execute(
+			"""
+			INSERT IGNORE INTO user_data (user_id, name, email, age)
+			VALUES (%s, %s, %s, %s)
+			ON DUPLICATE KEY UPDATE
+				name = VALUES(name),
+				email = VALUES(email),
+				age = VALUES(age);
+			""",
+			values
+		)
+	connection.commit()
+	cursor.close()
+
+def _insert_chunk(cursor, chunk):
+	"""
+	Send one multi-row INSERT for a chunk of (user_id, name, email, age) tuples.
+	"""
+	placeholders = ", ".join(["(%s, %s, %s, %s)"] * len(chunk))
+	params = [value for values in chunk for value in values]
+	cursor.execute(
+		f"""
+		INSERT INTO user_data (user_id, name, email, age)
+		VALUES {placeholders}
+		ON DUPLICATE KEY UPDATE
+			name = VALUES(name),
+			email = VALUES(email),
+			age = VALUES(age);
+		""",
+		params
+	)
+
+def load_data_infile(connection, data_file):
+	"""
+	Load the CSV with LOAD DATA LOCAL INFILE, letting the server parse it.
+	The connection must be opened with allow_local_infile=True (e.g.
+	connect_to_prodev(pooled=False, allow_local_infile=True)) and the
+	server must have local_infile enabled. Missing or empty user_id values
+	are filled with UUID() per row. Returns the number of CSV rows read:
+	the statement's affected-row count is not used, as REPLACE counts a
+	replaced row twice (delete + insert).
+	"""
 	with open(data_file, newline='', encoding='utf-8-sig') as csvfile:
-		reader = csv.DictReader(csvfile)
-		for row in reader:
-			# Create a new UUID if the CSV row does not have a user_id
-			if 'user_id' not in row:
-				uid = row.get('user_id') or str(uuid.uuid4())
-			cursor.execute(
-				"""
-				INSERT IGNORE INTO user_data (user_id, name, email, age)
-				VALUES (%s, %s, %s, %s)
-				ON DUPLICATE KEY UPDATE
-					name = VALUES(name),
-					email = VALUES(email),
-					age = VALUES(age);
-				""",
-				(uid, row['name'], row['email'], row['age'])
-			)
+		reader = csv.reader(csvfile)
+		header = next(reader)
+		rows = sum(1 for _ in reader)
+	unknown = set(header) - set(USER_DATA_COLUMNS)
+	if unknown:
+		raise ValueError(f"Unexpected CSV columns: {sorted(unknown)}")
+	targets = ", ".join(
+		'@user_id' if column == 'user_id' else column for column in header
+	)
+	if 'user_id' in header:
+		set_clause = "SET user_id = COALESCE(NULLIF(@user_id, ''), UUID())"
+	else:
+		set_clause = "SET user_id = UUID()"
+	cursor = connection.cursor()
+	cursor.execute(
+		f"""
+		LOAD DATA LOCAL INFILE %s
+		REPLACE INTO TABLE user_data
+		CHARACTER SET utf8mb4
+		FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '"'
+		LINES TERMINATED BY '\\n'
+		IGNORE 1 LINES
+		({targets})
+		{set_clause};
+		""",
+		(os.path.abspath(data_file),)
+	)
 	connection.commit()
 	cursor.close()
+	return rows
+
+def bulk_insert_data(connection, data_file, chunk_size=1000, local_infile=False):
+	"""
+	Stream the CSV into user_data with one multi-row INSERT and one commit
+	per `chunk_size` rows, then print the load rate. With local_infile=True
+	the file is handed to LOAD DATA LOCAL INFILE instead.
+	Returns the number of rows sent.
+	"""
+	start = time.perf_counter()
+	if local_infile:
+		rows = load_data_infile(connection, data_file)
+	else:
+		rows = 0
+		chunk = []
+		cursor = connection.cursor()
+		try:
+			for values in read_csv_rows(data_file):
+				chunk.append(values)
+				if len(chunk) >= chunk_size:
+					_insert_chunk(cursor, chunk)
+					connection.commit()
+					rows += len(chunk)
+					chunk = []
+			if chunk:
+				_insert_chunk(cursor, chunk)
+				connection.commit()
+				rows += len(chunk)
+		finally:
+			cursor.close()
+	elapsed = time.perf_counter() - start
+	rate = rows / elapsed if elapsed > 0 else float('inf')
+	print(f"Loaded {rows} rows in {elapsed:.2f}s ({rate:.0f} rows/sec)")
+	return rows
 
 def stream_data(connection):
 	"""
@@ -0,0 +1,121 @@
+#!/usr/bin/python3
+"""
+SQLite stand-in for seed.py, used by benchmark.py when MySQL is not
+available. It creates the same user_data schema and hands out connections
+that accept the mysql.connector calls the generators make (%s
+placeholders, dictionary/buffered cursors, shutdown()).
+"""
+import os
+import sqlite3
+
+USER_DATA_COLUMNS = ('user_id', 'name', 'email', 'age', 'updated_at')
+
+
+def database_path():
+	"""
+	Absolute path of the SQLite file standing in for ALX_prodev
+	(PRODEV_SQLITE_PATH, relative to the current directory).
+	"""
+	return os.path.abspath(os.getenv('PRODEV_SQLITE_PATH', 'ALX_prodev.sqlite3'))
+
+
+class SQLiteCursor:
+	"""
+	A sqlite3 cursor with the mysql.connector cursor interface used here.
+	"""
+
+	def __init__(self, connection, dictionary=False, buffered=False):
+		self._cursor = connection.cursor()
+		self._dictionary = dictionary
+
+	@property
+	def description(self):
+		return self._cursor.description
+
+	@property
+	def rowcount(self):
+		return self._cursor.rowcount
+
+	def _row(self, row):
+		if row is None or not self._dictionary:
+			return row
+		return dict(zip((d[0] for d in self._cursor.description), row))
+
+	def execute(self, query, params=()):
+		self._cursor.execute(query.replace('%s', '?'), tuple(params))
+
+	def executemany(self, query, seq_of_params):
+		self._cursor.executemany(query.replace('%s', '?'), seq_of_params)
+
+	def fetchone(self):
+		return self._row(self._cursor.fetchone())
+
+	def fetchmany(self, size=1):
+		return [self._row(row) for row in self._cursor.fetchmany(size)]
+
+	def fetchall(self):
+		return [self._row(row) for row in self._cursor.fetchall()]
+
+	def __iter__(self):
+		for row in self._cursor:
+			yield self._row(row)
+
+	def close(self):
+		self._cursor.close()
+
+
+class SQLiteConnection:
+	"""
+	A sqlite3 connection with the mysql.connector connection interface.
+	"""
+
+	def __init__(self, path):
+		self._connection = sqlite3.connect(path)
+
+	def cursor(self, dictionary=False, buffered=False):
+		return SQLiteCursor(self._connection, dictionary, buffered)
+
+	def commit(self):
+		self._connection.commit()
+
+	def rollback(self):
+		self._connection.rollback()
+
+	def close(self):
+		self._connection.close()
+
+	shutdown = close
+
+
+def connect_to_prodev(pooled=True, **options):
+	"""
+	Open a connection to the SQLite stand-in database.
+	"""
+	return SQLiteConnection(database_path())
+
+
+def create_table(connection):
+	"""
+	Create user_data (same columns and indexes as seed.create_table).
+	"""
+	cursor = connection.cursor()
+	cursor.execute(
+		"""
+		CREATE TABLE IF NOT EXISTS user_data (
+			user_id VARCHAR(36) PRIMARY KEY,
+			name VARCHAR(255) NOT NULL,
+			email VARCHAR(255) NOT NULL,
+			age DECIMAL NOT NULL,
+			updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+		)
+		"""
+	)
+	cursor.execute(
+		"CREATE INDEX IF NOT EXISTS idx_user_data_age ON user_data (age)"
+	)
+	cursor.execute(
+		"CREATE INDEX IF NOT EXISTS idx_user_data_updated "
+		"ON user_data (updated_at, user_id)"
+	)
+	connection.commit()
+	cursor.close()
@@ -0,0 +1,220 @@
+#!/usr/bin/python3
+"""
+One-pass, constant-memory statistics for streams of numbers: count, mean,
+variance, min/max and approximate percentiles from a merging t-digest.
+"""
+import math
+from collections import Counter
+
+try:
+	import numpy
+except ImportError:  # NumPy is optional
+	numpy = None
+
+
+class TDigest:
+	"""
+	Merging t-digest (Dunning & Ertl). Keeps at most ~compression centroids,
+	so memory is constant however many values are added; percentiles are
+	most accurate near the tails (p95, p99).
+	"""
+
+	def __init__(self, compression=100):
+		self.compression = compression
+		self.count = 0
+		self.min = math.inf
+		self.max = -math.inf
+		self._centroids = []  # sorted [mean, weight] pairs
+		self._buffer = []
+		self._buffer_limit = 5 * compression
+
+	def add(self, value, weight=1):
+		"""Add one value (optionally with a weight)."""
+		value = float(value)
+		self._buffer.append((value, weight))
+		self.count += weight
+		self.min = min(self.min, value)
+		self.max = max(self.max, value)
+		if len(self._buffer) >= self._buffer_limit:
+			self._compress()
+
+	def merge(self, other):
+		"""Fold another digest into this one."""
+		self._buffer.extend((mean, weight) for mean, weight in other._centroids)
+		self._buffer.extend(other._buffer)
+		self.count += other.count
+		self.min = min(self.min, other.min)
+		self.max = max(self.max, other.max)
+		self._compress()
+		return self
+
+	def _k_inverse(self, k):
+		return (math.sin(k * 2 * math.pi / self.compression) + 1) / 2
+
+	def _k(self, q):
+		return self.compression / (2 * math.pi) * math.asin(2 * q - 1)
+
+	def _compress(self):
+		points = sorted(
+			[(mean, weight) for mean, weight in self._centroids] + self._buffer
+		)
+		self._buffer = []
+		if not points:
+			return
+		total = float(self.count)
+		merged = []
+		mean, weight = points[0]
+		q0 = 0.0
+		q_limit = total * self._k_inverse(self._k(0.0) + 1)
+		for next_mean, next_weight in points[1:]:
+			if q0 + weight + next_weight <= q_limit:
+				weight += next_weight
+				mean += (next_mean - mean) * next_weight / weight
+			else:
+				merged.append([mean, weight])
+				q0 += weight
+				q_limit = total * self._k_inverse(self._k(min(q0 / total, 1.0)) + 1)
+				mean, weight = next_mean, next_weight
+		merged.append([mean, weight])
+		self._centroids = merged
+
+	def percentile(self, p):
+		"""
+		Estimate the p-th percentile (0-100), or None if nothing was added.
+		"""
+		if self._buffer:
+			self._compress()
+		if not self._centroids:
+			return None
+		if len(self._centroids) == 1 or p <= 0:
+			return self.min if p <= 0 else self._centroids[0][0]
+		if p >= 100:
+			return self.max
+		target = p / 100.0 * self.count
+		# Interpolate between centroid centres, anchored at min and max
+		previous_position, previous_value = 0.0, self.min
+		cumulative = 0.0
+		for mean, weight in self._centroids:
+			position = cumulative + weight / 2.0
+			if target < position:
+				span = position - previous_position
+				if span <= 0:
+					return mean
+				fraction = (target - previous_position) / span
+				return previous_value + fraction * (mean - previous_value)
+			previous_position, previous_value = position, mean
+			cumulative += weight
+		span = self.count - previous_position
+		if span <= 0:
+			return self.max
+		fraction = (target - previous_position) / span
+		return previous_value + fraction * (self.max - previous_value)
+
+
+class StreamingStats:
+	"""
+	Running count, mean, variance (Welford), min, max and a t-digest for
+	percentiles, all updated in a single pass. Two instances built over
+	disjoint parts of a stream can be combined with merge().
+	"""
+
+	def __init__(self, compression=100):
+		self.count = 0
+		self.mean = 0.0
+		self._m2 = 0.0
+		self.min = None
+		self.max = None
+		self.digest = TDigest(compression)
+
+	def update(self, value):
+		"""Add one value."""
+		value = float(value)
+		self.count += 1
+		delta = value - self.mean
+		self.mean += delta / self.count
+		self._m2 += delta * (value - self.mean)
+		self.min = value if self.min is None else min(self.min, value)
+		self.max = value if self.max is None else max(self.max, value)
+		self.digest.add(value)
+
+	def update_many(self, values):
+		"""Add every value from an iterable."""
+		for value in values:
+			self.update(value)
+		return self
+
+	def update_batch(self, values):
+		"""
+		Add a whole batch at once: an array('d'), list or NumPy array.
+		Moments are computed per batch and merged in, and the digest only
+		sees each distinct value once with its count, so this is much
+		cheaper than calling update() per value.
+		"""
+		if numpy is not None and isinstance(values, numpy.ndarray):
+			if not values.size:
+				return self
+			distinct, counts = numpy.unique(values, return_counts=True)
+			count = int(values.size)
+			mean = float(values.mean())
+			m2 = float(((values - mean) ** 2).sum())
+			low, high = float(distinct[0]), float(distinct[-1])
+			pairs = zip(distinct.tolist(), counts.tolist())
+		else:
+			counts = Counter(values)
+			if not counts:
+				return self
+			count = sum(counts.values())
+			mean = math.fsum(value * n for value, n in counts.items()) / count
+			m2 = math.fsum(n * (value - mean) ** 2 for value, n in counts.items())
+			low, high = float(min(counts)), float(max(counts))
+			pairs = counts.items()
+		self._combine(count, mean, m2, low, high)
+		for value, n in pairs:
+			self.digest.add(value, n)
+		return self
+
+	def merge(self, other):
+		"""Fold the statistics of another instance into this one."""
+		if other.count:
+			self._combine(other.count, other.mean, other._m2, other.min, other.max)
+			self.digest.merge(other.digest)
+		return self
+
+	def _combine(self, count, mean, m2, low, high):
+		"""Merge the moments of another part of the stream (Chan et al.)."""
+		if not self.count:
+			self.count, self.mean, self._m2 = count, mean, m2
+			self.min, self.max = low, high
+			return
+		total = self.count + count
+		delta = mean - self.mean
+		self.mean += delta * count / total
+		self._m2 += m2 + delta * delta * self.count * count / total
+		self.count = total
+		self.min = min(self.min, low)
+		self.max = max(self.max, high)
+
+	@property
+	def variance(self):
+		"""Population variance (0.0 for fewer than two values)."""
+		return self._m2 / self.count if self.count > 1 else 0.0
+
+	def percentile(self, p):
+		"""Approximate p-th percentile (0-100)."""
+		return self.digest.percentile(p)
+
+	def summary(self, percentiles=(50, 95, 99)):
+		"""
+		Return a dict with count, mean, variance, min, max and one
+		'p<N>' key per requested percentile.
+		"""
+		result = {
+			'count': self.count,
+			'mean': self.mean if self.count else None,
+			'variance': self.variance if self.count else None,
+			'min': self.min,
+			'max': self.max,
+		}
+		for p in percentiles:
+			result[f'p{p:g}'] = self.percentile(p)
+		return result
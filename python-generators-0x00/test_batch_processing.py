@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+test_batch_processing.py
+
+Unit tests for 1-batch_processing.py:
+- stream_changed_users_in_batches
+"""
+
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+
+batch_processing = __import__('1-batch_processing')
+
+
+class FakeConnection:
+    """
+    user_data in SQLite behind the mysql.connector calls the generator
+    makes; the server clock (NOW(6) - lag) is whatever `now` says.
+    """
+
+    def __init__(self, db, now):
+        self.db = db
+        self.now = now
+
+    def cursor(self, dictionary=False):
+        return FakeCursor(self, dictionary)
+
+    def close(self):
+        pass
+
+
+class FakeCursor:
+    def __init__(self, connection, dictionary):
+        self.connection = connection
+        self.dictionary = dictionary
+        self.rows = []
+
+    def execute(self, sql, params=()):
+        if sql.startswith("SELECT NOW(6)"):
+            self.rows = [(self.connection.now,)]
+            return
+        cursor = self.connection.db.execute(sql.replace("%s", "?"), params)
+        names = [column[0] for column in cursor.description]
+        self.rows = [
+            dict(zip(names, row)) if self.dictionary else row
+            for row in cursor.fetchall()
+        ]
+
+    def fetchone(self):
+        return self.rows[0]
+
+    def fetchall(self):
+        return self.rows
+
+    def close(self):
+        pass
+
+
+class TestStreamChangedUsers(unittest.TestCase):
+    """Test suite for stream_changed_users_in_batches."""
+
+    def setUp(self):
+        self.db = sqlite3.connect(":memory:")
+        self.db.execute(
+            "CREATE TABLE user_data (user_id TEXT, name TEXT, email TEXT,"
+            " age INTEGER, updated_at TEXT)"
+        )
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.checkpoint = os.path.join(directory.name, "changes.checkpoint")
+
+    def insert(self, user_id, updated_at):
+        self.db.execute(
+            "INSERT INTO user_data VALUES (?, 'n', 'e', 30, ?)",
+            (user_id, updated_at),
+        )
+
+    def run_job(self, now):
+        connection = FakeConnection(self.db, now)
+        with mock.patch.object(batch_processing, "connect_to_prodev", return_value=connection):
+            return [
+                row["user_id"]
+                for batch in batch_processing.stream_changed_users_in_batches(
+                    1, self.checkpoint
+                )
+                for row in batch
+            ]
+
+    def test_late_commit_behind_watermark_is_not_skipped(self):
+        """Test that rows newer than the lag wait for the next run."""
+        self.insert("a", "2024-01-01 10:00:01")
+        self.insert("b", "2024-01-01 10:00:07")
+        # NOW(6) - lag: "b" is too recent to be sure nothing commits before it
+        self.assertEqual(self.run_job("2024-01-01 10:00:05"), ["a"])
+        # A transaction that wrote "c" before "b" commits only now
+        self.insert("c", "2024-01-01 10:00:06")
+        self.assertEqual(self.run_job("2024-01-01 10:00:20"), ["c", "b"])
+        self.assertEqual(self.run_job("2024-01-01 10:00:30"), [])
+
+    def test_resumes_after_ties_on_updated_at(self):
+        """Test that rows sharing an updated_at are ordered by user_id."""
+        for user_id in ("x", "y", "z"):
+            self.insert(user_id, "2024-01-01 10:00:01")
+        self.assertEqual(self.run_job("2024-01-01 10:00:10"), ["x", "y", "z"])
+        self.insert("w", "2024-01-01 10:00:02")
+        self.assertEqual(self.run_job("2024-01-01 10:00:10"), ["w"])
+
+
+if __name__ == "__main__":
+    unittest.main()
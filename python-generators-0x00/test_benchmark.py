@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+test_benchmark.py
+
+Unit tests for benchmark.py:
+- peak_rss_kb
+"""
+
+import os
+import subprocess
+import sys
+import unittest
+
+import benchmark
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def child_peak_kb(allocate_mb):
+    """Peak RSS reported by a fresh interpreter that allocates `allocate_mb`."""
+    code = (
+        "import benchmark\n"
+        f"block = bytearray({allocate_mb} * 1024 * 1024)\n"
+        "print(benchmark.peak_rss_kb())\n"
+    )
+    completed = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=HERE, capture_output=True, text=True, check=True,
+    )
+    return int(completed.stdout.strip())
+
+
+class TestPeakRss(unittest.TestCase):
+    """Test suite for peak_rss_kb in measurement subprocesses."""
+
+    def test_child_does_not_inherit_parent_peak(self):
+        """Test that a child's peak is its own, not its parent's."""
+        block = bytearray(200 * 1024 * 1024)
+        parent_peak = benchmark.peak_rss_kb()
+        self.assertGreater(parent_peak, 200 * 1024)
+        self.assertLess(child_peak_kb(0), parent_peak - 100 * 1024)
+        del block
+
+    def test_strategies_can_report_different_peaks(self):
+        """Test that children with different footprints report different peaks."""
+        small = child_peak_kb(0)
+        large = child_peak_kb(64)
+        self.assertGreater(large - small, 48 * 1024)
+
+
+if __name__ == "__main__":
+    unittest.main()
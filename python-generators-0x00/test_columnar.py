@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+test_columnar.py
+
+Unit tests for columnar.py:
+- ColumnBatch.records
+- ColumnBatch.column
+"""
+
+import unittest
+from array import array
+from decimal import Decimal
+from parameterized import parameterized
+
+from columnar import ColumnBatch
+
+COLUMNS = ('user_id', 'name', 'age')
+
+
+class TestColumnBatch(unittest.TestCase):
+    """Test suite for ColumnBatch."""
+
+    @parameterized.expand([
+        ("decimal", [Decimal('30'), Decimal('41'), Decimal('0.1')]),
+        ("int", [30, 41, 7]),
+        ("float", [30.5, 41.0, 0.1]),
+    ])
+    def test_records_round_trip(self, _, ages):
+        """Test that records() gives back equal values of the same type."""
+        rows = [(f"id{i}", f"user{i}", age) for i, age in enumerate(ages)]
+        batch = ColumnBatch(COLUMNS, rows)
+        records = list(batch.records())
+        self.assertEqual(records, [dict(zip(COLUMNS, row)) for row in rows])
+        for record, age in zip(records, ages):
+            self.assertIs(type(record['age']), type(age))
+            self.assertEqual(str(record['age']), str(age))
+
+    def test_numeric_columns_are_packed(self):
+        """Test that numeric columns are float arrays whatever their type."""
+        batch = ColumnBatch(COLUMNS, [("a", "Ann", Decimal('30'))])
+        self.assertEqual(batch.column('age'), array('d', [30.0]))
+        self.assertEqual(batch.column('name'), ["Ann"])
+
+    def test_empty_batch(self):
+        """Test that an empty batch has no records."""
+        batch = ColumnBatch(COLUMNS, [])
+        self.assertEqual(len(batch), 0)
+        self.assertEqual(list(batch.records()), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
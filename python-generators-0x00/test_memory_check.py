@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+test_memory_check.py
+
+Unit tests for memory_check.py:
+- subsample
+- rss_growth_kb
+"""
+
+import unittest
+from parameterized import parameterized
+
+from memory_check import subsample, rss_growth_kb
+
+
+class TestSubsample(unittest.TestCase):
+    """Test suite for subsample."""
+
+    @parameterized.expand([
+        ("uneven", 23, 10),
+        ("even", 20, 10),
+        ("fewer_than_samples", 3, 10),
+        ("single", 1, 10),
+    ])
+    def test_keeps_first_and_last(self, _, count, samples):
+        """Test that the first and last points always survive."""
+        points = [(i, 1000 + i) for i in range(count)]
+        picked = subsample(points, samples)
+        self.assertEqual(picked[0], points[0])
+        self.assertEqual(picked[-1], points[-1])
+        self.assertEqual(len(picked), len(set(picked)))
+
+    def test_growth_covers_end_of_scan(self):
+        """Test that growth at the very end of the scan is measured."""
+        points = [(i, 1000) for i in range(22)] + [(22, 9000)]
+        self.assertEqual(rss_growth_kb(subsample(points, 10)), 8000)
+
+
+if __name__ == "__main__":
+    unittest.main()
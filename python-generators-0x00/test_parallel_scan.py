@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+test_parallel_scan.py
+
+Unit tests for parallel_scan.py:
+- keyspace_ranges
+- parallel_scan worker failures
+"""
+
+import multiprocessing
+import os
+import time
+import unittest
+from unittest.mock import patch
+
+import parallel_scan
+
+
+def two_batches(batch_size, columns=None, where=None):
+    """Stand-in stream: two batches tagged with the range's bounds."""
+    yield [("batch", 1, where.params if where else ())]
+    yield [("batch", 2, where.params if where else ())]
+
+
+def dies_in_first_range(batch_size, columns=None, where=None):
+    """Stand-in stream whose first range's worker is killed mid-scan."""
+    if where is not None and len(where.params) == 1 and where.sql.startswith("user_id <"):
+        os._exit(137)  # like the OOM killer: no DONE, no ERROR
+    yield from two_batches(batch_size, columns, where)
+
+
+def raises(batch_size, columns=None, where=None):
+    """Stand-in stream that fails with an exception."""
+    raise LookupError("no such table")
+    yield
+
+
+@unittest.skipUnless(
+    multiprocessing.get_start_method() == "fork",
+    "workers must inherit the patched stream",
+)
+class TestParallelScan(unittest.TestCase):
+    """Test suite for parallel_scan with stand-in streams."""
+
+    def scan(self, stream, workers=3):
+        """Run parallel_scan over `stream`; returns the batches."""
+        with patch.object(parallel_scan, "stream_users_in_batches", stream):
+            return list(parallel_scan.parallel_scan(workers, poll_interval=0.1))
+
+    def test_yields_every_batch(self):
+        """Test that every worker's batches arrive."""
+        self.assertEqual(len(self.scan(two_batches)), 6)
+
+    def test_worker_death_raises(self):
+        """Test that a worker dying without reporting raises instead of hanging."""
+        start = time.monotonic()
+        with self.assertRaisesRegex(RuntimeError, "exited with code 137"):
+            self.scan(dies_in_first_range)
+        self.assertLess(time.monotonic() - start, 5)
+
+    def test_worker_error_raises(self):
+        """Test that a worker exception is re-raised with its traceback."""
+        with self.assertRaisesRegex(RuntimeError, "no such table"):
+            self.scan(raises)
+
+
+class TestKeyspaceRanges(unittest.TestCase):
+    """Test suite for keyspace_ranges."""
+
+    def test_ranges_cover_keyspace(self):
+        """Test that ranges are contiguous and unbounded at both ends."""
+        ranges = parallel_scan.keyspace_ranges(4)
+        self.assertEqual(ranges[0][0], None)
+        self.assertEqual(ranges[-1][1], None)
+        for (_, high), (low, _) in zip(ranges, ranges[1:]):
+            self.assertEqual(high, low)
+
+
+if __name__ == "__main__":
+    unittest.main()
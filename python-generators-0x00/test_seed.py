@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+test_seed.py
+
+Unit tests for seed.py:
+- load_data_infile
+"""
+
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from seed import load_data_infile
+
+
+class TestLoadDataInfile(unittest.TestCase):
+    """Test suite for load_data_infile."""
+
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix=".csv")
+        with os.fdopen(handle, "w", newline="") as csvfile:
+            csvfile.write(
+                'user_id,name,email,age\n'
+                'a,Ann,ann@example.com,30\n'
+                'b,"Bo, Jr.",bo@example.com,41\n'
+                ',New,new@example.com,22\n'
+            )
+        self.addCleanup(os.remove, self.path)
+
+    def test_reports_rows_read_not_affected(self):
+        """Test that REPLACE's doubled affected-row count is not returned."""
+        connection = mock.MagicMock()
+        connection.cursor.return_value.rowcount = 5  # 2 replaced + 1 new
+        self.assertEqual(load_data_infile(connection, self.path), 3)
+        connection.commit.assert_called_once_with()
+
+    def test_rejects_unknown_columns(self):
+        """Test that a header with unexpected columns is refused."""
+        with open(self.path, "w") as csvfile:
+            csvfile.write("user_id,nickname\nx,y\n")
+        with self.assertRaises(ValueError):
+            load_data_infile(mock.MagicMock(), self.path)
+
+
+if __name__ == "__main__":
+    unittest.main()